@@ -0,0 +1,147 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from db import db
+
+# Compact audit entries (hash_version 3 and up). Instead of the full property in
+# `changes`, an entry stores either
+#   snapshot  the full property, on every SNAPSHOT_EVERY-th chain position
+#   delta     {'set': {field: value}, 'unset': [field]} against the previous entry
+# and its hash covers exactly that stored record, so the chain is verified
+# entry by entry without rebuilding anything. The property as of any entry is
+# its nearest earlier snapshot with the deltas up to it applied: at most
+# SNAPSHOT_EVERY - 1 small reads. Entries written before this format keep
+# their full `changes` and serve as snapshots.
+
+SNAPSHOT_EVERY = max(1, int(os.getenv('AUDIT_SNAPSHOT_EVERY', '20')))
+COMPACT_VERSION = 3
+# What replaying an entry needs when it was read with a projection
+REPLAY_FIELDS = ('property_id', 'seq', 'hash_version', 'snapshot', 'delta', 'changes')
+
+def is_compact(entry: dict) -> bool:
+    return (entry.get('hash_version') or 1) >= COMPACT_VERSION
+
+def _comparable(value):
+    # Mongo keeps datetimes naive UTC at millisecond precision; compare what is stored
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, dict):
+        return {k: _comparable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_comparable(v) for v in value]
+    return value
+
+def diff(prev: dict, new: dict) -> dict:
+    return {
+        'set': {k: v for k, v in new.items() if k not in prev or _comparable(prev[k]) != _comparable(v)},
+        'unset': sorted(k for k in prev if k not in new),
+    }
+
+def apply(state: dict, delta: dict) -> dict:
+    state = {**state, **delta.get('set', {})}
+    for field in delta.get('unset', []):
+        state.pop(field, None)
+    return state
+
+def compact(prev_state: Optional[dict], changes: dict, seq: int) -> dict:
+    """The stored form of `changes` at chain position `seq`"""
+    if prev_state is None or (seq - 1) % SNAPSHOT_EVERY == 0:
+        return {'snapshot': changes}
+    return {'delta': diff(prev_state, changes)}
+
+def hashed_content(entry: dict) -> dict:
+    """What an entry's hash covers: its compact record, or `changes` for older versions"""
+    if not is_compact(entry):
+        return entry['changes']
+    if entry.get('snapshot') is not None:
+        return {'snapshot': entry['snapshot']}
+    return {'delta': entry['delta']}
+
+def _replay(property_id: str, wanted: set, database) -> Dict[int, dict]:
+    """{seq: property as of that entry} for each seq in `wanted`, from one base lookup and one range read"""
+    low, high = min(wanted), max(wanted)
+    base = database.audit_logs.find_one(
+        {'property_id': property_id, 'seq': {'$lte': low},
+         '$or': [{'snapshot': {'$exists': True}}, {'changes': {'$exists': True}}]},
+        {'seq': 1, 'snapshot': 1, 'changes': 1},
+        sort=[('seq', -1)])
+    if base is None:
+        return {}
+    state = base['snapshot'] if 'snapshot' in base else base['changes']
+    states = {base['seq']: state} if base['seq'] in wanted else {}
+    if high > base['seq']:
+        for entry in database.audit_logs.find(
+                {'property_id': property_id, 'seq': {'$gt': base['seq'], '$lte': high}},
+                {'seq': 1, 'snapshot': 1, 'delta': 1, 'changes': 1},
+                sort=[('seq', 1)]):
+            if 'snapshot' in entry:
+                state = entry['snapshot']
+            elif 'changes' in entry:
+                state = entry['changes']
+            else:
+                state = apply(state, entry['delta'])
+            if entry['seq'] in wanted:
+                states[entry['seq']] = state
+    return states
+
+def materialize(entries: Iterable[dict], database=None) -> List[dict]:
+    """Fill in `changes` (the whole property) on compact entries; each property's history is read once"""
+    database = database if database is not None else db
+    entries = list(entries)
+    by_property = defaultdict(list)
+    for entry in entries:
+        if is_compact(entry):
+            if entry.get('snapshot') is not None:
+                entry['changes'] = entry['snapshot']
+            else:
+                by_property[entry['property_id']].append(entry)
+    for property_id, group in by_property.items():
+        states = _replay(property_id, {entry['seq'] for entry in group}, database)
+        for entry in group:
+            entry['changes'] = states.get(entry['seq'], {})
+    return entries
+
+def predecessors(entries: List[dict], database=None) -> List[Optional[dict]]:
+    """Each entry's previous entry in its property's chain, read with one query by (property_id, seq)
+
+    Looked up by seq rather than taken from `entries`, which may have gaps.
+    Entries from before seq (or the first one after them) chain by timestamp,
+    one lookup each.
+    """
+    database = database if database is not None else db
+    chained = [entry for entry in entries if entry.get('seq', 0) > 1]
+    found = {}
+    if chained:
+        for log in database.audit_logs.find({
+            'property_id': {'$in': list({entry['property_id'] for entry in chained})},
+            'seq': {'$in': list({entry['seq'] - 1 for entry in chained})},
+        }):
+            found[(log['property_id'], log['seq'])] = log
+    prev_logs = []
+    for entry in entries:
+        prev_log = found.get((entry['property_id'], entry.get('seq', 0) - 1))
+        if prev_log is None and entry.get('seq') != 1:
+            prev_log = database.audit_logs.find_one(
+                {'property_id': entry['property_id'], 'timestamp': {'$lt': entry['timestamp']}},
+                sort=[('timestamp', -1), ('_id', -1)])
+        prev_logs.append(prev_log)
+    return prev_logs
+
+def state_at_seq(property_id: str, seq: int, database=None) -> dict:
+    database = database if database is not None else db
+    return _replay(property_id, {seq}, database).get(seq, {})
+
+def state_at(property_id: str, as_of: datetime, database=None) -> Optional[dict]:
+    """The property as of `as_of`; None if it did not exist yet or had been deleted"""
+    database = database if database is not None else db
+    if as_of.tzinfo is not None:
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    entry = database.audit_logs.find_one(
+        {'property_id': property_id, 'timestamp': {'$lte': as_of}},
+        sort=[('timestamp', -1), ('_id', -1)])
+    if entry is None or entry['action'] == 'delete':
+        return None
+    return materialize([entry], database)[0]['changes'] or None
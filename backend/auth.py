@@ -2,8 +2,12 @@ from fastapi import Depends, HTTPException, status, APIRouter
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt, JWTError
 import hashlib
+import os
+import time
 from datetime import datetime, timedelta
-from db import db
+import repository
+from cache import MemoryBackend
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter()
 
@@ -13,6 +17,18 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# get_current_user caches verified token claims (never past the token's exp)
+# and user records by email (for AUTH_CACHE_TTL_SECONDS, dropped on change),
+# so a repeat request with the same token costs no JWT decode and no DB read.
+# Both caches are per process: invalidate_user (and any future logout or
+# password change built on it) only clears this worker, so other workers keep
+# accepting the old token and user record until their entries expire, up to
+# AUTH_CACHE_TTL_SECONDS later.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+token_cache = MemoryBackend(int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000")))
+user_cache = MemoryBackend(int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000")))
+cache_stats = {"token_hits": 0, "token_misses": 0, "user_hits": 0, "user_misses": 0}
+
 def verify_password(plain, hashed):
     return hashlib.sha256(plain.encode()).hexdigest() == hashed
 
@@ -25,15 +41,47 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_user_by_email(email: str):
-    user = db.users.find_one({"email": email})
+async def get_user_by_email(email: str):
+    user = await repository.users.by_email(email)
     if user:
         user["id"] = str(user["_id"])
         user.pop("_id", None)
     return user
 
-def authenticate_user(email: str, password: str):
-    user = get_user_by_email(email)
+def invalidate_user(email: str):
+    """Call after any change to a user record"""
+    user_cache.delete(email)
+
+async def get_cached_user(email: str):
+    user = user_cache.get(email)
+    if user is not None:
+        cache_stats["user_hits"] += 1
+    else:
+        cache_stats["user_misses"] += 1
+        user = await get_user_by_email(email)
+        if user is None:
+            return None
+        user_cache.set(email, user, AUTH_CACHE_TTL_SECONDS)
+    return dict(user)  # callers may modify their copy
+
+def decode_token(token: str):
+    """The token's subject, from cache while the token is still valid"""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        cache_stats["token_hits"] += 1
+        return claims["sub"]
+    cache_stats["token_misses"] += 1
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    email = payload.get("sub")
+    if email is not None and "exp" in payload:
+        ttl = min(payload["exp"] - time.time(), AUTH_CACHE_TTL_SECONDS)
+        if ttl > 0:
+            token_cache.set(key, {"sub": email}, ttl)
+    return email
+
+async def authenticate_user(email: str, password: str):
+    user = await get_user_by_email(email)
     if not user or not verify_password(password, user["password"]):
         return None
     return user
@@ -45,36 +93,44 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
+        email = decode_token(token)
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = get_user_by_email(email)
+    user = await get_cached_user(email)
     if user is None:
         raise credentials_exception
     return user
 
 @router.post("/register")
-def register(email: str, password: str, name: str = ""):
-    if db.users.find_one({"email": email}):
+async def register(email: str, password: str, name: str = ""):
+    if await repository.users.by_email(email):
         raise HTTPException(status_code=400, detail="Email already registered")
     hashed = get_password_hash(password)
     user = {"email": email, "password": hashed, "name": name}
-    result = db.users.insert_one(user)
-    user["id"] = str(result.inserted_id)
+    try:
+        user_id = await repository.users.insert(user)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    user.pop("_id", None)
+    user["id"] = user_id
     user.pop("password")
+    invalidate_user(email)
     return user
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     access_token = create_access_token(data={"sub": user["email"]})
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.get("/auth/cache")
+def auth_cache_stats(current_user: dict = Depends(get_current_user)):
+    return cache_stats
+
 @router.get("/me")
 def read_users_me(current_user: dict = Depends(get_current_user)):
     user = current_user.copy()
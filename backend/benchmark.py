@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Load and micro benchmarks for the backend. Routes are driven in process
+# through the ASGI app (no network), against mongomock by default or a real
+# mongod with --backend mongod (uses MONGO_URI / DB_NAME; point DB_NAME at a
+# scratch database, it is wiped first). Startup hooks are not run, so no
+# trainer or sealer processes are spawned.
+#
+#   python benchmark.py --properties 5000 --requests 5000 --concurrency 32 --output bench.json
+#   python benchmark.py --compare bench.json --max-regression 0.2
+
+DEFAULT_MIX = 'get=6,list=4,audit=2,update=2,create=1,login=1'
+ROUTES = {
+    'create': 'POST /properties',
+    'update': 'PUT /properties/{id}',
+    'list': 'GET /properties',
+    'get': 'GET /properties/{id}',
+    'audit': 'GET /properties/{id}/audit',
+    'login': 'POST /login',
+}
+PASSWORD = 'benchmark-password'
+
+def use_mongomock():
+    """Swap both Mongo clients for in-memory ones sharing a store; before importing db"""
+    try:
+        import mongomock
+        import mongomock_motor
+    except ImportError:
+        sys.exit('The mongomock backend needs: pip install mongomock mongomock-motor')
+    import pymongo
+    import motor.motor_asyncio
+    pymongo.MongoClient = mongomock.MongoClient
+
+    def async_client(*args, **kwargs):
+        import db
+        return mongomock_motor.AsyncMongoMockClient(mock_mongo_client=db.client)
+    motor.motor_asyncio.AsyncIOMotorClient = async_client
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ROUTES:
+            raise SystemExit(f'Unknown route in mix: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentiles(samples: list) -> dict:
+    import numpy as np
+    values = np.array(samples) * 1000
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean()),
+    }
+
+def property_body(rng: random.Random, owner: dict) -> dict:
+    towns = ['New York, NY', 'Austin, TX', 'San Francisco, CA', 'Seattle, WA', 'Denver, CO', 'Miami, FL']
+    terms = ['12-month lease', 'Full payment upfront', 'Installments allowed', 'Deposit of two months rent required']
+    return {
+        'owner': {'name': owner['name'], 'email': owner['email']},
+        'buyer_intent': rng.choice(['sale', 'rent']),
+        'location': f'{rng.randint(1, 999)} {rng.choice(["Main", "Oak", "Pine"])} St, {rng.choice(towns)}',
+        'verification': rng.choice(['verified', 'pending']),
+        'terms': rng.choice(terms),
+    }
+
+def seed(n_users: int, n_properties: int, rng: random.Random):
+    """Users directly, properties through the bulk importer (so audit chains are real)"""
+    from db import db, ensure_indexes
+    import bulk_import
+    from auth import get_password_hash
+    for name in db.list_collection_names():
+        db[name].delete_many({})
+    ensure_indexes()
+    users = [{'name': f'User {i}', 'email': f'user{i}@bench.local', 'password': get_password_hash(PASSWORD)}
+             for i in range(n_users)]
+    db.users.insert_many(users)
+    rows = ((i, property_body(rng, rng.choice(users))) for i in range(1, n_properties + 1))
+    ids = [r['id'] for r in bulk_import.import_rows(rows) if r.get('status') == 'created']
+    return users, ids
+
+async def drive(app, users: list, ids: list, mix: dict, total: int, concurrency: int, rng: random.Random) -> dict:
+    import httpx
+    names, weights = list(mix), list(mix.values())
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    ops = rng.choices(names, weights, k=total)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def call(op):
+            user = rng.choice(users)
+            if op == 'create':
+                return await client.post('/properties', json=property_body(rng, user))
+            if op == 'list':
+                return await client.get('/properties', params={'limit': 50})
+            if op == 'login':
+                return await client.post('/login', data={'username': user['email'], 'password': PASSWORD})
+            property_id = rng.choice(ids)
+            if op == 'get':
+                return await client.get(f'/properties/{property_id}')
+            if op == 'audit':
+                return await client.get(f'/properties/{property_id}/audit')
+            body = {**property_body(rng, user), 'id': property_id}
+            body['owner']['id'] = None
+            return await client.put(f'/properties/{property_id}', json=body)
+
+        queue = asyncio.Queue()
+        for op in ops:
+            queue.put_nowait(op)
+
+        async def worker():
+            while not queue.empty():
+                op = queue.get_nowait()
+                start = time.perf_counter()
+                response = await call(op)
+                latencies[op].append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors[op] += 1
+                elif op == 'create':
+                    ids.append(response.json()['id'])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    routes = {}
+    for name in names:
+        if latencies[name]:
+            routes[ROUTES[name]] = {
+                'requests': len(latencies[name]),
+                'errors': errors[name],
+                'throughput_rps': len(latencies[name]) / elapsed,
+                **percentiles(latencies[name]),
+            }
+    return {'elapsed_s': elapsed, 'total_rps': total / elapsed, 'routes': routes}
+
+def best_of(fn, number: int, repeat: int = 5) -> float:
+    """Best per-call time in microseconds over `repeat` runs of `number` calls"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / number * 1e6
+
+def micro(rng: random.Random) -> dict:
+    from bson import ObjectId
+    from db import db
+    from main import doc_to_dict
+    from verification import ScoringContext, fraud_detector, hash_property_data
+    doc = {'_id': ObjectId(), **property_body(rng, {'name': 'Bench', 'email': 'bench@bench.local'}),
+           'created_at': datetime.utcnow(), 'updated_at': datetime.utcnow()}
+    changes = {**doc, 'id': str(doc.pop('_id'))}
+    user = {'name': 'Bench', 'email': 'bench@bench.local', 'id': None}
+    prev_log = db.audit_logs.find_one(sort=[('timestamp', -1)])
+    doc['_id'] = ObjectId()
+
+    results = {
+        'doc_to_dict_us': best_of(lambda: doc_to_dict(doc), 2000),
+        'hash_property_data_us': best_of(lambda: hash_property_data(changes, 'ab' * 32), 2000),
+        'prepare_features_us': best_of(
+            lambda: fraud_detector.prepare_features(changes, user, prev_log, ScoringContext(user, prev_log)), 200),
+    }
+    start = time.perf_counter()
+    fraud_detector.train_model()
+    results['train_model_ms'] = (time.perf_counter() - start) * 1000
+    results['detect_fraud_us'] = best_of(lambda: fraud_detector.detect_fraud(changes, user, prev_log), 50, repeat=3)
+    return results
+
+def compare(current: dict, baseline: dict, max_regression: float) -> bool:
+    """Print metric deltas against a saved run; False if any got worse by more than max_regression"""
+    ok = True
+    pairs = []
+    for route, stats in current['routes'].items():
+        old = baseline.get('routes', {}).get(route)
+        if old:
+            pairs += [(f'{route} {m}', stats[m], old[m], m.endswith('_ms')) for m in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')]
+    for name, value in current.get('micro', {}).items():
+        if name in baseline.get('micro', {}):
+            pairs.append((name, value, baseline['micro'][name], True))
+    for name, new, old, lower_is_better in pairs:
+        change = (new - old) / old if old else 0.0
+        worse = change > max_regression if lower_is_better else -change > max_regression
+        ok &= not worse
+        print(f"{'REGRESSED ' if worse else '          '}{name:45s} {old:12.2f} -> {new:12.2f} ({change:+.1%})")
+    return ok
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark backend routes and hot functions')
+    parser.add_argument('--backend', choices=['mongomock', 'mongod'], default='mongomock')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--properties', type=int, default=1000, help='listings seeded before the run')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='route=weight pairs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='results JSON from an earlier run')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='with --compare, exit 1 if any metric is this much worse')
+    args = parser.parse_args()
+
+    # No background processes or persisted models from a real deployment
+    os.environ.setdefault('MERKLE_SEAL_SECONDS', '0')
+    os.environ.setdefault('FRAUD_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fraud_models', 'benchmark'))
+    if args.backend == 'mongomock':
+        use_mongomock()
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    users, ids = seed(args.users, args.properties, rng)
+    seed_seconds = time.perf_counter() - start
+    from main import app
+    load = asyncio.run(drive(app, users, ids, parse_mix(args.mix), args.requests, args.concurrency, rng))
+
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'seed_seconds': seed_seconds,
+            **{k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        },
+        **load,
+    }
+    if not args.skip_micro:
+        results['micro'] = micro(rng)
+
+    print(f"{'route':32s} {'reqs':>6s} {'rps':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errors':>6s}")
+    for route, s in results['routes'].items():
+        print(f"{route:32s} {s['requests']:6d} {s['throughput_rps']:9.1f} {s['p50_ms']:9.2f} "
+              f"{s['p95_ms']:9.2f} {s['p99_ms']:9.2f} {s['errors']:6d}")
+    print(f"total {results['total_rps']:.1f} req/s over {results['elapsed_s']:.2f}s")
+    for name, value in results.get('micro', {}).items():
+        print(f'{name:32s} {value:12.2f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if not compare(results, json.load(f), args.max_regression):
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
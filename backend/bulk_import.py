@@ -0,0 +1,159 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import IO, Iterable, Iterator, List, Tuple
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, PyMongoError
+from db import db
+import cache
+from models import PropertyCreate
+from verification import log_audit_new
+import location_stats
+import duplicates
+import events
+import search
+
+# Bulk property import: rows arrive as NDJSON (one object per line) or CSV
+# (header row; nested owner fields as owner.name / owner.email columns) and
+# are validated, inserted, audited and fraud-scored one chunk at a time. Each
+# input row yields exactly one result line, in input order.
+
+CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', '500'))
+SPOOL_BYTES = 8 * 1024 * 1024  # request bodies larger than this spool to disk
+
+def _text_lines(body: IO[bytes]) -> Iterator[str]:
+    """UTF-8 lines from a binary file without loading it whole"""
+    # newline='' leaves quoted line breaks inside CSV fields to the csv module
+    return io.TextIOWrapper(body, encoding='utf-8-sig', newline='')
+
+def parse_ndjson(body: IO[bytes]) -> Iterator[Tuple[int, object]]:
+    for row, line in enumerate(_text_lines(body), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, ValueError(f'Invalid JSON: {e}')
+
+def _nest(flat: dict) -> dict:
+    """owner.name -> {'owner': {'name': ...}}; empty cells become None"""
+    doc = {}
+    for key, value in flat.items():
+        if key is None:
+            continue
+        if value == '':
+            value = None
+        *parents, leaf = key.strip().split('.')
+        target = doc
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+    return doc
+
+def parse_csv(body: IO[bytes]) -> Iterator[Tuple[int, object]]:
+    # Records are numbered from 1 like NDJSON lines, not counting the header
+    for row, flat in enumerate(csv.DictReader(_text_lines(body)), start=1):
+        if None in flat:
+            yield row, ValueError('More values than header columns')
+        else:
+            yield row, _nest(flat)
+
+def validate(raw) -> Tuple[dict, list]:
+    """(property dict, None) for a valid row, (None, errors) otherwise"""
+    if isinstance(raw, Exception):
+        return None, [{'loc': '', 'msg': str(raw)}]
+    if not isinstance(raw, dict):
+        return None, [{'loc': '', 'msg': 'Expected an object'}]
+    try:
+        return PropertyCreate(**raw).document(), None
+    except ValidationError as e:
+        return None, [{'loc': '.'.join(str(part) for part in err['loc']), 'msg': err['msg']} for err in e.errors()]
+
+def import_chunk(chunk: List[Tuple[int, dict]]) -> List[dict]:
+    """Insert, audit and score one chunk of validated rows; one result per row"""
+    now = datetime.utcnow()
+    docs = []
+    for _, prop in chunk:
+        prop['created_at'] = prop['updated_at'] = now
+        docs.append({**prop, 'search': search.search_fields(prop)})
+    failed = {}
+    try:
+        db.properties.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {err['index']: err.get('errmsg', 'write failed') for err in e.details.get('writeErrors', [])}
+    except PyMongoError as e:
+        return [{'row': row, 'status': 'failed', 'errors': [{'loc': '', 'msg': str(e)}]} for row, _ in chunk]
+
+    created = []
+    for i, ((_, prop), doc) in enumerate(zip(chunk, docs)):
+        if i in failed:
+            continue
+        # Same snapshot create_property audits: string id, owner id present, no search keys
+        prop['id'] = str(doc['_id'])
+        prop['owner'].setdefault('id', None)
+        created.append(prop)
+    if created:
+        cache.invalidate_lists()
+    location_stats.record_many(created)
+    duplicates.record_many(created)
+    entries = log_audit_new([(prop['id'], 'create', prop, prop['owner']) for prop in created])
+    events.broker.publish([event for prop, entry in zip(created, entries)
+                           for event in events.write_events('create', prop['id'], prop, entry)])
+    scored = iter(entries)
+
+    results = []
+    for i, (row, prop) in enumerate(chunk):
+        if i in failed:
+            results.append({'row': row, 'status': 'failed', 'errors': [{'loc': '', 'msg': failed[i]}]})
+            continue
+        entry = next(scored)
+        results.append({
+            'row': row,
+            'status': 'created',
+            'id': prop['id'],
+            'fraud_status': entry['fraud_status'],
+            'fraud_detected': entry['fraud_detected'],
+        })
+    return results
+
+def import_rows(rows: Iterable[Tuple[int, object]], chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Result per input row, then a final summary; rows are written chunk_size at a time"""
+    counts = {'rows': 0, 'created': 0, 'invalid': 0, 'failed': 0}
+    pending = []   # (row, result-or-None) in input order for the current chunk
+    chunk = []
+
+    def flush():
+        results = iter(import_chunk(chunk) if chunk else [])
+        for row, result in pending:
+            yield result if result is not None else next(results)
+        pending.clear()
+        chunk.clear()
+
+    for row, raw in rows:
+        counts['rows'] += 1
+        prop, errors = validate(raw)
+        if errors:
+            pending.append((row, {'row': row, 'status': 'invalid', 'errors': errors}))
+        else:
+            pending.append((row, None))
+            chunk.append((row, prop))
+        if len(pending) >= chunk_size:
+            for result in flush():
+                counts[result['status']] += 1
+                yield result
+    for result in flush():
+        counts[result['status']] += 1
+        yield result
+    yield {'summary': counts}
+
+def import_stream(body: IO[bytes], fmt: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """NDJSON result lines for a spooled request body; closes the body when done"""
+    try:
+        rows = parse_csv(body) if fmt == 'csv' else parse_ndjson(body)
+        for result in import_rows(rows, chunk_size):
+            yield (json.dumps(result) + '\n').encode('utf-8')
+    finally:
+        body.close()
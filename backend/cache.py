@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Serialized responses for the hot property reads, each stored with its ETag.
+# Keys embed a generation number per scope (one property, one audit trail,
+# every list page, or the dashboard stats); a write invalidates by bumping the generation, so an
+# entry built from a read that raced with the write lands under the old
+# generation and is never served. Old entries age out by LRU/TTL.
+#
+# The default backend is per process. A write bumps the generations only in
+# the worker that handled it, so with several workers the others keep serving
+# (and answering 304 for) the old response until its entry expires, up to
+# CACHE_TTL_SECONDS later. Lower the TTL if that window matters, or set
+# CACHE_URL to a redis:// URL (needs the redis package, which is optional and
+# not in requirements.txt) to share entries and generations across workers.
+
+TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', '30'))
+MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+CACHE_URL = os.getenv('CACHE_URL')
+
+LIST_SCOPE = 'properties'
+STATS_SCOPE = 'stats'  # dashboard summary; its time windows also roll over within the TTL
+
+class MemoryBackend:
+    """LRU with per-entry expiry; generations live outside the LRU so they never reset"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def generation(self, scope: str) -> int:
+        with self._lock:
+            return self._generations.get(scope, 0)
+
+    def bump(self, scope: str):
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+class RedisBackend:
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_URL is set but the redis package is not installed: pip install redis') from None
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self.client.get('cache:' + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, value: dict, ttl: float):
+        self.client.set('cache:' + key, json.dumps(value), px=int(ttl * 1000))
+
+    def delete(self, key: str):
+        self.client.delete('cache:' + key)
+
+    def generation(self, scope: str) -> int:
+        return int(self.client.get('cache-gen:' + scope) or 0)
+
+    def bump(self, scope: str):
+        self.client.incr('cache-gen:' + scope)
+
+    def clear(self):
+        for key in self.client.scan_iter('cache*'):
+            self.client.delete(key)
+
+backend = RedisBackend(CACHE_URL) if CACHE_URL else MemoryBackend()
+
+def property_scope(property_id: str) -> str:
+    return f'property:{property_id}'
+
+def audit_scope(property_id: str) -> str:
+    return f'audit:{property_id}'
+
+def key_for(scope: str, *parts: str) -> str:
+    return ':'.join([scope, str(backend.generation(scope)), *parts])
+
+def make_entry(body: bytes, headers: Optional[dict] = None) -> dict:
+    # Hashing the body (not just updated_at or the chain head) also catches
+    # updates that keep updated_at and async fraud results landing on entries
+    return {
+        'etag': '"' + hashlib.sha1(body).hexdigest() + '"',
+        'body': body.decode('utf-8'),
+        'headers': headers or {},
+    }
+
+def get(key: str) -> Optional[dict]:
+    return backend.get(key)
+
+def put(key: str, entry: dict):
+    backend.set(key, entry, TTL_SECONDS)
+
+def invalidate_property(property_id: str):
+    """After any write to a property: its document, its audit trail, every list page and the stats"""
+    backend.bump(property_scope(property_id))
+    backend.bump(audit_scope(property_id))
+    backend.bump(LIST_SCOPE)
+    backend.bump(STATS_SCOPE)
+
+def invalidate_lists():
+    backend.bump(LIST_SCOPE)
+    backend.bump(STATS_SCOPE)
+
+def invalidate_audit(property_id: str):
+    backend.bump(audit_scope(property_id))
+    backend.bump(STATS_SCOPE)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison, as If-None-Match calls for
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return any(tag.removeprefix('W/') == etag for tag in tags)
@@ -1,11 +1,154 @@
 import os
-from pymongo import MongoClient
+import sys
+from datetime import datetime
+from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING
 from dotenv import load_dotenv
+import metrics
 
 load_dotenv()
 
 MONGO_URI = os.getenv('MONGO_URI')
 DB_NAME = os.getenv('DB_NAME', 'property_db')
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME] 
\ No newline at end of file
+# Pool and timeout settings shared by this client and the async one in
+# repository.py; unset values keep the driver defaults. Both clients also
+# report every command to the metrics listener.
+_CLIENT_SETTINGS = {
+    'maxPoolSize': 'MONGO_MAX_POOL_SIZE',
+    'minPoolSize': 'MONGO_MIN_POOL_SIZE',
+    'maxIdleTimeMS': 'MONGO_MAX_IDLE_TIME_MS',
+    'waitQueueTimeoutMS': 'MONGO_WAIT_QUEUE_TIMEOUT_MS',
+    'connectTimeoutMS': 'MONGO_CONNECT_TIMEOUT_MS',
+    'socketTimeoutMS': 'MONGO_SOCKET_TIMEOUT_MS',
+    'serverSelectionTimeoutMS': 'MONGO_SERVER_SELECTION_TIMEOUT_MS',
+}
+
+def client_options() -> dict:
+    options = {option: int(os.environ[env]) for option, env in _CLIENT_SETTINGS.items() if os.getenv(env)}
+    options['event_listeners'] = [metrics.command_listener]
+    return options
+
+client = MongoClient(MONGO_URI, **client_options())
+db = client[DB_NAME]
+
+# Every index the backend relies on, per collection. create_indexes is a no-op
+# for indexes that already exist with the same spec, so this is safe on every start.
+INDEXES = {
+    'users': [
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+    ],
+    'properties': [
+        IndexModel([('updated_at', DESCENDING), ('_id', DESCENDING)], name='updated_at_id'),
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at_id'),
+        IndexModel([('buyer_intent', ASCENDING), ('location', ASCENDING), ('updated_at', DESCENDING), ('_id', DESCENDING)],
+                   name='intent_location_updated_at'),
+        IndexModel([('location', ASCENDING), ('updated_at', DESCENDING), ('_id', DESCENDING)], name='location_updated_at'),
+        IndexModel([('verification', ASCENDING), ('updated_at', DESCENDING), ('_id', DESCENDING)], name='verification_updated_at'),
+        # Multikey indexes over the derived keys in search.py
+        IndexModel([('search.loc', ASCENDING)], name='search_location_tokens'),
+        IndexModel([('search.pre', ASCENDING)], name='search_location_prefixes'),
+        IndexModel([('search.tri', ASCENDING)], name='search_location_trigrams'),
+        IndexModel([('search.terms', ASCENDING)], name='search_terms_tokens'),
+    ],
+    'audit_logs': [
+        # History pages walk this in either direction; also the legacy chain-tip lookup
+        IndexModel([('property_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)], name='property_timestamp_id'),
+        # Appends race on this: one entry per chain position (entries from before seq are exempt)
+        IndexModel([('property_id', ASCENDING), ('seq', DESCENDING)], name='property_seq_unique', unique=True,
+                   partialFilterExpression={'seq': {'$exists': True}}),
+        IndexModel([('user.id', ASCENDING), ('timestamp', DESCENDING)], name='user_timestamp'),
+        IndexModel([('timestamp', DESCENDING), ('_id', DESCENDING)], name='timestamp_id'),
+        IndexModel([('fraud_status', ASCENDING), ('timestamp', ASCENDING)], name='fraud_status_timestamp'),
+        IndexModel([('merkle_batch', ASCENDING), ('_id', ASCENDING)], name='merkle_batch_id'),
+        # Entries claimed for a batch that is not sealed yet (merkle.py)
+        IndexModel([('merkle_pending', ASCENDING), ('merkle_index', ASCENDING)], name='merkle_pending_index',
+                   partialFilterExpression={'merkle_pending': {'$exists': True}}),
+    ],
+    'listing_signatures': [
+        # LSH band keys of each MinHash signature (duplicates.py)
+        IndexModel([('bands', ASCENDING)], name='bands'),
+    ],
+    'risk_assessments': [
+        IndexModel([('user_id', ASCENDING), ('timestamp', DESCENDING)], name='user_timestamp'),
+        IndexModel([('timestamp', DESCENDING)], name='timestamp'),
+        # One re-scoring result per entry and scoring version (rescore.py)
+        IndexModel([('audit_log_id', ASCENDING), ('scoring_version', ASCENDING)], name='audit_log_scoring_version'),
+    ],
+}
+
+# (description, collection, filter, sort) for each query on a request path.
+# Values are placeholders: the planner picks an index regardless of matches.
+_SAMPLE_TS = datetime(2000, 1, 1)
+HOT_QUERIES = [
+    ('auth.get_user_by_email', 'users', {'email': 'probe@example.com'}, None),
+    ('log_audit legacy chain tip', 'audit_logs', {'property_id': 'probe'}, [('timestamp', -1)]),
+    ('log_audit append conflict', 'audit_logs', {'property_id': 'probe', 'seq': {'$exists': True}}, [('seq', -1)]),
+    ('FraudDetector user history', 'audit_logs', {'user.id': 'probe'}, [('timestamp', -1)]),
+    ('FraudDetector.train_model', 'audit_logs', {}, [('timestamp', -1)]),
+    ('FraudDetector previous log', 'audit_logs', {'property_id': 'probe', 'timestamp': {'$lt': _SAMPLE_TS}}, [('timestamp', -1)]),
+    ('audit history page', 'audit_logs', {'property_id': 'probe'}, [('timestamp', -1), ('_id', -1)]),
+    ('audit replay base', 'audit_logs', {'property_id': 'probe', 'seq': {'$lte': 5},
+                             '$or': [{'snapshot': {'$exists': True}}, {'changes': {'$exists': True}}]}, [('seq', -1)]),
+    ('audit replay range', 'audit_logs', {'property_id': 'probe', 'seq': {'$gt': 1, '$lte': 5}}, [('seq', 1)]),
+    ('property as_of', 'audit_logs', {'property_id': 'probe', 'timestamp': {'$lte': _SAMPLE_TS}}, [('timestamp', -1), ('_id', -1)]),
+    ('audit history page by action', 'audit_logs', {'property_id': 'probe', 'action': 'update'}, [('timestamp', 1), ('_id', 1)]),
+    ('list_properties', 'properties', {}, [('updated_at', -1), ('_id', -1)]),
+    ('list_properties by intent', 'properties', {'buyer_intent': 'sale'}, [('updated_at', -1), ('_id', -1)]),
+    ('list_properties by intent+location', 'properties', {'buyer_intent': 'sale', 'location': 'probe'}, [('updated_at', -1), ('_id', -1)]),
+    ('list_properties by location', 'properties', {'location': 'probe'}, [('updated_at', -1), ('_id', -1)]),
+    ('list_properties by verification', 'properties', {'verification': 'verified'}, [('updated_at', -1), ('_id', -1)]),
+    ('scoring_queue pending sweep', 'audit_logs', {'fraud_status': 'pending'}, [('timestamp', 1)]),
+    ('merkle seal_batch unsealed entries', 'audit_logs', {'merkle_batch': None, 'merkle_pending': {'$exists': False}}, [('_id', 1)]),
+    ('merkle seal_batch pending entries', 'audit_logs', {'merkle_pending': {'$exists': True}}, [('merkle_pending', 1)]),
+    ('search by location prefix', 'properties', {'search.pre': 'ne'}, None),
+    ('search by token', 'properties', {'search.terms': 'probe'}, None),
+    ('search fuzzy', 'properties', {'search.tri': {'$in': ['  p', ' pr', 'pro']}}, None),
+    ('stats recent activity', 'audit_logs', {'timestamp': {'$gte': _SAMPLE_TS}}, None),
+    ('stats fraud rate', 'risk_assessments', {'timestamp': {'$gte': _SAMPLE_TS}}, None),
+    ('properties export', 'properties', {'updated_at': {'$gte': _SAMPLE_TS}}, [('updated_at', 1), ('_id', 1)]),
+    ('audit export', 'audit_logs', {'timestamp': {'$gte': _SAMPLE_TS}}, [('timestamp', 1), ('_id', 1)]),
+    ('duplicate candidates', 'listing_signatures', {'bands': {'$in': ['00probe', '01probe']}}, None),
+    ('check_price_anomaly market context', 'properties', {'location': 'probe'}, None),
+]
+
+def ensure_indexes(database=None):
+    database = database if database is not None else db
+    created = {}
+    for collection, indexes in INDEXES.items():
+        created[collection] = database[collection].create_indexes(indexes)
+    return created
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+def check_query_plans(database=None, queries=None):
+    """Explain each hot query and return the ones whose winning plan is a COLLSCAN"""
+    database = database if database is not None else db
+    failures = []
+    for name, collection, query, sort in (queries or HOT_QUERIES):
+        cursor = database[collection].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning = cursor.explain()['queryPlanner']['winningPlan']
+        if 'COLLSCAN' in set(_plan_stages(winning)):
+            failures.append(name)
+    return failures
+
+if __name__ == '__main__':
+    # python db.py [--check]: build indexes, optionally verify no hot query scans
+    ensure_indexes()
+    print('Indexes ensured')
+    if '--check' in sys.argv[1:]:
+        failures = check_query_plans()
+        for name in failures:
+            print(f'COLLSCAN: {name}')
+        if failures:
+            sys.exit(1)
+        print('All hot queries use an index')
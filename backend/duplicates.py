@@ -0,0 +1,161 @@
+import hashlib
+import os
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from bson import ObjectId
+from pymongo import ReplaceOne
+from db import db
+from search import tokenize
+
+# Near-duplicate listings via MinHash + LSH. Each property's normalized
+# location and terms (as character shingles) plus its owner become a
+# NUM_PERM-value MinHash signature, kept in `listing_signatures` with its
+# LSH band keys behind a multikey index. Two listings share at least one band
+# with probability 1 - (1 - J^ROWS)^BANDS for Jaccard similarity J (about
+# 0.9998 at J=0.8 and 0.64 at J=0.5 with the defaults), so a lookup is a few
+# index seeks plus a vectorized signature comparison over the candidates,
+# never a scan over every listing. Signatures are written alongside location
+# stats on every create, update and delete; `python duplicates.py` backfills.
+# Scoring an entry as of a past time only matches listings created by then
+# (from their ObjectId), though against their current content.
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+MAX_CANDIDATES = int(os.getenv('DUPLICATE_MAX_CANDIDATES', '500'))
+DUPLICATE_SIMILARITY = float(os.getenv('DUPLICATE_SIMILARITY', '0.8'))
+
+_PRIME = (1 << 31) - 1
+# Fixed seed: signatures are stored, so every process must hash alike
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, _PRIME, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM).astype(np.uint64)
+
+def shingles(doc: dict) -> set:
+    result = set()
+    for field in ('location', 'terms'):
+        text = ' '.join(tokenize(doc.get(field)))
+        if not text:
+            continue
+        if len(text) <= SHINGLE:
+            result.add(f'{field}:{text}')
+        else:
+            result.update(f'{field}:{text[i:i + SHINGLE]}' for i in range(len(text) - SHINGLE + 1))
+    owner = owner_key(doc)
+    if owner:
+        result.add('owner:' + owner)
+    return result
+
+def owner_key(doc: dict) -> Optional[str]:
+    email = (doc.get('owner') or {}).get('email')
+    return email.strip().lower() if email else None
+
+def signature(doc: dict) -> Optional[np.ndarray]:
+    items = shingles(doc)
+    if not items:
+        return None
+    x = np.array([zlib.crc32(s.encode('utf-8')) & _PRIME for s in items], dtype=np.uint64)
+    return ((np.outer(x, _A) + _B) % _PRIME).min(axis=0)
+
+def band_keys(sig: np.ndarray) -> List[str]:
+    # The band number is part of the key so equal rows in different bands don't collide
+    return [f'{band:02d}' + hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).hexdigest()
+            for band in range(BANDS)]
+
+def signature_entry(property_id: str, doc: dict) -> Optional[dict]:
+    """The listing_signatures document for a listing; None if it has nothing to shingle"""
+    sig = signature(doc)
+    if sig is None:
+        return None
+    return {'_id': property_id, 'sig': sig.tolist(), 'bands': band_keys(sig), 'owner': owner_key(doc)}
+
+def record_change(property_id: str, new: Optional[dict]):
+    """Re-index a listing after a write; new is the document after it (None once deleted)"""
+    entry = signature_entry(property_id, new) if new else None
+    if entry is None:
+        db.listing_signatures.delete_one({'_id': property_id})
+    else:
+        db.listing_signatures.replace_one({'_id': property_id}, entry, upsert=True)
+
+def record_many(docs: List[dict]):
+    """Index many new listings (each with its string `id`) in one bulk write"""
+    ops = [ReplaceOne({'_id': entry['_id']}, entry, upsert=True)
+           for entry in (signature_entry(doc['id'], doc) for doc in docs) if entry]
+    if ops:
+        db.listing_signatures.bulk_write(ops, ordered=False)
+
+def _rank(sig: np.ndarray, pool: List[dict], min_similarity: float, limit: int) -> List[dict]:
+    # The fraction of agreeing MinHash values estimates Jaccard similarity
+    if not pool:
+        return []
+    scores = (np.array([c['sig'] for c in pool], dtype=np.uint64) == sig).mean(axis=1)
+    found = [{'id': c['_id'], 'owner': c.get('owner'), 'similarity': float(score)}
+             for c, score in zip(pool, scores) if score >= min_similarity]
+    found.sort(key=lambda m: (-m['similarity'], m['id']))
+    return found[:limit]
+
+def _created_by(listing_id: str, as_of: Optional[datetime]) -> bool:
+    if as_of is None or not ObjectId.is_valid(listing_id):
+        return True
+    return ObjectId(listing_id).generation_time.replace(tzinfo=None) <= as_of
+
+def matches(doc: dict, exclude: Optional[str] = None, min_similarity: float = DUPLICATE_SIMILARITY,
+            limit: int = 10, as_of: Optional[datetime] = None) -> List[dict]:
+    """Listings whose estimated similarity to `doc` is at least min_similarity, most similar first"""
+    return matches_many([(doc, exclude)], min_similarity, limit, as_of=[as_of])[0]
+
+def matches_many(items: List[Tuple[dict, Optional[str]]], min_similarity: float = DUPLICATE_SIMILARITY,
+                 limit: int = 10, as_of: Optional[List[Optional[datetime]]] = None) -> List[List[dict]]:
+    """matches for many (doc, exclude_id) at once, with one candidate query for all of them
+
+    With `as_of`, each row only matches listings created by its own point in time.
+    """
+    sigs = [signature(doc) for doc, _ in items]
+    keys = [band_keys(sig) if sig is not None else [] for sig in sigs]
+    wanted = sorted({key for row in keys for key in row})
+    if not wanted:
+        return [[] for _ in items]
+    candidates = list(db.listing_signatures.find(
+        {'bands': {'$in': wanted}}, limit=MAX_CANDIDATES * len(items)))
+    by_band: Dict[str, List[dict]] = {}
+    for candidate in candidates:
+        for key in candidate['bands']:
+            by_band.setdefault(key, []).append(candidate)
+    results = []
+    for (_, exclude), sig, row, when in zip(items, sigs, keys, as_of or [None] * len(items)):
+        pool = {c['_id']: c for key in row for c in by_band.get(key, [])
+                if c['_id'] != exclude and _created_by(c['_id'], when)}
+        results.append(_rank(sig, list(pool.values())[:MAX_CANDIDATES], min_similarity, limit) if row else [])
+    return results
+
+def similar_to(property_id: str, min_similarity: float, limit: int) -> Optional[List[dict]]:
+    """Matches for a stored listing; None if it has no signature"""
+    entry = db.listing_signatures.find_one({'_id': property_id})
+    if entry is None:
+        return None
+    sig = np.array(entry['sig'], dtype=np.uint64)
+    pool = [c for c in db.listing_signatures.find({'bands': {'$in': entry['bands']}}, limit=MAX_CANDIDATES + 1)
+            if c['_id'] != property_id][:MAX_CANDIDATES]
+    return _rank(sig, pool, min_similarity, limit)
+
+def backfill(batch_size: int = 1000) -> int:
+    """Write signatures for every property (after deploying, or when the shingling changes)"""
+    indexed = 0
+    batch = []
+    for doc in db.properties.find({}, {'location': 1, 'terms': 1, 'owner': 1}):
+        doc['id'] = str(doc.pop('_id'))
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            record_many(batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        record_many(batch)
+        indexed += len(batch)
+    return indexed
+
+if __name__ == '__main__':
+    print(f'Indexed {backfill()} properties')
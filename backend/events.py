@@ -0,0 +1,219 @@
+import asyncio
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from typing import AsyncIterator, List, Optional
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import OperationFailure
+
+# Change feed behind GET /properties/events, sent as server-sent events:
+#   property.created / property.updated  data is the listing as GET /properties returns it
+#   property.deleted                     data is {id}
+#   audit.appended                       the new audit entry, without its snapshot/delta
+#                                        (fraud_detected is already true if it scored as fraud on write)
+#   fraud.flagged                        an audit entry that scored as fraud after it was appended
+#                                        (async scoring queue, rescore.py)
+#   reset                                the client missed events and should refetch
+# Every database change yields at most one event, so each event has its own
+# SSE id, and that id is a resume token: EventSource sends it back as
+# Last-Event-ID when it reconnects (or pass ?resume=), and the feed carries on
+# from there. With EVENTS_SOURCE=auto (the default) a Mongo change stream
+# drives the feed when the deployment supports one (replica sets), so it sees
+# writes from every worker and CLI; otherwise it falls back to an in-process
+# broker fed by the write routes, which only sees this worker's writes and
+# can replay the last EVENTS_BUFFER of them.
+
+SOURCE = os.getenv('EVENTS_SOURCE', 'auto')  # auto | changestream | memory
+BUFFER = int(os.getenv('EVENTS_BUFFER', '1000'))
+HEARTBEAT_SECONDS = float(os.getenv('EVENTS_HEARTBEAT_SECONDS', '15'))
+RETRY_MS = 3000
+
+AUDIT_EVENT_FIELDS = ('property_id', 'action', 'seq', 'hash', 'prev_hash', 'hash_version', 'timestamp', 'user',
+                      'fraud_status', 'fraud_detected', 'fraud_reason')
+
+def _event(name: str, data: dict) -> dict:
+    return {'event': name, 'data': jsonable_encoder(data)}
+
+def property_payload(property_id: str, doc: dict) -> dict:
+    row = {k: v for k, v in doc.items() if k not in ('_id', 'search')}
+    row['id'] = property_id
+    if 'owner' in row and 'id' not in row['owner']:
+        row['owner'] = {**row['owner'], 'id': None}
+    return row
+
+def audit_payload(entry: dict) -> dict:
+    return {'id': str(entry['_id']), **{field: entry[field] for field in AUDIT_EVENT_FIELDS if field in entry}}
+
+def audit_event(entry: dict) -> dict:
+    return _event('audit.appended', audit_payload(entry))
+
+def write_events(action: str, property_id: str, doc: Optional[dict], entry: Optional[dict]) -> List[dict]:
+    """Events for one write route call: the listing change, then its audit entry"""
+    if action == 'delete' or doc is None:
+        found = [_event('property.deleted', {'id': property_id})]
+    else:
+        found = [_event(f'property.{action}d', property_payload(property_id, doc))]
+    if entry is not None:
+        found.append(audit_event(entry))
+    return found
+
+def change_event(change: dict) -> Optional[dict]:
+    """The event for one change stream document, if any"""
+    collection, operation = change['ns']['coll'], change['operationType']
+    if collection == 'properties':
+        property_id = str(change['documentKey']['_id'])
+        if operation == 'delete':
+            return _event('property.deleted', {'id': property_id})
+        if change.get('fullDocument') is None:
+            return None  # deleted again before the lookup
+        name = 'property.created' if operation == 'insert' else 'property.updated'
+        return _event(name, property_payload(property_id, change['fullDocument']))
+    if operation == 'insert':
+        return audit_event(change['fullDocument'])
+    # Scored after the insert (async scoring queue, rescore.py)
+    if change.get('fullDocument'):
+        return _event('fraud.flagged', audit_payload(change['fullDocument']))
+    return None
+
+CHANGE_PIPELINE = [{'$match': {'$or': [
+    {'ns.coll': 'properties', 'operationType': {'$in': ['insert', 'replace', 'update', 'delete']}},
+    {'ns.coll': 'audit_logs', 'operationType': 'insert'},
+    {'ns.coll': 'audit_logs', 'operationType': 'update', 'updateDescription.updatedFields.fraud_detected': True},
+]}}]
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=BUFFER)
+        self.replay: List[dict] = []
+        self.missed = False  # resume point no longer buffered, or the queue overflowed
+
+    def offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.missed = True
+
+class Broker:
+    """In-process fan-out of events published by the write routes, with a replay buffer"""
+
+    def __init__(self, size: int = BUFFER):
+        self.boot = uuid.uuid4().hex[:12]  # tokens from another process or an earlier run don't resume here
+        self._seq = 0
+        self._recent = deque(maxlen=size)
+        self._subscribers = set()
+        self._lock = threading.Lock()  # publishers run on threadpool threads
+
+    def publish(self, found: List[dict]):
+        with self._lock:
+            for event in found:
+                self._seq += 1
+                event = {**event, 'id': f'{self.boot}-{self._seq}'}
+                self._recent.append((self._seq, event))
+                for subscription in self._subscribers:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, event)
+
+    def subscribe(self, resume: Optional[str]) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            if resume:
+                boot, _, seq = resume.rpartition('-')
+                first = self._recent[0][0] if self._recent else self._seq + 1
+                if boot != self.boot or not seq.isdigit() or int(seq) + 1 < first:
+                    subscription.missed = True
+                else:
+                    subscription.replay = [event for n, event in self._recent if n > int(seq)]
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+broker = Broker()
+
+def publish_write(action: str, property_id: str, doc: Optional[dict], entry: Optional[dict]):
+    broker.publish(write_events(action, property_id, doc, entry))
+
+def publish_audit(entries: List[dict]):
+    broker.publish([audit_event(entry) for entry in entries])
+
+def publish_flagged(entries: List[dict]):
+    broker.publish([_event('fraud.flagged', audit_payload(entry)) for entry in entries if entry.get('fraud_detected')])
+
+async def _memory_events(resume: Optional[str]) -> AsyncIterator[Optional[dict]]:
+    subscription = broker.subscribe(resume)
+    try:
+        for event in subscription.replay:
+            yield event
+        while True:
+            if subscription.missed:
+                subscription.missed = False
+                yield {'event': 'reset', 'data': {}}
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        broker.unsubscribe(subscription)
+
+async def _change_stream_events(resume: Optional[str]) -> AsyncIterator[Optional[dict]]:
+    from repository import async_db
+    options = {'full_document': 'updateLookup', 'max_await_time_ms': int(HEARTBEAT_SECONDS * 1000)}
+    try:
+        stream = async_db.watch(CHANGE_PIPELINE, resume_after={'_data': resume} if resume else None, **options)
+        change = await stream.try_next()
+    except OperationFailure:
+        if not resume:
+            raise
+        # Unknown or expired token (or one from the in-process feed)
+        yield {'event': 'reset', 'data': {}}
+        stream = async_db.watch(CHANGE_PIPELINE, **options)
+        change = await stream.try_next()
+    try:
+        while True:
+            if change is None:
+                yield None
+            else:
+                event = change_event(change)
+                if event is not None:
+                    yield {**event, 'id': change['_id']['_data']}
+            change = await stream.try_next()
+    finally:
+        await stream.close()
+
+_change_streams: Optional[bool] = None
+
+async def change_streams_available() -> bool:
+    """Whether this deployment supports change streams; probed once per process"""
+    global _change_streams
+    if _change_streams is None:
+        if SOURCE in ('changestream', 'memory'):
+            _change_streams = SOURCE == 'changestream'
+        else:
+            from repository import async_db
+            try:
+                stream = async_db.watch(CHANGE_PIPELINE, max_await_time_ms=1)
+                await stream.try_next()
+                await stream.close()
+                _change_streams = True
+            except Exception:
+                # Standalone mongod (OperationFailure) or a client without change streams
+                _change_streams = False
+    return _change_streams
+
+def format_event(event: Optional[dict]) -> str:
+    if event is None:
+        return ': keepalive\n\n'
+    lines = [f"id: {event['id']}"] if 'id' in event else []
+    lines += [f"event: {event['event']}", f"data: {json.dumps(event['data'], separators=(',', ':'))}"]
+    return '\n'.join(lines) + '\n\n'
+
+async def stream(resume: Optional[str] = None) -> AsyncIterator[str]:
+    """The SSE body for one client, from `resume` (a previous event id) if given"""
+    yield f'retry: {RETRY_MS}\n\n'
+    source = _change_stream_events if await change_streams_available() else _memory_events
+    async for event in source(resume):
+        yield format_event(event)
@@ -0,0 +1,171 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Tuple
+from bson import ObjectId
+from db import db
+
+# Streaming exports for replication jobs. Documents come straight off a Mongo
+# cursor in (watermark field, _id) order and are serialized one at a time (or
+# one Parquet row group at a time), so memory stays flat however large the
+# collection. Every row carries its watermark and id: pass the last row's as
+# ?since=&after= to resume exactly where a previous pull stopped.
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+CURSOR_BATCH = 1000
+PARQUET_ROW_GROUP = 10000
+
+# (column, kind); kind drives CSV formatting and the Parquet type
+PROPERTY_COLUMNS = [
+    ('id', 'str'), ('owner.id', 'str'), ('owner.name', 'str'), ('owner.email', 'str'),
+    ('buyer_intent', 'str'), ('location', 'str'), ('verification', 'str'), ('terms', 'str'), ('price', 'float'),
+    ('created_at', 'datetime'), ('updated_at', 'datetime'),
+]
+AUDIT_COLUMNS = [
+    ('id', 'str'), ('property_id', 'str'), ('seq', 'int'), ('action', 'str'), ('timestamp', 'datetime'),
+    ('hash', 'str'), ('prev_hash', 'str'), ('hash_version', 'int'),
+    ('user.id', 'str'), ('user.name', 'str'), ('user.email', 'str'),
+    ('fraud_status', 'str'), ('fraud_detected', 'bool'), ('fraud_reason', 'str'), ('changes', 'json'),
+    # Compact entries (hash_version 3+) carry one of these instead of changes, as hashed
+    ('snapshot', 'json'), ('delta', 'json'),
+]
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def watermark_filter(field: str, since: Optional[datetime], after: Optional[str]) -> dict:
+    """Rows at or after `since`; with `after` (the last exported id) strictly past that row"""
+    if since is None:
+        return {}
+    since = _naive_utc(since)
+    if not after:
+        return {field: {'$gte': since}}
+    return {'$or': [{field: {'$gt': since}}, {field: since, '_id': {'$gt': ObjectId(after)}}]}
+
+def export_cursor(collection: str, field: str, since: Optional[datetime] = None,
+                  after: Optional[str] = None, limit: int = 0):
+    return db[collection].find(
+        watermark_filter(field, since, after),
+        {'search': 0},
+        sort=[(field, 1), ('_id', 1)],
+        limit=limit,
+        batch_size=CURSOR_BATCH,
+    )
+
+def _get(doc: dict, column: str):
+    value = doc
+    for part in column.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+def _rows(docs: Iterable[dict]) -> Iterator[dict]:
+    for doc in docs:
+        doc['id'] = str(doc.pop('_id'))
+        yield doc
+
+def ndjson_lines(docs: Iterable[dict], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    for doc in _rows(docs):
+        yield (json.dumps(doc, default=_json_default) + '\n').encode('utf-8')
+
+def _csv_value(value, kind: str):
+    if value is None:
+        return ''
+    if kind == 'datetime':
+        return value.isoformat()
+    if kind == 'json':
+        return json.dumps(value, default=_json_default, sort_keys=True)
+    return value
+
+def csv_lines(docs: Iterable[dict], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue().encode('utf-8')
+    for doc in _rows(docs):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_csv_value(_get(doc, name), kind) for name, kind in columns])
+        yield buffer.getvalue().encode('utf-8')
+
+class _ChunkSink:
+    """Write-only file that hands its bytes back out as they are written"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def parquet_chunks(docs: Iterable[dict], columns: List[Tuple[str, str]],
+                   row_group: int = PARQUET_ROW_GROUP) -> Iterator[bytes]:
+    """Parquet file bytes, emitted after each row group and the footer"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    types = {'str': pa.string(), 'json': pa.string(), 'datetime': pa.timestamp('ms'),
+             'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def write(batch):
+        writer.write_table(pa.Table.from_pydict(
+            {name: values for (name, _), values in zip(columns, batch)}, schema=schema))
+        return sink.drain()
+
+    batch = [[] for _ in columns]
+    for doc in _rows(docs):
+        for values, (name, kind) in zip(batch, columns):
+            value = _get(doc, name)
+            if kind == 'json' and value is not None:
+                value = json.dumps(value, default=_json_default, sort_keys=True)
+            values.append(value)
+        if len(batch[0]) >= row_group:
+            yield write(batch)
+            batch = [[] for _ in columns]
+    if batch[0]:
+        yield write(batch)
+    writer.close()
+    yield sink.drain()
+
+def parquet_available() -> bool:
+    import importlib.util
+    return importlib.util.find_spec('pyarrow') is not None
+
+def stream(docs: Iterable[dict], fmt: str, columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    serializer = {'ndjson': ndjson_lines, 'csv': csv_lines, 'parquet': parquet_chunks}[fmt]
+    return serializer(docs, columns)
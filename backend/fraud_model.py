@@ -0,0 +1,121 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+from typing import Optional
+import joblib
+from verification import FraudDetector, fraud_detector
+import processes
+
+# The fitted model lives on disk so workers warm-start from it instead of
+# training inside a request. A separate trainer process writes new versions;
+# each worker polls the file and swaps the new model in atomically.
+
+MODEL_DIR = os.getenv('FRAUD_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fraud_models'))
+MODEL_PATH = os.path.join(MODEL_DIR, 'fraud_model.joblib')
+LOCK_PATH = os.path.join(MODEL_DIR, '.train.lock')
+RELOAD_SECONDS = float(os.getenv('FRAUD_MODEL_RELOAD_SECONDS', '30'))
+RETRAIN_SECONDS = float(os.getenv('FRAUD_MODEL_RETRAIN_SECONDS', '3600'))
+
+def load_model(path: str = MODEL_PATH) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+def save_model(model, scaler, meta: dict, path: str = MODEL_PATH) -> dict:
+    """Write a new model version; readers only ever see a complete file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    current = load_model(path)
+    meta = dict(meta, version=(current['meta']['version'] + 1) if current else 1)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump({'model': model, 'scaler': scaler, 'meta': meta}, tmp_path)
+    os.replace(tmp_path, path)
+    return meta
+
+def train_and_save(detector: Optional[FraudDetector] = None, force: bool = False) -> Optional[dict]:
+    """Retrain if audit logs have moved past the saved model's watermark"""
+    detector = detector or FraudDetector()
+    logs = detector.load_training_logs(limit=1000)
+    if not logs:
+        return None
+    current = load_model()
+    if current and not force and logs[0]['timestamp'] <= current['meta']['watermark']:
+        return None
+    model, scaler, meta = detector.fit_model(logs)
+    return save_model(model, scaler, meta)
+
+def acquire_train_lock():
+    """Held for the trainer's lifetime so each worker's spawn doesn't add another"""
+    return processes.acquire_lock(LOCK_PATH)
+
+class ModelReloader(threading.Thread):
+    """Polls MODEL_PATH and hot-swaps newer versions into the detector"""
+
+    def __init__(self, detector: FraudDetector, interval: float = RELOAD_SECONDS):
+        super().__init__(daemon=True, name='fraud-model-reloader')
+        self.detector = detector
+        self.interval = interval
+        self._mtime = None
+        self._stopped = threading.Event()
+        self.trainer = None  # the trainer process this worker spawned, if it won the lock
+
+    def reload(self) -> bool:
+        try:
+            mtime = os.path.getmtime(MODEL_PATH)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        bundle = load_model()
+        self._mtime = mtime
+        if bundle is None or bundle['meta']['version'] == self.detector.model_version:
+            return False
+        self.detector.swap_model(bundle['model'], bundle['scaler'], bundle['meta'])
+        return True
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f'Fraud model reload failed: {e}', file=sys.stderr)
+
+    def stop(self):
+        """Stop reloading, and stop the trainer if this worker started it"""
+        self._stopped.set()
+        processes.stop(self.trainer)
+
+def spawn_trainer(every: Optional[float] = None) -> Optional[subprocess.Popen]:
+    """Start the trainer in its own process so fitting never holds a worker's GIL
+
+    Only the worker that takes the trainer lock starts one; None elsewhere.
+    """
+    return processes.spawn_locked(os.path.abspath(__file__), LOCK_PATH,
+                                  ['--every', str(every)] if every else [])
+
+def start_model_service(detector: FraudDetector = fraud_detector) -> ModelReloader:
+    """Warm-start `detector` from disk and keep it current; call once per worker"""
+    reloader = ModelReloader(detector)
+    reloader.reload()
+    if RETRAIN_SECONDS > 0:
+        reloader.trainer = spawn_trainer(every=RETRAIN_SECONDS)
+    elif not detector.is_model_trained:
+        reloader.trainer = spawn_trainer()
+    reloader.start()
+    return reloader
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train and persist the fraud model')
+    parser.add_argument('--every', type=float, help='keep retraining on this interval (seconds)')
+    parser.add_argument('--force', action='store_true', help='retrain even without new audit logs')
+    parser.add_argument('--parent', type=int, help=argparse.SUPPRESS)  # set by spawn_trainer, which holds the lock for us
+    args = parser.parse_args()
+    if args.parent is None and acquire_train_lock() is None:
+        sys.exit('Another fraud model trainer is already running')
+    while True:
+        meta = train_and_save(force=args.force)
+        if meta:
+            print(f"Saved fraud model v{meta['version']} ({meta['n_samples']} samples)")
+        if not args.every or not processes.sleep_unless_orphaned(args.every, args.parent):
+            break
@@ -0,0 +1,170 @@
+import math
+from numbers import Number
+from typing import List, Optional
+from pymongo.errors import DuplicateKeyError
+from db import db
+
+# Running price statistics per location, kept in `location_stats` and updated
+# as listings are created, edited and deleted:
+#   count, mean, m2   Welford accumulators (variance = m2 / count)
+#   min, max          bounds seen since the last rebuild (not shrunk on removal)
+#   hist              log-scale bucket counts; quantiles are within ~GAMMA-1 relative error
+# Each update is a compare-and-set on `version`, so concurrent writers never
+# lose an observation.
+
+GAMMA = 1.02
+_LOG_GAMMA = math.log(GAMMA)
+MAX_RETRIES = 20
+
+def _price(doc: Optional[dict]) -> Optional[float]:
+    if not doc:
+        return None
+    price = doc.get('price')
+    if isinstance(price, Number) and not isinstance(price, bool) and price > 0:
+        return float(price)
+    return None
+
+def _bucket(price: float) -> str:
+    return str(math.floor(math.log(price) / _LOG_GAMMA))
+
+def _apply(stats: dict, price: float, sign: int) -> dict:
+    count, mean, m2 = stats.get('count', 0), stats.get('mean', 0.0), stats.get('m2', 0.0)
+    hist = dict(stats.get('hist', {}))
+    key = _bucket(price)
+    if sign > 0:
+        count += 1
+        delta = price - mean
+        mean += delta / count
+        m2 += delta * (price - mean)
+        hist[key] = hist.get(key, 0) + 1
+        stats['min'] = min(stats.get('min', price), price)
+        stats['max'] = max(stats.get('max', price), price)
+    else:
+        if count <= 1:
+            count, mean, m2, hist = 0, 0.0, 0.0, {}
+        else:
+            old_mean = mean
+            count -= 1
+            mean = (old_mean * (count + 1) - price) / count
+            m2 = max(m2 - (price - old_mean) * (price - mean), 0.0)
+            if hist.get(key, 0) > 1:
+                hist[key] -= 1
+            else:
+                hist.pop(key, None)
+    stats.update(count=count, mean=mean, m2=m2, hist=hist)
+    return stats
+
+def _apply_all(stats: dict, prices: List[float], sign: int) -> dict:
+    for price in prices:
+        stats = _apply(stats, price, sign)
+    return stats
+
+def _update(location: str, prices: List[float], sign: int):
+    for _ in range(MAX_RETRIES):
+        current = db.location_stats.find_one({'_id': location})
+        if current is None:
+            if sign < 0:
+                return
+            stats = _apply_all({'_id': location, 'version': 1}, prices, sign)
+            try:
+                db.location_stats.insert_one(stats)
+                return
+            except DuplicateKeyError:
+                continue  # another writer created it first; retry as an update
+        version = current.get('version', 0)
+        stats = _apply_all(dict(current), prices, sign)
+        stats['version'] = version + 1
+        result = db.location_stats.replace_one({'_id': location, 'version': version}, stats)
+        if result.matched_count:
+            return
+    raise RuntimeError(f'location_stats update for {location!r} kept conflicting')
+
+def record_change(old: Optional[dict], new: Optional[dict]):
+    """Move a listing's price between location buckets; old/new are the before/after documents"""
+    old_price, new_price = _price(old), _price(new)
+    old_loc = old.get('location') if old else None
+    new_loc = new.get('location') if new else None
+    if old_price == new_price and old_loc == new_loc:
+        return
+    if old_price is not None and old_loc:
+        _update(old_loc, [old_price], -1)
+    if new_price is not None and new_loc:
+        _update(new_loc, [new_price], +1)
+
+def record_many(docs: List[dict]):
+    """Add many new listings with one compare-and-set per distinct location"""
+    by_location = {}
+    for doc in docs:
+        price, location = _price(doc), doc.get('location')
+        if price is not None and location:
+            by_location.setdefault(location, []).append(price)
+    for location, prices in by_location.items():
+        _update(location, prices, +1)
+
+def quantile(stats: dict, q: float) -> Optional[float]:
+    hist = stats.get('hist') or {}
+    total = sum(hist.values())
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for key in sorted(hist, key=int):
+        seen += hist[key]
+        if seen > rank:
+            # Bucket midpoint in log space
+            return GAMMA ** (int(key) + 0.5)
+    return GAMMA ** (int(max(hist, key=int)) + 0.5)
+
+def get_stats(location: str) -> Optional[dict]:
+    """O(1) summary for one location: count, mean, std and approximate quartiles"""
+    stats = db.location_stats.find_one({'_id': location})
+    if not stats or not stats.get('count'):
+        return None
+    count = stats['count']
+    return {
+        'location': location,
+        'count': count,
+        'mean': stats['mean'],
+        'std': math.sqrt(stats['m2'] / count),
+        'min': stats.get('min'),
+        'max': stats.get('max'),
+        'p25': quantile(stats, 0.25),
+        'median': quantile(stats, 0.5),
+        'p75': quantile(stats, 0.75),
+    }
+
+def rebuild():
+    """Recompute every location from `properties` in one aggregation, replacing the collection"""
+    db.properties.aggregate([
+        # $gt 0 only matches numeric prices (BSON type bracketing)
+        {'$match': {'price': {'$gt': 0}, 'location': {'$type': 'string'}}},
+        {'$group': {
+            '_id': {'location': '$location', 'b': {'$floor': {'$divide': [{'$ln': '$price'}, _LOG_GAMMA]}}},
+            'n': {'$sum': 1},
+            's': {'$sum': '$price'},
+            'ss': {'$sum': {'$multiply': ['$price', '$price']}},
+            'min': {'$min': '$price'},
+            'max': {'$max': '$price'},
+        }},
+        {'$group': {
+            '_id': '$_id.location',
+            'count': {'$sum': '$n'},
+            'sum': {'$sum': '$s'},
+            'sumsq': {'$sum': '$ss'},
+            'min': {'$min': '$min'},
+            'max': {'$max': '$max'},
+            'hist': {'$push': {'k': {'$toString': {'$toLong': '$_id.b'}}, 'v': '$n'}},
+        }},
+        {'$project': {
+            'count': 1, 'min': 1, 'max': 1,
+            'mean': {'$divide': ['$sum', '$count']},
+            'm2': {'$max': [0, {'$subtract': ['$sumsq', {'$divide': [{'$multiply': ['$sum', '$sum']}, '$count']}]}]},
+            'hist': {'$arrayToObject': '$hist'},
+            'version': {'$literal': 1},
+        }},
+        {'$out': 'location_stats'},
+    ])
+
+if __name__ == '__main__':
+    rebuild()
+    print(f"Rebuilt stats for {db.location_stats.count_documents({})} locations")
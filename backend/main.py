@@ -1,12 +1,33 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from models import Property, User, AuditLog, PropertyCreate
-from db import db
-from verification import log_audit, detect_fraud
+from models import Property, PropertySummary, PropertySearchHit, SimilarProperty, User, AuditLogSummary, PropertyCreate
+from db import ensure_indexes
+from verification import log_audit, detect_fraud, fraud_detector, FRAUD_SCORING_MODE
+from scoring_queue import scoring_queue
+import audit_store
+import bulk_import
+import duplicates
+import events
+import cache
+import repository
+import search
+import exports
+import location_stats
+import metrics
+import merkle
+import processes
+from pagination import keyset_filter, keyset_sort, encode_cursor, parse_projection
 from bson import ObjectId
 from fastapi.middleware.cors import CORSMiddleware
 import auth  # Import auth module
+import fraud_model
 from datetime import datetime
+from urllib.parse import urlencode
+import json
+import tempfile
 
 app = FastAPI()
 
@@ -19,6 +40,31 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"]
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.on_event('startup')
+def create_indexes():
+    ensure_indexes()
+
+@app.on_event('startup')
+def load_fraud_model():
+    app.state.model_reloader = fraud_model.start_model_service()
+
+@app.on_event('startup')
+def start_merkle_sealer():
+    # Only the worker that takes the seal lock starts one
+    app.state.merkle_sealer = merkle.spawn_sealer() if merkle.SEAL_SECONDS > 0 else None
+
+@app.on_event('startup')
+def start_scoring_queue():
+    if FRAUD_SCORING_MODE == 'async':
+        scoring_queue.start()
+
+@app.on_event('shutdown')
+def stop_background_jobs():
+    scoring_queue.stop()
+    app.state.model_reloader.stop()
+    processes.stop(app.state.merkle_sealer)
 
 # Helper to convert MongoDB document to dict with string id
 def doc_to_dict(doc):
@@ -45,76 +91,359 @@ def ensure_owner_id(prop):
         prop['owner']['id'] = None
     return prop
 
+PROPERTY_FIELDS = {'owner', 'buyer_intent', 'location', 'verification', 'terms', 'price', 'created_at', 'updated_at'}
+PROPERTY_SORTS = {'updated_at', 'created_at', '_id'}
+AUDIT_FIELDS = {'property_id', 'action', 'hash', 'prev_hash', 'seq', 'hash_version', 'timestamp', 'changes', 'user',
+                'snapshot', 'delta', 'fraud_status', 'fraud_detected', 'fraud_reason'}
+
+# Cursor documents are fresh and property documents carry no nested ObjectIds,
+# so the list path renames _id in place instead of deep-copying via doc_to_dict
+def property_row(doc):
+    doc['id'] = str(doc.pop('_id'))
+    return ensure_owner_id(doc)
+
+async def cached_json(request: Request, key: str, build) -> Response:
+    """Serve `key` from the cache, or 304 if the client's copy is current; build and store it on a miss"""
+    entry = cache.get(key)
+    if entry is None:
+        with metrics.stage('cache.build'):
+            content, headers = await build()
+        body = json.dumps(content, separators=(',', ':')).encode('utf-8')
+        entry = cache.make_entry(body, headers)
+        cache.put(key, entry)
+    # no-cache: browsers may keep the body but must revalidate, which costs a 304
+    headers = {'ETag': entry['etag'], 'Cache-Control': 'no-cache', **entry['headers']}
+    if cache.etag_matches(request.headers.get('if-none-match'), entry['etag']):
+        return Response(status_code=304, headers=headers)
+    return Response(entry['body'], media_type='application/json', headers=headers)
+
+def record_write(property_id, action, before, after, changes, user):
+    # Location stats and the audit append (with fraud scoring) stay on the
+    # blocking client; async routes run them off the event loop
+    entry = None
+    try:
+        with metrics.stage('location_stats'):
+            location_stats.record_change(before, after)
+        with metrics.stage('duplicates'):
+            duplicates.record_change(property_id, after)
+        entry = log_audit(property_id, action, changes, user)
+    finally:
+        # The document already changed, so cached reads go and listeners hear of it even if auditing failed
+        cache.invalidate_property(property_id)
+        events.publish_write(action, property_id, after, entry)
+
 @app.post('/properties', response_model=Property)
-def create_property(property: PropertyCreate):
-    prop_dict = property.dict()
+async def create_property(property: PropertyCreate):
+    prop_dict = property.document()
     prop_dict['created_at'] = prop_dict['updated_at'] = datetime.utcnow()
-    result = db.properties.insert_one(prop_dict)
-    prop_dict['id'] = str(result.inserted_id)
+    # Search keys are stored with the document but kept out of the audited
+    # snapshot, which matches what the API returns and can be re-hashed by clients
+    with metrics.stage('property.insert'):
+        property_id = await repository.properties.insert({**prop_dict, 'search': search.search_fields(prop_dict)})
+    prop_dict['id'] = property_id
     # Ensure owner has an 'id' field for the response model
     if 'owner' in prop_dict and 'id' not in prop_dict['owner']:
         prop_dict['owner']['id'] = None
-    log_audit(prop_dict['id'], 'create', prop_dict, prop_dict['owner'])
+    await run_in_threadpool(record_write, property_id, 'create', None, prop_dict, prop_dict, prop_dict['owner'])
     return prop_dict
 
-@app.get('/properties', response_model=List[Property])
-def list_properties(
+@app.post('/properties/bulk')
+async def bulk_import_properties(
+    request: Request,
+    format: Optional[str] = Query(None, pattern='^(ndjson|csv)$', description='Defaults from Content-Type')
+):
+    fmt = format or ('csv' if 'csv' in request.headers.get('content-type', '') else 'ndjson')
+    # Spool the upload (to disk past SPOOL_BYTES) so rows are parsed as a stream
+    # and the per-row results can be streamed back while chunks are written
+    body = tempfile.SpooledTemporaryFile(max_size=bulk_import.SPOOL_BYTES)
+    async for chunk in request.stream():
+        body.write(chunk)
+    body.seek(0)
+    return StreamingResponse(bulk_import.import_stream(body, fmt), media_type='application/x-ndjson')
+
+@app.get('/properties', response_model=List[PropertySummary], response_model_exclude_unset=True)
+async def list_properties(
+    request: Request,
     intent: Optional[str] = Query(None),
-    location: Optional[str] = Query(None)
+    location: Optional[str] = Query(None),
+    verification: Optional[str] = Query(None),
+    sort: str = Query('updated_at'),
+    order: str = Query('desc', pattern='^(asc|desc)$'),
+    limit: int = Query(50, ge=1, le=500),
+    next_token: Optional[str] = Query(None, alias='next', description='Opaque cursor from the X-Next-Cursor header'),
+    fields: Optional[str] = Query(None, description='Comma-separated fields to return')
 ):
+    if sort not in PROPERTY_SORTS:
+        raise HTTPException(status_code=400, detail=f'Cannot sort by {sort}')
     query = {}
     if intent:
         query['buyer_intent'] = intent
     if location:
         query['location'] = location
-    props = list(db.properties.find(query))
-    return [ensure_owner_id(doc_to_dict(p)) for p in props]
+    if verification:
+        query['verification'] = verification
+    query.update(keyset_filter(sort, order, next_token))
+    always = (sort,) if sort != '_id' else ()
+    projection = parse_projection(fields, PROPERTY_FIELDS, always) or {'search': 0}
 
-@app.get('/properties/{property_id}', response_model=Property)
-def get_property(property_id: str):
+    async def build():
+        props = await repository.properties.find_page(query, projection, keyset_sort(sort, order), limit + 1)
+        headers = {}
+        if len(props) > limit:
+            props = props[:limit]
+            headers['X-Next-Cursor'] = encode_cursor(sort, order, props[-1])
+        rows = [PropertySummary(**property_row(p)) for p in props]
+        return jsonable_encoder(rows, exclude_unset=True), headers
+
+    key = cache.key_for(cache.LIST_SCOPE, urlencode(sorted(request.query_params.multi_items())))
+    return await cached_json(request, key, build)
+
+@app.get('/properties/events')
+async def property_events(
+    request: Request,
+    resume: Optional[str] = Query(None, description='Id of the last event seen; EventSource sends it as Last-Event-ID')
+):
+    return StreamingResponse(
+        events.stream(resume or request.headers.get('last-event-id')),
+        media_type='text/event-stream',
+        # Proxies must pass events through as they come
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.get('/properties/search', response_model=List[PropertySearchHit], response_model_exclude_unset=True)
+async def search_properties(
+    response: Response,
+    q: str = Query(..., min_length=1, description='Words or a partial last word'),
+    mode: str = Query('prefix', pattern='^(prefix|token|fuzzy)$'),
+    intent: Optional[str] = Query(None),
+    verification: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    next_token: Optional[str] = Query(None, alias='next', description='Opaque cursor from the X-Next-Cursor header'),
+    fields: Optional[str] = Query(None, description='Comma-separated fields to return')
+):
+    filters = {}
+    if intent:
+        filters['buyer_intent'] = intent
+    if verification:
+        filters['verification'] = verification
+    projection = parse_projection(fields, PROPERTY_FIELDS, ('score',))
+    pipeline = search.search_pipeline(q, mode, filters, limit, next_token, projection)
+    if pipeline is None:
+        return []
+    rows = await repository.properties.aggregate(pipeline)
+    cursor = search.next_cursor(rows, limit)
+    if cursor:
+        response.headers['X-Next-Cursor'] = cursor
+    return [property_row(row) for row in rows[:limit]]
+
+def export_response(collection: str, field: str, columns, fmt: str,
+                    since: Optional[datetime], after: Optional[str], limit: int):
+    if after and since is None:
+        raise HTTPException(status_code=400, detail='after needs the since watermark it was exported with')
+    if after and not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail='Invalid after id')
+    if fmt == 'parquet' and not exports.parquet_available():
+        raise HTTPException(status_code=400, detail='Parquet export requires pyarrow')
+    cursor = exports.export_cursor(collection, field, since, after, limit)
+    return StreamingResponse(
+        exports.stream(cursor, fmt, columns),
+        media_type=exports.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{collection}.{fmt}"'}
+    )
+
+@app.get('/properties/export')
+def export_properties(
+    format: str = Query('ndjson', pattern='^(ndjson|csv|parquet)$'),
+    since: Optional[datetime] = Query(None, description='updated_at watermark from the last row of a previous export'),
+    after: Optional[str] = Query(None, description='id of that row, to resume strictly after it'),
+    limit: int = Query(0, ge=0, description='0 exports everything')
+):
+    return export_response('properties', 'updated_at', exports.PROPERTY_COLUMNS, format, since, after, limit)
+
+@app.get('/audit/export')
+def export_audit_logs(
+    format: str = Query('ndjson', pattern='^(ndjson|csv|parquet)$'),
+    since: Optional[datetime] = Query(None, description='timestamp watermark from the last row of a previous export'),
+    after: Optional[str] = Query(None, description='id of that row, to resume strictly after it'),
+    limit: int = Query(0, ge=0, description='0 exports everything')
+):
+    return export_response('audit_logs', 'timestamp', exports.AUDIT_COLUMNS, format, since, after, limit)
+
+@app.get('/stats')
+async def dashboard_stats(request: Request):
+    async def build():
+        summary = await repository.stats.dashboard(fraud_detector.risk_threshold)
+        return jsonable_encoder(summary), None
+
+    return await cached_json(request, cache.key_for(cache.STATS_SCOPE), build)
+
+@app.get('/metrics')
+def prometheus_metrics():
+    # media_type would get a second charset appended; the exposition type already has one
+    return Response(metrics.render(), headers={'Content-Type': metrics.CONTENT_TYPE_LATEST})
+
+@app.get('/fraud/scoring/status')
+def scoring_status():
+    return {'mode': FRAUD_SCORING_MODE, **scoring_queue.status()}
+
+@app.get('/locations/stats')
+def get_location_stats(location: str = Query(...)):
+    stats = location_stats.get_stats(location)
+    if stats is None:
+        raise HTTPException(status_code=404, detail='No price data for this location')
+    return stats
+
+async def load_property(property_id: str):
     try:
-        prop = db.properties.find_one({'_id': ObjectId(property_id)})
+        prop = await repository.properties.get(property_id)
         if not prop:
             raise HTTPException(status_code=404, detail='Property not found')
         return ensure_owner_id(doc_to_dict(prop))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get('/properties/{property_id}/audit', response_model=List[AuditLog])
-def get_audit_log(property_id: str):
+@app.get('/properties/{property_id}', response_model=Property)
+async def get_property(
+    property_id: str,
+    request: Request,
+    as_of: Optional[datetime] = Query(None, description='Rebuild the listing as it was at this time from its audit trail')
+):
+    if as_of is not None:
+        state = await run_in_threadpool(audit_store.state_at, property_id, as_of)
+        if state is None:
+            raise HTTPException(status_code=404, detail='Property did not exist at that time')
+        return ensure_owner_id(dict(state))
+
+    async def build():
+        return jsonable_encoder(Property(**await load_property(property_id))), None
+
+    return await cached_json(request, cache.key_for(cache.property_scope(property_id)), build)
+
+def audit_row(doc, projection):
+    doc['id'] = str(doc.pop('_id'))
+    if projection is not None:
+        # Drop what was only read to rebuild changes
+        for field in audit_store.REPLAY_FIELDS:
+            if field not in projection:
+                doc.pop(field, None)
+    # Ensure prev_hash is present (for old logs)
+    if projection is None or 'prev_hash' in projection:
+        doc.setdefault('prev_hash', None)
+    return doc
+
+@app.get('/properties/{property_id}/audit', response_model=List[AuditLogSummary], response_model_exclude_unset=True)
+async def get_audit_log(
+    property_id: str,
+    request: Request,
+    action: Optional[str] = Query(None),
+    user: Optional[str] = Query(None, description='Only entries by this user email'),
+    order: str = Query('desc', pattern='^(asc|desc)$'),
+    limit: int = Query(50, ge=1, le=500),
+    next_token: Optional[str] = Query(None, alias='next', description='Opaque cursor from the X-Next-Cursor header'),
+    fields: Optional[str] = Query(None, description='Comma-separated fields to return, e.g. all but changes')
+):
+    query = {'property_id': property_id}
+    if action:
+        query['action'] = action
+    if user:
+        query['user.email'] = user
+    query.update(keyset_filter('timestamp', order, next_token))
+    projection = parse_projection(fields, AUDIT_FIELDS, ('timestamp',))
+    # Compact entries store a snapshot or delta; changes is rebuilt from them
+    replay = projection is None or 'changes' in projection
+    read_projection = {**projection, **dict.fromkeys(audit_store.REPLAY_FIELDS, 1)} if projection and replay else projection
+
+    async def build():
+        logs = await repository.audit_logs.find_page(query, read_projection, keyset_sort('timestamp', order), limit + 1)
+        headers = {}
+        if len(logs) > limit:
+            logs = logs[:limit]
+            headers['X-Next-Cursor'] = encode_cursor('timestamp', order, logs[-1])
+        if replay:
+            await run_in_threadpool(audit_store.materialize, logs)
+        rows = [AuditLogSummary(**audit_row(log, projection)) for log in logs]
+        return jsonable_encoder(rows, exclude_unset=True), headers
+
+    key = cache.key_for(cache.audit_scope(property_id), urlencode(sorted(request.query_params.multi_items())))
+    return await cached_json(request, key, build)
+
+@app.get('/properties/{property_id}/similar', response_model=List[SimilarProperty], response_model_exclude_unset=True)
+async def similar_properties(
+    property_id: str,
+    request: Request,
+    min_similarity: float = Query(0.5, ge=0, le=1, description='Estimated Jaccard similarity of location, terms and owner'),
+    limit: int = Query(10, ge=1, le=50)
+):
+    async def build():
+        found = await run_in_threadpool(duplicates.similar_to, property_id, min_similarity, limit)
+        if found is None:
+            raise HTTPException(status_code=404, detail='Property not found')
+        if not found:
+            return [], None
+        docs = await repository.properties.find_page(
+            {'_id': {'$in': [ObjectId(match['id']) for match in found]}}, {'search': 0}, [('_id', 1)], len(found))
+        by_id = {str(doc['_id']): doc for doc in docs}
+        rows = [SimilarProperty(**property_row(by_id[match['id']]), similarity=match['similarity'])
+                for match in found if match['id'] in by_id]
+        return jsonable_encoder(rows, exclude_unset=True), None
+
+    # Any write can change the neighbours, so these live under the list scope
+    key = cache.key_for(cache.LIST_SCOPE, 'similar', property_id, urlencode(sorted(request.query_params.multi_items())))
+    return await cached_json(request, key, build)
+
+@app.get('/properties/{property_id}/audit/verify')
+def verify_audit_chain(property_id: str):
     try:
-        logs = list(db.audit_logs.find({'property_id': property_id}))
-        result = []
-        for log in logs:
-            log_dict = doc_to_dict(log)
-            # Ensure prev_hash is present (for old logs)
-            if 'prev_hash' not in log_dict:
-                log_dict['prev_hash'] = None
-            result.append(log_dict)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        return merkle.verify_property_chain(property_id)
+    except RuntimeError as e:
+        # No AUDIT_SIGNING_KEY to check the anchoring checkpoint with
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get('/audit/checkpoints/latest')
+def latest_checkpoint():
+    batch = merkle.latest_batch()
+    if batch is None:
+        raise HTTPException(status_code=404, detail='No sealed batches yet')
+    batch.pop('leaves')
+    batch['batch'] = batch.pop('_id')
+    return batch
+
+@app.get('/audit/{log_id}/proof')
+def audit_inclusion_proof(log_id: str):
+    if not ObjectId.is_valid(log_id):
+        raise HTTPException(status_code=400, detail='Invalid audit log id')
+    proof = merkle.inclusion_proof(log_id)
+    if proof is None:
+        raise HTTPException(status_code=404, detail='Audit log not found')
+    return proof
 
 @app.put('/properties/{property_id}', response_model=Property)
-def update_property(property_id: str, property: Property):
+async def update_property(property_id: str, property: Property):
     try:
-        prop_dict = property.dict()
-        prop_dict['updated_at'] = property.updated_at
-        result = db.properties.update_one({'_id': ObjectId(property_id)}, {'$set': prop_dict})
-        if result.matched_count == 0:
+        prop_dict = property.document()
+        # Timestamps are the server's: they drive the export watermark and the keyset sorts
+        prop_dict.pop('created_at', None)
+        prop_dict['updated_at'] = datetime.utcnow()
+        # The pre-image lets location stats move the old price out in the same round trip
+        with metrics.stage('property.update'):
+            before = await repository.properties.update(property_id, {**prop_dict, 'search': search.search_fields(prop_dict)})
+        if before is None:
             raise HTTPException(status_code=404, detail='Property not found')
-        log_audit(property_id, 'update', prop_dict, prop_dict['owner'])
-        return get_property(property_id)
+        if 'created_at' in before:
+            prop_dict['created_at'] = before['created_at']
+        await run_in_threadpool(record_write, property_id, 'update', before, {**before, **prop_dict},
+                                prop_dict, prop_dict['owner'])
+        return await load_property(property_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete('/properties/{property_id}')
-def delete_property(property_id: str):
+async def delete_property(property_id: str):
     try:
-        result = db.properties.delete_one({'_id': ObjectId(property_id)})
-        if result.deleted_count == 0:
+        with metrics.stage('property.delete'):
+            before = await repository.properties.delete(property_id)
+        if before is None:
             raise HTTPException(status_code=404, detail='Property not found')
-        log_audit(property_id, 'delete', {}, None)
+        await run_in_threadpool(record_write, property_id, 'delete', before, None, {}, None)
         return {'status': 'deleted'}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
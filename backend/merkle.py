@@ -0,0 +1,234 @@
+import argparse
+import hashlib
+import hmac
+import os
+import sys
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from db import db
+from verification import canonical_bytes, hash_property_data
+import audit_store
+import processes
+
+# Audit entries are sealed into batches in _id order. Each batch gets a Merkle
+# root over its entries and a checkpoint chained to the previous one:
+#   checkpoint_n = H(checkpoint_{n-1} || root_n || n || count || last_id)
+# signed with HMAC so a verifier can trust it without replaying from genesis.
+# Leaves and interior nodes are domain-separated (0x00 / 0x01, as in RFC 6962)
+# and an odd node is promoted unchanged to the next level.
+#
+# Sealing first marks the batch's entries `merkle_pending` with the batch
+# number and their index, then upserts the batch (its _id is that number) and
+# finally moves the entries to `merkle_batch`. Each step can be repeated, so
+# a sealer that dies part way finishes the same batch on its next run rather
+# than sealing those entries again.
+
+BATCH_SIZE = int(os.getenv('MERKLE_BATCH_SIZE', '1024'))
+SIGNING_KEY = os.getenv('AUDIT_SIGNING_KEY', '').encode()  # no default: checkpoints signed with a known key prove nothing
+SEAL_SECONDS = float(os.getenv('MERKLE_SEAL_SECONDS', '60'))
+
+def _sha256(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+def leaf_hash(entry: dict) -> str:
+    """Commits to the entry's identity, position and chain hash (which covers its changes)"""
+    leaf = {
+        'id': str(entry['_id']),
+        'property_id': entry['property_id'],
+        'seq': entry.get('seq'),
+        'action': entry['action'],
+        'timestamp': entry['timestamp'],
+        'hash': entry['hash'],
+        'prev_hash': entry.get('prev_hash'),
+    }
+    return _sha256(b'\x00' + canonical_bytes(leaf)).hex()
+
+def _node(left: str, right: str) -> str:
+    return _sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hex()
+
+def merkle_levels(leaves: List[str]) -> List[List[str]]:
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        nxt = [_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        levels.append(nxt)
+    return levels
+
+def inclusion_path(leaves: List[str], index: int) -> List[dict]:
+    """Sibling hashes from leaf to root: O(log n) of them"""
+    path = []
+    for level in merkle_levels(leaves)[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            path.append({'side': 'left' if sibling < index else 'right', 'hash': level[sibling]})
+        index //= 2
+    return path
+
+def verify_inclusion(leaf: str, path: List[dict], root: str) -> bool:
+    node = leaf
+    for step in path:
+        node = _node(step['hash'], node) if step['side'] == 'left' else _node(node, step['hash'])
+    return node == root
+
+def checkpoint_hash(prev_checkpoint: Optional[str], root: str, batch: int, count: int, last_id: str) -> str:
+    return _sha256(canonical_bytes({
+        'prev': prev_checkpoint, 'root': root, 'batch': batch, 'count': count, 'last_id': last_id,
+    })).hex()
+
+def sign(checkpoint: str) -> str:
+    if not SIGNING_KEY:
+        raise RuntimeError('AUDIT_SIGNING_KEY is not set; checkpoints cannot be signed or verified')
+    return hmac.new(SIGNING_KEY, checkpoint.encode(), hashlib.sha256).hexdigest()
+
+def verify_signature(checkpoint: str, signature: str) -> bool:
+    return hmac.compare_digest(sign(checkpoint), signature)
+
+def latest_batch() -> Optional[dict]:
+    return db.merkle_batches.find_one(sort=[('_id', -1)])
+
+def _claim(limit: int) -> Tuple[int, List[dict]]:
+    """The next batch number and its entries, marked merkle_pending; a batch left half sealed comes first"""
+    pending = db.audit_logs.find_one({'merkle_pending': {'$exists': True}}, {'merkle_pending': 1},
+                                     sort=[('merkle_pending', 1)])
+    if pending is not None:
+        number = pending['merkle_pending']
+    else:
+        prev = latest_batch()
+        number = prev['_id'] + 1 if prev else 1
+        ids = [e['_id'] for e in db.audit_logs.find(
+            {'merkle_batch': None, 'merkle_pending': {'$exists': False}}, {'_id': 1}, sort=[('_id', 1)], limit=limit)]
+        if not ids:
+            return number, []
+        db.audit_logs.bulk_write([
+            UpdateOne({'_id': _id, 'merkle_batch': None}, {'$set': {'merkle_pending': number, 'merkle_index': i}})
+            for i, _id in enumerate(ids)
+        ], ordered=False)
+    return number, list(db.audit_logs.find({'merkle_pending': number}, sort=[('merkle_index', 1)]))
+
+def seal_batch(limit: int = BATCH_SIZE) -> Optional[dict]:
+    """Seal up to `limit` unbatched entries into the next batch; None if nothing to seal"""
+    number, entries = _claim(limit)
+    if not entries:
+        return None
+    prev = db.merkle_batches.find_one({'_id': number - 1})
+    leaves = [leaf_hash(e) for e in entries]
+    root = merkle_levels(leaves)[-1][0]
+    last_id = str(entries[-1]['_id'])
+    checkpoint = checkpoint_hash(prev['checkpoint'] if prev else None, root, number, len(entries), last_id)
+    batch = {
+        '_id': number,
+        'root': root,
+        'count': len(entries),
+        'first_id': str(entries[0]['_id']),
+        'last_id': last_id,
+        'leaves': leaves,
+        'prev_checkpoint': prev['checkpoint'] if prev else None,
+        'checkpoint': checkpoint,
+        'signature': sign(checkpoint),
+        'sealed_at': datetime.utcnow(),
+    }
+    # A batch already written by an interrupted run has the same content; keep it as it was
+    db.merkle_batches.update_one({'_id': number}, {'$setOnInsert': batch}, upsert=True)
+    db.audit_logs.update_many({'merkle_pending': number},
+                              {'$set': {'merkle_batch': number}, '$unset': {'merkle_pending': ''}})
+    return db.merkle_batches.find_one({'_id': number})
+
+SEAL_LOCK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.merkle_seal.lock')
+
+def acquire_seal_lock():
+    """Batches must be sealed by one process at a time; held for the sealer's lifetime"""
+    return processes.acquire_lock(SEAL_LOCK_PATH)
+
+def spawn_sealer(every: float = SEAL_SECONDS):
+    """Start the sealer unless another worker's sealer holds the lock (then None)"""
+    if not SIGNING_KEY:
+        print('AUDIT_SIGNING_KEY is not set; not starting the Merkle sealer', file=sys.stderr)
+        return None
+    return processes.spawn_locked(os.path.abspath(__file__), SEAL_LOCK_PATH, ['--every', str(every)])
+
+def seal_all(limit: int = BATCH_SIZE) -> int:
+    sealed = 0
+    while seal_batch(limit):
+        sealed += 1
+    return sealed
+
+def inclusion_proof(log_id: str) -> Optional[dict]:
+    """Proof that one audit entry is in a sealed batch, with that batch's signed checkpoint"""
+    entry = db.audit_logs.find_one({'_id': ObjectId(log_id)})
+    if not entry:
+        return None
+    if entry.get('merkle_batch') is None:
+        return {'log_id': log_id, 'sealed': False}
+    batch = db.merkle_batches.find_one({'_id': entry['merkle_batch']})
+    leaf = leaf_hash(entry)
+    return {
+        'log_id': log_id,
+        'sealed': True,
+        'batch': batch['_id'],
+        'index': entry['merkle_index'],
+        'leaf': leaf,
+        'leaf_matches': batch['leaves'][entry['merkle_index']] == leaf,
+        'path': inclusion_path(batch['leaves'], entry['merkle_index']),
+        'root': batch['root'],
+        'prev_checkpoint': batch['prev_checkpoint'],
+        'checkpoint': batch['checkpoint'],
+        'signature': batch['signature'],
+    }
+
+def _batch_is_valid(batch: dict) -> bool:
+    expected = checkpoint_hash(batch['prev_checkpoint'], batch['root'], batch['_id'], batch['count'], batch['last_id'])
+    return expected == batch['checkpoint'] and verify_signature(batch['checkpoint'], batch['signature'])
+
+def verify_property_chain(property_id: str) -> dict:
+    """Check a property's audit chain starting at its newest sealed entry rather than genesis
+
+    The newest sealed entry is trusted once its leaf matches a batch whose
+    checkpoint signature verifies; only entries after it are re-hashed.
+    """
+    anchor = db.audit_logs.find_one(
+        {'property_id': property_id, 'seq': {'$exists': True}, 'merkle_batch': {'$ne': None}},
+        sort=[('seq', -1)])
+    query = {'property_id': property_id}
+    prev_hash = None
+    if anchor:
+        batch = db.merkle_batches.find_one({'_id': anchor['merkle_batch']})
+        if not (_batch_is_valid(batch) and batch['leaves'][anchor['merkle_index']] == leaf_hash(anchor)):
+            return {'valid': False, 'reason': f"sealed entry {anchor['_id']} does not match batch {batch['_id']}"}
+        query['seq'] = {'$gt': anchor['seq']}
+        prev_hash = anchor['hash']
+    checked = 0
+    # Chain order is seq; entries from before seq existed sort first, in _id order
+    for entry in db.audit_logs.find(query, sort=[('seq', 1), ('_id', 1)]):
+        if entry.get('prev_hash') != prev_hash:
+            return {'valid': False, 'reason': f"entry {entry['_id']} does not link to its predecessor"}
+        version = entry.get('hash_version', 1)
+        # Compact entries are checked as stored, without rebuilding the property
+        if hash_property_data(audit_store.hashed_content(entry), entry.get('prev_hash'), version) != entry['hash']:
+            return {'valid': False, 'reason': f"entry {entry['_id']} hash mismatch"}
+        prev_hash = entry['hash']
+        checked += 1
+    return {
+        'valid': True,
+        'checkpoint_batch': anchor['merkle_batch'] if anchor else None,
+        'entries_rehashed': checked,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Seal audit log entries into signed Merkle batches')
+    parser.add_argument('--every', type=float, help='keep sealing on this interval (seconds)')
+    parser.add_argument('--parent', type=int, help=argparse.SUPPRESS)  # set by spawn_sealer, which holds the lock for us
+    args = parser.parse_args()
+    if not SIGNING_KEY:
+        sys.exit('AUDIT_SIGNING_KEY must be set to sign checkpoints')
+    if args.parent is None and acquire_seal_lock() is None:
+        sys.exit('Another Merkle sealer is already running')
+    while True:
+        sealed = seal_all()
+        if sealed:
+            print(f'Sealed {sealed} batch(es); latest root {latest_batch()["root"]}')
+        if not args.every or not processes.sleep_unless_orphaned(args.every, args.parent):
+            break
@@ -0,0 +1,164 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from pymongo import monitoring
+
+# Prometheus metrics for the backend, served by GET /metrics:
+#   http_request_duration_seconds   per route template, method and status
+#   http_request_mongo_commands     Mongo commands issued while serving a request
+#   stage_duration_seconds          named stages (audit append, each fraud check, ...)
+#   mongo_command_duration_seconds  per command name, from the driver's command listener
+#   fraud_model_inference_seconds   IsolationForest scoring, single row or batch
+# Stages and command counts are also collected per request (the state follows
+# the request into threadpool and Motor executor threads via contextvars), and
+# with METRICS_SERVER_TIMING=1 each response carries them in a Server-Timing
+# header for the browser's network panel. With several workers, set
+# PROMETHEUS_MULTIPROC_DIR so /metrics aggregates every process.
+
+SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', '0') == '1'
+
+FAST_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Time to the response headers',
+                            ['method', 'route', 'status'])
+REQUEST_COMMANDS = Histogram('http_request_mongo_commands', 'Mongo commands issued per request',
+                             ['method', 'route'], buckets=COUNT_BUCKETS)
+STAGE_SECONDS = Histogram('stage_duration_seconds', 'Time spent in a named stage', ['stage'], buckets=FAST_BUCKETS)
+COMMAND_SECONDS = Histogram('mongo_command_duration_seconds', 'Mongo command round trip', ['command'],
+                            buckets=FAST_BUCKETS)
+COMMAND_FAILURES = Counter('mongo_command_failures_total', 'Mongo commands that returned an error', ['command'])
+INFERENCE_SECONDS = Histogram('fraud_model_inference_seconds', 'Fraud model scoring call', ['mode'],
+                              buckets=FAST_BUCKETS)
+
+class RequestMetrics:
+    """Stage totals and Mongo command count for one request"""
+
+    def __init__(self):
+        self.stages = {}  # name -> seconds, summed over repeats
+        self.commands = 0
+        self._lock = threading.Lock()  # gathered queries land from several executor threads
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_command(self):
+        with self._lock:
+            self.commands += 1
+
+    def server_timing(self, total: float) -> str:
+        parts = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.stages.items()]
+        parts.append(f'mongo;desc="{self.commands} commands"')
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+@contextmanager
+def stage(name: str):
+    """Time the block into stage_duration_seconds and the current request's stages"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        request = _current.get()
+        if request is not None:
+            request.add_stage(name, elapsed)
+
+@contextmanager
+def inference(mode: str):
+    """The fraud.model_inference stage, also fed to fraud_model_inference_seconds by mode"""
+    start = time.perf_counter()
+    with stage('fraud.model_inference'):
+        yield
+    INFERENCE_SECONDS.labels(mode).observe(time.perf_counter() - start)
+
+def timed(name: str):
+    """Decorator form of stage"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class CommandListener(monitoring.CommandListener):
+    def started(self, event):
+        request = _current.get()
+        if request is not None:
+            request.add_command()
+
+    def succeeded(self, event):
+        COMMAND_SECONDS.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        COMMAND_SECONDS.labels(event.command_name).observe(event.duration_micros / 1e6)
+        COMMAND_FAILURES.labels(event.command_name).inc()
+
+command_listener = CommandListener()
+
+def _route(scope) -> str:
+    # Label by path template, not the raw path, to keep cardinality bounded
+    endpoint = scope.get('endpoint')
+    router = scope.get('router')
+    if endpoint is not None and router is not None:
+        for route in router.routes:
+            if getattr(route, 'endpoint', None) is endpoint:
+                return route.path
+    return 'unmatched'
+
+class MetricsMiddleware:
+    """ASGI middleware recording each HTTP request; streamed bodies count until their headers are sent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        request = RequestMetrics()
+        token = _current.set(request)
+        start = time.perf_counter()
+        recorded = False
+
+        def record(status: int) -> float:
+            nonlocal recorded
+            recorded = True
+            elapsed = time.perf_counter() - start
+            route = _route(scope)
+            REQUEST_SECONDS.labels(scope['method'], route, str(status)).observe(elapsed)
+            REQUEST_COMMANDS.labels(scope['method'], route).observe(request.commands)
+            return elapsed
+
+        async def send_with_metrics(message):
+            if message['type'] == 'http.response.start':
+                elapsed = record(message['status'])
+                if SERVER_TIMING:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'server-timing', request.server_timing(elapsed).encode('latin-1')))
+                    message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            if not recorded:
+                record(500)
+            _current.reset(token)
+
+def render() -> bytes:
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
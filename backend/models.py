@@ -18,6 +18,11 @@ class PropertyBase(BaseModel):
     location: str
     verification: Optional[str]
     terms: str
+    price: Optional[float] = None  # feeds the per-location price stats
+
+    def document(self) -> dict:
+        """Fields to store; a missing price is left out so an update keeps the stored one"""
+        return self.dict(exclude={'price'} if self.price is None else None)
 
 class PropertyCreate(PropertyBase):
     pass
@@ -28,12 +33,55 @@ class Property(PropertyBase):
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
 
+class PropertySummary(BaseModel):
+    # List rows may be projected down to a subset of Property's fields
+    id: Optional[str] = None
+    owner: Optional[User] = None
+    buyer_intent: Optional[str] = None
+    location: Optional[str] = None
+    verification: Optional[str] = None
+    terms: Optional[str] = None
+    price: Optional[float] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class PropertySearchHit(PropertySummary):
+    score: Optional[float] = None
+
+class SimilarProperty(PropertySummary):
+    similarity: Optional[float] = None
+
+class AuditLogSummary(BaseModel):
+    # History pages may be projected down to a subset of AuditLog's fields
+    id: Optional[str] = None
+    property_id: Optional[str] = None
+    action: Optional[str] = None
+    hash: Optional[str] = None
+    prev_hash: Optional[str] = None
+    seq: Optional[int] = None
+    hash_version: Optional[int] = None
+    timestamp: Optional[datetime] = None
+    changes: Optional[dict] = None
+    snapshot: Optional[dict] = None
+    delta: Optional[dict] = None
+    user: Optional[User] = None
+    fraud_status: Optional[str] = None
+    fraud_detected: Optional[bool] = None
+    fraud_reason: Optional[str] = None
+
 class AuditLog(BaseModel):
     id: Optional[str]
     property_id: str
     action: str
     hash: str
     prev_hash: Optional[str]
+    seq: Optional[int] = None  # position in the property's chain; absent on entries that predate it
+    hash_version: Optional[int] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
-    changes: dict
-    user: Optional[User] 
\ No newline at end of file
+    changes: dict  # the whole property; rebuilt from snapshot/delta on compact entries
+    snapshot: Optional[dict] = None  # compact entries store one of these two, and hash it
+    delta: Optional[dict] = None
+    user: Optional[User]
+    fraud_status: Optional[str] = None  # 'pending' until async scoring writes the result
+    fraud_detected: Optional[bool] = None
+    fraud_reason: Optional[str] = None 
\ No newline at end of file
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Opaque keyset cursors: the last row's sort value and _id, bound to the sort
+# they were issued for so a token can't be replayed against a different order.
+
+def encode_cursor(sort_field: str, order: str, doc: dict) -> str:
+    value = doc.get(sort_field) if sort_field != '_id' else None
+    if isinstance(value, datetime):
+        value = {'$date': value.isoformat()}
+    payload = {'s': sort_field, 'o': order, 'v': value, 'id': str(doc['_id'])}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token: str, sort_field: str, order: str) -> Tuple[object, ObjectId]:
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = payload['v']
+        if isinstance(value, dict) and '$date' in value:
+            value = datetime.fromisoformat(value['$date'])
+        last_id = ObjectId(payload['id'])
+    except Exception:
+        raise HTTPException(status_code=400, detail='Invalid pagination cursor')
+    if payload.get('s') != sort_field or payload.get('o') != order:
+        raise HTTPException(status_code=400, detail='Cursor does not match sort order')
+    return value, last_id
+
+def keyset_filter(sort_field: str, order: str, token: Optional[str]) -> dict:
+    """Build the query clause that resumes after the row encoded in `token`"""
+    if not token:
+        return {}
+    value, last_id = decode_cursor(token, sort_field, order)
+    op = '$lt' if order == 'desc' else '$gt'
+    if sort_field == '_id':
+        return {'_id': {op: last_id}}
+    return {'$or': [
+        {sort_field: {op: value}},
+        {sort_field: value, '_id': {op: last_id}},
+    ]}
+
+def keyset_sort(sort_field: str, order: str) -> list:
+    direction = -1 if order == 'desc' else 1
+    if sort_field == '_id':
+        return [('_id', direction)]
+    return [(sort_field, direction), ('_id', direction)]
+
+def parse_projection(fields: Optional[str], allowed: set, always: tuple = ()) -> Optional[dict]:
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(',') if f.strip()}
+    unknown = requested - allowed
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    projection = {f: 1 for f in requested}
+    for f in always:
+        projection[f] = 1
+    return projection
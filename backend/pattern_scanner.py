@@ -0,0 +1,126 @@
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional
+
+# Suspicious-content rules: field -> category -> regex. Values are lowercased
+# before scanning, so case-insensitive rules work either way.
+DEFAULT_RULES = {
+    'location': {
+        'phone_number': r'\d{10}',
+        'url': r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
+        'email_address': r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}',
+        'promo_keyword': r'(?i)(free|cheap|discount|offer|deal|sale)',
+        'urgency': r'(?i)(urgent|quick|fast|immediate)',
+    },
+    'terms': {
+        'payment_method': r'(?i)(wire transfer|western union|money order)',
+        'guarantee': r'(?i)(guarantee|warranty|refund)',
+        'confidentiality': r'(?i)(confidential|secret|private)',
+    },
+}
+
+_LEADING_I = re.compile(r'^\(\?i\)')
+
+def _compile(pattern: str) -> re.Pattern:
+    # Values are lowercased before scanning, so a leading (?i) on an all-lowercase
+    # rule is redundant, and case-insensitive matching defeats re's literal-prefix
+    # skipping. Rules with uppercase characters keep the flag.
+    body = _LEADING_I.sub('', pattern)
+    return re.compile(body if body == body.lower() else pattern)
+
+class PatternScanner:
+    """Compiled suspicious-content rules returning matched categories and counts
+
+    Each category is its own compiled regex rather than one alternation per
+    field: CPython's backtracking engine gives up its per-pattern prefix scans
+    on a merged alternation, which measured 2-3x slower per document here.
+    """
+
+    def __init__(self, rules: Dict[str, Dict[str, str]] = DEFAULT_RULES):
+        self.rules = rules
+        self.compiled = {
+            field: [(name, _compile(pattern)) for name, pattern in categories.items()]
+            for field, categories in rules.items()
+        }
+
+    @classmethod
+    def from_file(cls, path: str) -> 'PatternScanner':
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def scan_value(self, field: str, value) -> Dict[str, int]:
+        """Matched categories in one field value, with their match counts"""
+        text = str(value).lower()
+        hits = {}
+        for name, regex in self.compiled[field]:
+            m = regex.search(text)
+            if m:
+                # Only matched categories pay for counting the remaining occurrences
+                hits[name] = 1 + sum(1 for _ in regex.finditer(text, max(m.end(), m.start() + 1)))
+        return hits
+
+    def scan(self, doc: dict) -> Dict[str, Dict[str, int]]:
+        """field -> {category: count} for every field of `doc` that has rules and matched"""
+        result = {}
+        for field in self.compiled:
+            if field in doc:
+                hits = self.scan_value(field, doc[field])
+                if hits:
+                    result[field] = hits
+        return result
+
+    def scan_many(self, docs: Iterable[dict]) -> List[Dict[str, Dict[str, int]]]:
+        return [self.scan(doc) for doc in docs]
+
+    @staticmethod
+    def category_count(scan_result: Dict[str, Dict[str, int]]) -> int:
+        """Number of distinct (field, category) pairs that matched"""
+        return sum(len(hits) for hits in scan_result.values())
+
+def load_scanner(path: Optional[str] = None) -> PatternScanner:
+    path = path or os.getenv('FRAUD_PATTERNS_FILE')
+    return PatternScanner.from_file(path) if path else PatternScanner()
+
+def benchmark(docs: List[dict], scanner: Optional[PatternScanner] = None, repeat: int = 5) -> dict:
+    """Per-document scan time: one scanner pass vs the previous two re.search passes per write"""
+    scanner = scanner or load_scanner()
+
+    def run_legacy():
+        # prepare_features and check_patterns each searched every raw pattern string
+        for doc in docs:
+            for _ in range(2):
+                for field, categories in scanner.rules.items():
+                    if field in doc:
+                        value = str(doc[field]).lower()
+                        for pattern in categories.values():
+                            re.search(pattern, value)
+
+    def best_of(fn):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best / max(len(docs), 1) * 1e6
+
+    return {
+        'documents': len(docs),
+        'scanner_us_per_doc': best_of(lambda: scanner.scan_many(docs)),
+        'legacy_us_per_doc': best_of(run_legacy),
+    }
+
+if __name__ == '__main__':
+    import random
+    rng = random.Random(0)
+    words = ['sunny', 'apartment', 'near', 'park', 'lease', 'payment', 'monthly', 'deposit', 'terms', 'downtown']
+    flagged = ['call 5551234567', 'visit https://example.com/deal', 'wire transfer only', 'urgent sale', 'mail me@example.com']
+    docs = []
+    for i in range(5000):
+        location = ' '.join(rng.choice(words) for _ in range(6))
+        terms = ' '.join(rng.choice(words) for _ in range(30))
+        if rng.random() < 0.1:
+            terms += ' ' + rng.choice(flagged)
+        docs.append({'location': location, 'terms': terms})
+    print(json.dumps(benchmark(docs), indent=2))
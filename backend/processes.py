@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+# Background jobs (the fraud model trainer, the Merkle sealer) run as child
+# processes of a web worker. Each job has a lock file; a worker spawns the job
+# only if it takes the lock, and hands the locked descriptor to the child, so
+# the lock is held for exactly the child's lifetime and other workers (and
+# restarts) never start a second copy. The child is told its parent's pid and
+# exits once that parent is gone, and the parent stops it on shutdown.
+
+def acquire_lock(path: str):
+    """The lock file at `path`, opened and locked, or None if another process holds it"""
+    import fcntl
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock = open(path, 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+def spawn_locked(script: str, lock_path: str, args: List[str]) -> Optional[subprocess.Popen]:
+    """Run `script` with `args` holding the lock at lock_path; None if it is already held"""
+    lock = acquire_lock(lock_path)
+    if lock is None:
+        return None
+    try:
+        return subprocess.Popen(
+            [sys.executable, script, '--parent', str(os.getpid()), *args],
+            cwd=os.path.dirname(script), pass_fds=(lock.fileno(),))
+    finally:
+        # The child's inherited descriptor keeps the lock
+        lock.close()
+
+def sleep_unless_orphaned(seconds: float, parent: Optional[int]) -> bool:
+    """Sleep; False as soon as the spawning worker has exited"""
+    deadline = time.monotonic() + seconds
+    while True:
+        if parent is not None and os.getppid() != parent:
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return True
+        time.sleep(min(remaining, 1.0))
+
+def stop(proc: Optional[subprocess.Popen], timeout: float = 10):
+    """Terminate a spawned job and reap it"""
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
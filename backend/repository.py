@@ -0,0 +1,167 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference, ReturnDocument
+from db import MONGO_URI, DB_NAME, client_options
+
+# Async data access for request handlers. Routes await these instead of
+# calling the blocking client in db.py, so a worker serves other requests
+# while Mongo round trips are in flight rather than parking a threadpool
+# thread on each. Background jobs, CLIs and the audit/fraud pipeline (which
+# also owns risk_assessments) keep using db.py.
+
+# Applied to list/history reads only; single-document reads and everything
+# the audit chain depends on stay on the primary
+READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', 'primary')
+_READ_PREFERENCES = {
+    'primary': ReadPreference.PRIMARY,
+    'primaryPreferred': ReadPreference.PRIMARY_PREFERRED,
+    'secondary': ReadPreference.SECONDARY,
+    'secondaryPreferred': ReadPreference.SECONDARY_PREFERRED,
+    'nearest': ReadPreference.NEAREST,
+}
+
+async_client = AsyncIOMotorClient(MONGO_URI, **client_options())
+async_db = async_client[DB_NAME]
+
+def _lagging_reads(database, name: str):
+    return database.get_collection(name, read_preference=_READ_PREFERENCES[READ_PREFERENCE])
+
+class PropertyRepository:
+    def __init__(self, database):
+        self.collection = database.properties
+        self.reads = _lagging_reads(database, 'properties')
+
+    async def find_page(self, query: dict, projection: Optional[dict], sort: list, limit: int) -> List[dict]:
+        return await self.reads.find(query, projection).sort(sort).limit(limit).to_list(length=limit)
+
+    async def aggregate(self, pipeline: list) -> List[dict]:
+        return await self.reads.aggregate(pipeline).to_list(length=None)
+
+    async def get(self, property_id: str) -> Optional[dict]:
+        return await self.collection.find_one({'_id': ObjectId(property_id)})
+
+    async def insert(self, doc: dict) -> str:
+        result = await self.collection.insert_one(doc)
+        return str(result.inserted_id)
+
+    async def update(self, property_id: str, fields: dict) -> Optional[dict]:
+        """Apply `fields` and return the document as it was before"""
+        return await self.collection.find_one_and_update(
+            {'_id': ObjectId(property_id)}, {'$set': fields}, return_document=ReturnDocument.BEFORE)
+
+    async def delete(self, property_id: str) -> Optional[dict]:
+        return await self.collection.find_one_and_delete({'_id': ObjectId(property_id)})
+
+class AuditRepository:
+    def __init__(self, database):
+        self.reads = _lagging_reads(database, 'audit_logs')
+
+    async def find_page(self, query: dict, projection: Optional[dict], sort: list, limit: int) -> List[dict]:
+        return await self.reads.find(query, projection).sort(sort).limit(limit).to_list(length=limit)
+
+class UserRepository:
+    def __init__(self, database):
+        self.collection = database.users
+
+    async def by_email(self, email: str) -> Optional[dict]:
+        return await self.collection.find_one({'email': email})
+
+    async def insert(self, user: dict) -> str:
+        result = await self.collection.insert_one(user)
+        return str(result.inserted_id)
+
+class StatsRepository:
+    """Dashboard summary: one aggregation per facet, run concurrently"""
+    top_locations = 10
+    recent_entries = 5
+
+    def __init__(self, database):
+        self.properties = _lagging_reads(database, 'properties')
+        self.audit_logs = _lagging_reads(database, 'audit_logs')
+        self.risk_assessments = _lagging_reads(database, 'risk_assessments')
+
+    @staticmethod
+    async def _run(collection, pipeline: list) -> List[dict]:
+        return await collection.aggregate(pipeline).to_list(length=None)
+
+    @staticmethod
+    def _counts(rows: List[dict]) -> dict:
+        return {row['_id'] if row['_id'] is not None else 'none': row['count'] for row in rows}
+
+    async def _fill_locations(self, recent: List[dict]):
+        # A delta that left the location alone doesn't carry it; the listing's current one stands in
+        ids = [ObjectId(row['property_id']) for row in recent
+               if row.get('location') is None and ObjectId.is_valid(row['property_id'])]
+        if not ids:
+            return
+        current = await self.properties.find({'_id': {'$in': ids}}, {'location': 1}).to_list(length=None)
+        locations = {str(doc['_id']): doc.get('location') for doc in current}
+        for row in recent:
+            if row.get('location') is None:
+                row['location'] = locations.get(row['property_id'])
+
+    async def dashboard(self, risk_threshold: float, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.utcnow()
+        day, week = now - timedelta(days=1), now - timedelta(days=7)
+        verification, intent, locations, activity, recent, fraud = await asyncio.gather(
+            self._run(self.properties, [{'$group': {'_id': '$verification', 'count': {'$sum': 1}}}]),
+            self._run(self.properties, [{'$group': {'_id': '$buyer_intent', 'count': {'$sum': 1}}}]),
+            self._run(self.properties, [
+                {'$group': {'_id': '$location', 'count': {'$sum': 1}}},
+                {'$sort': {'count': -1, '_id': 1}},
+                {'$limit': self.top_locations},
+            ]),
+            self._run(self.audit_logs, [
+                {'$match': {'timestamp': {'$gte': week}}},
+                {'$group': {
+                    '_id': '$action',
+                    'last_7d': {'$sum': 1},
+                    'last_24h': {'$sum': {'$cond': [{'$gte': ['$timestamp', day]}, 1, 0]}},
+                }},
+            ]),
+            self._run(self.audit_logs, [
+                {'$sort': {'timestamp': -1}},
+                {'$limit': self.recent_entries},
+                {'$project': {'_id': 0, 'action': 1, 'property_id': 1, 'timestamp': 1, 'location': {
+                    '$ifNull': ['$changes.location', {'$ifNull': ['$snapshot.location', '$delta.set.location']}]}}},
+            ]),
+            self._run(self.risk_assessments, [
+                {'$match': {'timestamp': {'$gte': week}}},
+                {'$group': {
+                    '_id': None,
+                    'assessed': {'$sum': 1},
+                    'flagged': {'$sum': {'$cond': [{'$gt': ['$risk_score', risk_threshold]}, 1, 0]}},
+                    'mean_risk_score': {'$avg': '$risk_score'},
+                }},
+            ]),
+        )
+        await self._fill_locations(recent)
+        verification_counts = self._counts(verification)
+        fraud = fraud[0] if fraud else {'assessed': 0, 'flagged': 0, 'mean_risk_score': None}
+        return {
+            'total': sum(verification_counts.values()),
+            'verification': verification_counts,
+            'intent': self._counts(intent),
+            'top_locations': [{'location': row['_id'], 'count': row['count']} for row in locations],
+            'activity': {
+                'last_24h': sum(row['last_24h'] for row in activity),
+                'last_7d': sum(row['last_7d'] for row in activity),
+                'by_action': {row['_id']: {'last_24h': row['last_24h'], 'last_7d': row['last_7d']} for row in activity},
+            },
+            'recent': recent,
+            'fraud_last_7d': {
+                'assessed': fraud['assessed'],
+                'flagged': fraud['flagged'],
+                'flag_rate': fraud['flagged'] / fraud['assessed'] if fraud['assessed'] else 0.0,
+                'mean_risk_score': fraud['mean_risk_score'],
+            },
+        }
+
+properties = PropertyRepository(async_db)
+audit_logs = AuditRepository(async_db)
+users = UserRepository(async_db)
+stats = StatsRepository(async_db)
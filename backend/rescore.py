@@ -0,0 +1,170 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Optional, Tuple
+from bson import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+
+# Re-score existing audit entries after the fraud rules, weights or model
+# change. The entries are walked in _id order in chunks; each chunk is scored
+# in a worker process (its own Mongo client and a copy of the saved model),
+# the whole chunk through FraudDetector.assess_batch with every entry scored
+# as of its own timestamp. Results are written back with bulk_write and
+# tagged with the scoring version:
+#   audit_logs        fraud_detected, fraud_reason, scoring_version, rescored_at
+#   risk_assessments  one per (audit_log_id, scoring_version), upserted
+# Progress is checkpointed per version in `rescore_checkpoints` once every
+# chunk before it has been written, so an interrupted run picks up where it
+# left off; entries already re-scored by this run are skipped either way.
+# Entries written after the run started were scored live and are left alone.
+# Duplicate checks only match listings created before each entry, but compare
+# against their current content (and miss ones deleted since).
+# Cached audit pages are invalidated only with a shared cache (CACHE_URL);
+# with the default per-worker cache, workers serve the old fraud results for
+# up to CACHE_TTL_SECONDS after a chunk is written, since this process can't
+# reach their caches.
+#
+#   python rescore.py --version rules-2024-06 --workers 8
+
+CHUNK_SIZE = 1000
+
+def score_chunk(low: ObjectId, high: ObjectId, version: str, started_at: datetime) -> Tuple[int, int]:
+    """Score and write back the entries with low <= _id <= high; returns (scored, flagged)"""
+    from db import db
+    import audit_store
+    import cache
+    from verification import fraud_detector
+    entries = list(db.audit_logs.find(
+        {'_id': {'$gte': low, '$lte': high},
+         '$nor': [{'scoring_version': version, 'rescored_at': {'$gte': started_at}}],
+         # The scoring queue still owns these
+         'fraud_status': {'$nin': ['pending', 'scoring']}},
+        sort=[('_id', 1)]))
+    if not entries:
+        return 0, 0
+    # By seq, not from the chunk: pending entries and ones this run already scored are filtered out of it
+    prev_logs = audit_store.predecessors(entries, db)
+    audit_store.materialize(entries + [log for log in prev_logs if log])
+    results = fraud_detector.assess_batch(
+        [(entry.get('changes') or {}, entry.get('user') or {}, prev_log) for entry, prev_log in zip(entries, prev_logs)],
+        as_of=[entry['timestamp'] for entry in entries],
+        property_ids=[entry['property_id'] for entry in entries])
+
+    now = datetime.utcnow()
+    updates, assessments = [], []
+    for entry, (fraud_detected, fraud_reason, assessment) in zip(entries, results):
+        updates.append(UpdateOne({'_id': entry['_id']}, {'$set': {
+            'fraud_detected': fraud_detected,
+            'fraud_reason': fraud_reason,
+            'scoring_version': version,
+            'rescored_at': now,
+        }}))
+        assessment.update(audit_log_id=str(entry['_id']), scoring_version=version)
+        assessments.append(ReplaceOne({'audit_log_id': assessment['audit_log_id'], 'scoring_version': version},
+                                      assessment, upsert=True))
+    db.risk_assessments.bulk_write(assessments, ordered=False)
+    db.audit_logs.bulk_write(updates, ordered=False)
+    if cache.CACHE_URL:
+        for property_id in {entry['property_id'] for entry in entries}:
+            cache.invalidate_audit(property_id)
+    return len(entries), sum(1 for fraud_detected, _, _ in results if fraud_detected)
+
+def _init_worker():
+    # Each process scores with the model saved on disk, as the app workers do
+    import fraud_model
+    from verification import fraud_detector
+    bundle = fraud_model.load_model()
+    if bundle is not None:
+        fraud_detector.swap_model(bundle['model'], bundle['scaler'], bundle['meta'])
+
+def _chunks(database, after: Optional[ObjectId], until: ObjectId, chunk_size: int):
+    """(low, high) _id bounds of consecutive chunks, read from the _id index only"""
+    query = {'_id': {'$lte': until}}
+    if after is not None:
+        query['_id']['$gt'] = after
+    ids = []
+    for doc in database.audit_logs.find(query, {'_id': 1}, sort=[('_id', 1)], batch_size=chunk_size):
+        ids.append(doc['_id'])
+        if len(ids) == chunk_size:
+            yield ids[0], ids[-1]
+            ids = []
+    if ids:
+        yield ids[0], ids[-1]
+
+def checkpoint(version: str, restart: bool = False) -> Optional[dict]:
+    """This version's checkpoint, started fresh when missing or on restart; None if nothing to score"""
+    from db import db
+    if restart:
+        db.rescore_checkpoints.delete_one({'_id': version})
+    state = db.rescore_checkpoints.find_one({'_id': version})
+    if state is None:
+        newest = db.audit_logs.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        if newest is None:
+            return None
+        state = {'_id': version, 'until': newest['_id'], 'last_id': None, 'scored': 0, 'flagged': 0,
+                 'started_at': datetime.utcnow(), 'updated_at': datetime.utcnow(), 'done': False}
+        db.rescore_checkpoints.insert_one(state)
+    return state
+
+def run(version: str, workers: int = 1, chunk_size: int = CHUNK_SIZE, restart: bool = False) -> Optional[dict]:
+    """Re-score every entry up to the run's high-water mark; returns the final checkpoint"""
+    from db import db
+    state = checkpoint(version, restart)
+    if state is None or state['done']:
+        return state
+    pool = None
+    if workers > 1:
+        # spawn, not fork: each worker needs its own Mongo client
+        pool = ProcessPoolExecutor(workers, mp_context=get_context('spawn'), initializer=_init_worker)
+    else:
+        _init_worker()
+    in_flight = deque()
+    start = time.perf_counter()
+    scored_this_run = 0
+
+    def finish_oldest():
+        nonlocal scored_this_run
+        result, high = in_flight.popleft()
+        scored, flagged = result.result() if pool else result
+        scored_this_run += scored
+        # Chunks complete out of order; only advance past ones whose predecessors are written
+        db.rescore_checkpoints.update_one({'_id': version}, {
+            '$set': {'last_id': high, 'updated_at': datetime.utcnow()},
+            '$inc': {'scored': scored, 'flagged': flagged}})
+        rate = scored_this_run / max(time.perf_counter() - start, 1e-9)
+        print(f'{version}: through {high}, {scored_this_run} scored this run ({rate:.0f}/s)', file=sys.stderr)
+
+    try:
+        for low, high in _chunks(db, state['last_id'], state['until'], chunk_size):
+            if pool:
+                in_flight.append((pool.submit(score_chunk, low, high, version, state['started_at']), high))
+                if len(in_flight) >= workers * 2:
+                    finish_oldest()
+            else:
+                in_flight.append((score_chunk(low, high, version, state['started_at']), high))
+                finish_oldest()
+        while in_flight:
+            finish_oldest()
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    db.rescore_checkpoints.update_one({'_id': version}, {'$set': {'done': True, 'updated_at': datetime.utcnow()}})
+    return db.rescore_checkpoints.find_one({'_id': version})
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-score existing audit entries with the current fraud rules and model')
+    parser.add_argument('--version', required=True, help='scoring version tag written with the results')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='scoring processes')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='entries per chunk')
+    parser.add_argument('--restart', action='store_true', help='ignore this version\'s checkpoint and start over')
+    args = parser.parse_args()
+    result = run(args.version, args.workers, args.chunk_size, args.restart)
+    if result is None:
+        print('No audit entries to score')
+    else:
+        print(f"{args.version}: {result['scored']} scored, {result['flagged']} flagged")
@@ -0,0 +1,163 @@
+import os
+import queue
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+from pymongo import UpdateOne
+from db import db
+import cache
+import audit_store
+import events
+from verification import FraudDetector, fraud_detector
+
+# Background fraud scoring for FRAUD_SCORING_MODE=async. log_audit commits each
+# entry with fraud_status 'pending' and submits its id here; a worker thread
+# drains ids in batches, claims them in Mongo (so several app workers never
+# score the same entry), scores them and writes results back in bulk.
+
+BATCH_SIZE = int(os.getenv('FRAUD_SCORING_BATCH_SIZE', '100'))
+MAX_WAIT_SECONDS = float(os.getenv('FRAUD_SCORING_MAX_WAIT', '0.5'))
+SWEEP_SECONDS = float(os.getenv('FRAUD_SCORING_SWEEP_SECONDS', '30'))
+STALE_CLAIM = timedelta(minutes=5)
+
+class ScoringQueue:
+    def __init__(self, detector: FraudDetector, batch_size: int = BATCH_SIZE,
+                 max_wait: float = MAX_WAIT_SECONDS, sweep_interval: float = SWEEP_SECONDS):
+        self.detector = detector
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.sweep_interval = sweep_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = threading.Event()
+        self.scored_total = 0
+        self.last_batch_size = 0
+        self.last_lag_seconds = None
+        self.last_scored_at = None
+
+    def submit(self, audit_id):
+        self._queue.put(audit_id)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name='fraud-scoring')
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _next_batch(self) -> List:
+        try:
+            batch = [self._queue.get(timeout=self.max_wait)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        last_sweep = None
+        while not self._stopped.is_set():
+            now = datetime.utcnow()
+            if last_sweep is None or (now - last_sweep).total_seconds() >= self.sweep_interval:
+                # Pick up entries left pending by a restart or another worker's crash
+                self.sweep()
+                last_sweep = now
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self.score_batch(batch)
+            except Exception as e:
+                # Entries stay claimed and are retried by a later sweep once stale
+                print(f'Fraud scoring batch failed: {e}', file=sys.stderr)
+
+    def sweep(self) -> int:
+        stale = datetime.utcnow() - STALE_CLAIM
+        ids = [doc['_id'] for doc in db.audit_logs.find(
+            {'$or': [
+                {'fraud_status': 'pending'},
+                {'fraud_status': 'scoring', 'scoring_claimed_at': {'$lt': stale}},
+            ]},
+            {'_id': 1},
+            sort=[('timestamp', 1)],
+            limit=self.batch_size * 10
+        )]
+        for audit_id in ids:
+            self.submit(audit_id)
+        return len(ids)
+
+    def _claim(self, ids: List) -> List[dict]:
+        token = uuid.uuid4().hex
+        now = datetime.utcnow()
+        db.audit_logs.update_many(
+            {'_id': {'$in': ids}, '$or': [
+                {'fraud_status': 'pending'},
+                {'fraud_status': 'scoring', 'scoring_claimed_at': {'$lt': now - STALE_CLAIM}},
+            ]},
+            {'$set': {'fraud_status': 'scoring', 'scoring_claim': token, 'scoring_claimed_at': now}}
+        )
+        return list(db.audit_logs.find({'_id': {'$in': ids}, 'scoring_claim': token}, sort=[('timestamp', 1)]))
+
+    def score_batch(self, ids: List) -> int:
+        entries = self._claim(ids)
+        if not entries:
+            return 0
+        assessments = []
+        updates = []
+        prev_logs = audit_store.predecessors(entries)
+        # Compact entries are scored against the whole property, as at write time
+        audit_store.materialize(entries + [prev_log for prev_log in prev_logs if prev_log])
+        results = self.detector.assess_batch(
+            [(entry['changes'], entry['user'], prev_log) for entry, prev_log in zip(entries, prev_logs)],
+            as_of=[entry['timestamp'] for entry in entries],
+            property_ids=[entry['property_id'] for entry in entries])
+        for entry, (fraud_detected, fraud_reason, assessment) in zip(entries, results):
+            assessment['audit_log_id'] = str(entry['_id'])
+            assessments.append(assessment)
+            entry.update({
+                'fraud_status': 'scored',
+                'fraud_detected': fraud_detected,
+                'fraud_reason': fraud_reason,
+                'scored_at': datetime.utcnow(),
+            })
+            updates.append(UpdateOne(
+                {'_id': entry['_id'], 'scoring_claim': entry['scoring_claim']},
+                {'$set': {field: entry[field] for field in ('fraud_status', 'fraud_detected', 'fraud_reason', 'scored_at')},
+                 '$unset': {'scoring_claim': '', 'scoring_claimed_at': ''}}
+            ))
+        db.risk_assessments.insert_many(assessments)
+        db.audit_logs.bulk_write(updates, ordered=False)
+        for property_id in {e['property_id'] for e in entries}:
+            cache.invalidate_audit(property_id)
+        events.publish_flagged(entries)
+        now = datetime.utcnow()
+        self.scored_total += len(entries)
+        self.last_batch_size = len(entries)
+        self.last_lag_seconds = max((now - e['timestamp']).total_seconds() for e in entries)
+        self.last_scored_at = now
+        return len(entries)
+
+    def status(self) -> dict:
+        oldest = db.audit_logs.find_one(
+            {'fraud_status': {'$in': ['pending', 'scoring']}},
+            {'timestamp': 1},
+            sort=[('timestamp', 1)]
+        )
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'queue_depth': self._queue.qsize(),
+            'pending': db.audit_logs.count_documents({'fraud_status': {'$in': ['pending', 'scoring']}}),
+            'oldest_pending_seconds': (datetime.utcnow() - oldest['timestamp']).total_seconds() if oldest else 0.0,
+            'last_lag_seconds': self.last_lag_seconds,
+            'last_batch_size': self.last_batch_size,
+            'last_scored_at': self.last_scored_at,
+            'scored_total': self.scored_total,
+        }
+
+scoring_queue = ScoringQueue(fraud_detector)
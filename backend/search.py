@@ -0,0 +1,123 @@
+import re
+import unicodedata
+from typing import List, Optional
+from pymongo import UpdateOne
+from db import db
+from pagination import keyset_filter, encode_cursor
+
+# Search keys are derived from location and terms on every write and stored
+# on the property under `search`, each array behind a multikey index:
+#   loc    location tokens               exact token match (ranked highest)
+#   pre    location token prefixes       typeahead on a partial last word
+#   tri    location token trigrams       typo-tolerant matching
+#   terms  distinct terms tokens         token match in the terms text
+# Tokens are lowercased and accent-stripped, so "new york" finds "New York, NY".
+# A query narrows to matching documents through those indexes, then scores
+# every match and sorts by (score, _id) before limiting, so a page is the
+# true top of the ranking and pages never overlap or skip; with the limit
+# right after the sort, Mongo keeps only the top rows in memory. A very
+# common prefix still means scoring every listing that has it: latency at 1M
+# listings is an open item, not yet measured against a real mongod.
+
+PREFIX_MIN, PREFIX_MAX = 2, 12
+MAX_TERMS_TOKENS = 256
+FUZZY_MIN_SIMILARITY = 0.3
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    folded = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode().lower()
+    return _TOKEN.findall(folded)
+
+def _unique(items) -> list:
+    return list(dict.fromkeys(items))
+
+def trigrams(token: str) -> List[str]:
+    padded = f'  {token} '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def search_fields(doc: dict) -> dict:
+    """The `search` subdocument for a property"""
+    loc = _unique(tokenize(doc.get('location')))
+    return {
+        'loc': loc,
+        'pre': _unique(t[:n] for t in loc for n in range(PREFIX_MIN, min(len(t), PREFIX_MAX) + 1)),
+        'tri': _unique(g for t in loc for g in trigrams(t)),
+        'terms': _unique(tokenize(doc.get('terms')))[:MAX_TERMS_TOKENS],
+    }
+
+def _token_score(token: str, prefix: bool):
+    # 3 location word, 2 location prefix, 1 terms word, 0 no match
+    score = {'$cond': [{'$in': [token, '$search.terms']}, 1, 0]}
+    if prefix and len(token) >= PREFIX_MIN:
+        score = {'$cond': [{'$in': [token[:PREFIX_MAX], '$search.pre']}, 2, score]}
+    return {'$cond': [{'$in': [token, '$search.loc']}, 3, score]}
+
+def _token_match(token: str, prefix: bool) -> dict:
+    clauses = [{'search.loc': token}, {'search.terms': token}]
+    if prefix and len(token) >= PREFIX_MIN:
+        clauses.append({'search.pre': token[:PREFIX_MAX]})
+    return {'$or': clauses}
+
+def search_pipeline(q: str, mode: str = 'prefix', filters: Optional[dict] = None,
+                    limit: int = 20, next_token: Optional[str] = None,
+                    projection: Optional[dict] = None) -> Optional[list]:
+    """Aggregation returning up to limit + 1 ranked rows with a `score`; None if q has no tokens"""
+    tokens = _unique(tokenize(q))
+    if not tokens:
+        return None
+    match = dict(filters or {})
+    if mode == 'fuzzy':
+        query_grams = _unique(g for t in tokens for g in trigrams(t))
+        match['search.tri'] = {'$in': query_grams}
+        shared = {'$filter': {'input': query_grams, 'as': 'g', 'cond': {'$in': ['$$g', '$search.tri']}}}
+        score = {'$divide': [{'$size': shared}, len(query_grams)]}
+        minimum = {'score': {'$gte': FUZZY_MIN_SIMILARITY}}
+    else:
+        prefix = mode == 'prefix'
+        required = tokens
+        if prefix and len(tokens) > 1 and len(tokens[-1]) < PREFIX_MIN and not q[-1].isspace():
+            # The word being typed is too short to have prefix keys yet ("new y"):
+            # it only adds to the score until it has PREFIX_MIN letters
+            required = tokens[:-1]
+        match['$and'] = [_token_match(t, prefix) for t in required]
+        score = {'$add': [_token_score(t, prefix) for t in tokens]}
+        minimum = {}
+    pipeline = [
+        {'$match': match},
+        {'$addFields': {'score': score}},
+    ]
+    if minimum:
+        pipeline.append({'$match': minimum})
+    resume = keyset_filter('score', 'desc', next_token)
+    if resume:
+        pipeline.append({'$match': resume})
+    pipeline += [
+        {'$sort': {'score': -1, '_id': -1}},
+        {'$limit': limit + 1},
+        {'$project': projection or {'search': 0}},
+    ]
+    return pipeline
+
+def next_cursor(rows: List[dict], limit: int) -> Optional[str]:
+    if len(rows) > limit:
+        return encode_cursor('score', 'desc', rows[limit - 1])
+    return None
+
+def backfill(batch_size: int = 1000) -> int:
+    """Write `search` for every property (after deploying, or when the derivation changes)"""
+    updated = 0
+    ops = []
+    for doc in db.properties.find({}, {'location': 1, 'terms': 1}):
+        ops.append(UpdateOne({'_id': doc['_id']}, {'$set': {'search': search_fields(doc)}}))
+        if len(ops) >= batch_size:
+            updated += db.properties.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += db.properties.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+if __name__ == '__main__':
+    print(f'Updated search keys on {backfill()} properties')
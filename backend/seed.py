@@ -1,80 +1,300 @@
-from db import db
-from datetime import datetime
-import random
-import hashlib
-
-def get_password_hash(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-# Clean up old data for a fresh start
-db.users.delete_many({})
-db.properties.delete_many({})
-db.audit_logs.delete_many({})
-
-# Dummy users
-plain_password = "password123"
-dummy_users = [
-    {"name": "Alice Smith", "email": "alice@example.com", "password": get_password_hash(plain_password)},
-    {"name": "Bob Johnson", "email": "bob@example.com", "password": get_password_hash(plain_password)},
-    {"name": "Charlie Lee", "email": "charlie@example.com", "password": get_password_hash(plain_password)}
+import argparse
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+import numpy as np
+from bson import ObjectId, json_util
+
+# Deterministic synthetic data for development and capacity planning: users,
+# properties (with search keys and duplicate signatures) and their audit
+# histories, hash-chained exactly as log_audit writes them (snapshot/delta
+# entries, chain heads), so chain verification, as_of reads and the fraud
+# pipeline all work on the result. Every draw comes from (--seed, shard), so
+# the same arguments give the same data whatever --workers is. Listings get
+# skewed owners, city-weighted locations, log-normal prices and geometric edit
+# counts; --fraud-fraction of them behave like scams (fraudster accounts,
+# price swings, bursts of edits, wire-transfer terms, cloned listings) and
+# are marked fraud_detected. `python rescore.py` replaces those marks with
+# real scores.
+#
+#   python seed.py                                   a small dataset, written to MONGO_URI/DB_NAME
+#   python seed.py --users 100000 --properties 1000000 --workers 8
+#   python seed.py --properties 1000000 --out data/  extended-JSON NDJSON files, one set per shard
+#
+# Writing to the database replaces what is there. NDJSON files load with
+# `mongoimport --collection <name> --file <file>`; run `python location_stats.py`
+# and start the app (indexes) afterwards.
+
+PASSWORD = 'password123'
+START = datetime(2024, 1, 1)
+COLLECTIONS = ('users', 'properties', 'audit_logs', 'chain_heads', 'listing_signatures')
+# Wiped before writing: everything derived from the generated data
+RESET = COLLECTIONS + ('location_stats', 'risk_assessments', 'merkle_batches', 'rescore_checkpoints')
+
+# (city, relative weight, median sale price)
+CITIES = [
+    ('New York, NY', 8.3, 950000), ('Los Angeles, CA', 3.9, 900000), ('Chicago, IL', 2.7, 330000),
+    ('Houston, TX', 2.3, 310000), ('Phoenix, AZ', 1.6, 430000), ('Philadelphia, PA', 1.6, 260000),
+    ('San Antonio, TX', 1.5, 280000), ('San Diego, CA', 1.4, 880000), ('Dallas, TX', 1.3, 390000),
+    ('Austin, TX', 1.0, 550000), ('San Francisco, CA', 0.8, 1300000), ('Seattle, WA', 0.75, 850000),
+    ('Denver, CO', 0.7, 600000), ('Boston, MA', 0.65, 800000), ('Miami, FL', 0.45, 600000),
 ]
+STREETS = ['Main', 'Oak', 'Pine', 'Maple', 'Cedar', 'Elm', 'Washington', 'Lake', 'Hill', 'Park', 'River',
+           'Sunset', 'Highland', 'Broadway', 'Church', 'Market']
+SUFFIXES = ['St', 'Ave', 'Blvd', 'Rd', 'Dr', 'Ln']
+TERMS = {
+    'sale': ['Full payment upfront', 'Installments allowed', 'Mortgage pre-approval required',
+             'Cash or financing accepted', 'Closing within 30 days'],
+    'rent': ['12-month lease', '6-month lease', 'Deposit of two months rent required',
+             'Month-to-month, 30 days notice', 'Utilities included'],
+}
+FRAUD_TERMS = ['Payment by wire transfer only', 'Western Union deposit required before viewing',
+               'Money order accepted, keys mailed after payment',
+               'Owner abroad, confidential deal, wire transfer to hold the unit']
+FIRST_NAMES = ['Alice', 'Bob', 'Charlie', 'Dana', 'Elena', 'Farid', 'Grace', 'Hiro', 'Ines', 'Jamal', 'Kira',
+               'Luis', 'Maya', 'Noah', 'Olga', 'Priya', 'Quinn', 'Rosa', 'Sam', 'Tariq', 'Uma', 'Victor', 'Wen', 'Yusuf']
+LAST_NAMES = ['Smith', 'Johnson', 'Lee', 'Garcia', 'Brown', 'Nguyen', 'Patel', 'Kim', 'Lopez', 'Miller', 'Davis',
+              'Wilson', 'Khan', 'Martin', 'Chen', 'Silva', 'Novak', 'Okafor', 'Rossi', 'Schmidt']
+
+KIND_USER, KIND_PROPERTY, KIND_AUDIT = 1, 2, 3
+MAX_EDITS = 1000
+
+def object_id(when: datetime, kind: int, n: int) -> ObjectId:
+    """Deterministic ObjectId: `when` as its timestamp, then the record kind and number"""
+    seconds = int((when - datetime(1970, 1, 1)).total_seconds())
+    return ObjectId(struct.pack('>IB', seconds, kind) + n.to_bytes(7, 'big'))
+
+def _ms(when: datetime) -> datetime:
+    # Mongo keeps milliseconds; generating at that precision keeps stored and hashed values equal
+    return when.replace(microsecond=when.microsecond // 1000 * 1000)
 
-user_ids = []
-for user in dummy_users:
-    result = db.users.insert_one(user)
-    user_with_id = {**user, "id": str(result.inserted_id)}
-    user_ids.append(user_with_id)
-
-# Dummy properties
-dummy_properties = [
-    {
-        "owner": user_ids[0],
-        "buyer_intent": "sale",
-        "location": "New York, NY",
-        "verification": "verified",
-        "terms": "Full payment upfront",
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    },
-    {
-        "owner": user_ids[1],
-        "buyer_intent": "rent",
-        "location": "San Francisco, CA",
-        "verification": "pending",
-        "terms": "12-month lease",
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    },
-    {
-        "owner": user_ids[2],
-        "buyer_intent": "sale",
-        "location": "Austin, TX",
-        "verification": "verified",
-        "terms": "Installments allowed",
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+def user_doc(i: int, password_hash: str) -> dict:
+    first = FIRST_NAMES[(i * 7919) % len(FIRST_NAMES)]
+    last = LAST_NAMES[(i * 104729 // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return {
+        '_id': object_id(START - timedelta(days=30), KIND_USER, i),
+        'name': f'{first} {last}',
+        'email': f'{first}.{last}.{i}@example.com'.lower(),
+        'password': password_hash,
     }
-]
 
-property_ids = []
-for prop in dummy_properties:
-    result = db.properties.insert_one(prop)
-    property_ids.append(result.inserted_id)
-
-# Dummy audit logs
-prev_hash = None
-for i, prop_id in enumerate(property_ids):
-    log_hash = "dummyhashvalue" + str(i)
-    log = {
-        "property_id": str(prop_id),
-        "action": "create",
-        "hash": log_hash,
-        "prev_hash": prev_hash,
-        "timestamp": datetime.utcnow(),
-        "changes": dummy_properties[i],
-        "user": user_ids[i]
+def owner(i: int) -> dict:
+    """The owner/user subdocument for user i, as the routes store it"""
+    doc = user_doc(i, '')
+    return {'name': doc['name'], 'email': doc['email'], 'id': str(doc['_id'])}
+
+def generate_users(shard: int, config: dict) -> Dict[str, List[dict]]:
+    from auth import get_password_hash
+    password_hash = get_password_hash(PASSWORD)
+    low = shard * config['batch_size']
+    high = min(low + config['batch_size'], config['users'])
+    return {'users': [user_doc(i, password_hash) for i in range(low, high)]}
+
+class Listing:
+    """One property's generated history: (timestamp, action, changes) per audit entry"""
+
+    def __init__(self, rng: np.random.Generator, index: int, config: dict, clone_of: Optional[dict]):
+        days = config['days']
+        end = START + timedelta(days=days)
+        fraudsters = max(1, round(config['users'] * config['fraud_fraction']))
+        self.fraud = bool(rng.random() < config['fraud_fraction'])
+        if self.fraud:
+            user = config['users'] - 1 - int(rng.integers(fraudsters))
+        else:
+            # A few accounts own many listings, most own one or two
+            user = int((config['users'] - fraudsters) * rng.random() ** 3)
+        self.user = owner(user)
+
+        created = _ms(START + timedelta(seconds=float(rng.uniform(0, days * 86400))))
+        self.id = str(object_id(created, KIND_PROPERTY, index))
+        city, _, median = CITIES[int(rng.choice(len(CITIES), p=config['city_weights']))]
+        intent = 'sale' if rng.random() < 0.6 else 'rent'
+        state = {
+            'id': self.id,
+            'owner': self.user,
+            'buyer_intent': intent,
+            'location': f'{int(rng.integers(1, 2000))} {STREETS[int(rng.integers(len(STREETS)))]} '
+                        f'{SUFFIXES[int(rng.integers(len(SUFFIXES)))]}, {city}',
+            'verification': 'verified' if rng.random() < 0.5 else 'pending',
+            'terms': TERMS[intent][int(rng.integers(len(TERMS[intent])))],
+            'price': round(float(median * (1 if intent == 'sale' else 0.005) * rng.lognormal(0, 0.35)), -1 if intent == 'rent' else 3),
+            'created_at': created,
+            'updated_at': created,
+        }
+        if self.fraud and clone_of is not None:
+            # Someone else's listing reposted at a bargain
+            state.update(location=clone_of['location'], buyer_intent=clone_of['buyer_intent'],
+                         terms=clone_of['terms'], price=round(clone_of['price'] * 0.6, -1))
+        self.versions = [(created, 'create', state)]
+
+        if self.fraud:
+            edits = 2 + int(rng.geometric(1 / (1 + config['edit_rate'] * 3))) - 1
+            gap_seconds = 300  # bursts of edits minutes apart
+        else:
+            edits = int(rng.geometric(1 / (1 + config['edit_rate']))) - 1
+            gap_seconds = 14 * 86400
+        when = created
+        for _ in range(min(edits, MAX_EDITS)):
+            when = _ms(when + timedelta(seconds=float(rng.exponential(gap_seconds))))
+            if when >= end:
+                break
+            state = {**state, 'updated_at': when}
+            roll = rng.random()
+            if self.fraud:
+                if roll < 0.5:
+                    state['price'] = round(state['price'] * float(rng.choice([rng.uniform(0.2, 0.5), rng.uniform(2, 4)])), 2)
+                else:
+                    state['terms'] = FRAUD_TERMS[int(rng.integers(len(FRAUD_TERMS)))]
+            elif roll < 0.5:
+                state['price'] = round(state['price'] * float(1 + rng.normal(0, 0.05)), 2)
+            elif roll < 0.8 and state['verification'] == 'pending':
+                state['verification'] = 'verified'
+            else:
+                state['terms'] = TERMS[state['buyer_intent']][int(rng.integers(len(TERMS[state['buyer_intent']])))]
+            self.versions.append((when, 'update', state))
+
+        self.deleted = bool(rng.random() < config['delete_fraction'])
+        if self.deleted:
+            when = _ms(when + timedelta(seconds=float(rng.exponential(gap_seconds))))
+            self.versions.append((when, 'delete', {}))
+
+    @property
+    def state(self) -> dict:
+        return self.versions[-1][2]
+
+    def audit_entries(self, index: int) -> List[dict]:
+        """The hash chain log_audit would have written for these versions"""
+        import audit_store
+        from verification import HASH_VERSION, hash_property_data
+        entries = []
+        prev_state, prev_hash = None, None
+        for seq, (when, action, changes) in enumerate(self.versions, 1):
+            flagged = self.fraud and action == 'update'
+            entry = {
+                '_id': object_id(when, KIND_AUDIT, index * 4096 + seq),
+                'property_id': self.id,
+                'action': action,
+                'user': self.user if action != 'delete' else None,
+                'hash_version': HASH_VERSION,
+                'fraud_status': 'scored',
+                'fraud_detected': flagged,
+                'fraud_reason': 'Synthetic fraud-like listing' if flagged else None,
+                **audit_store.compact(prev_state, changes, seq),
+                'seq': seq,
+                'prev_hash': prev_hash,
+                'timestamp': when,
+            }
+            entry['hash'] = hash_property_data(audit_store.hashed_content(entry), prev_hash)
+            entries.append(entry)
+            prev_state, prev_hash = changes, entry['hash']
+        return entries
+
+def generate_properties(shard: int, config: dict) -> Dict[str, List[dict]]:
+    import duplicates
+    import search
+    from verification import _head_tip
+    rng = np.random.default_rng([config['seed'], shard])
+    low = shard * config['batch_size']
+    high = min(low + config['batch_size'], config['properties'])
+    out = {name: [] for name in COLLECTIONS if name != 'users'}
+    legit = []
+    for index in range(low, high):
+        # Clones copy an earlier listing from the same shard, so shards stay independent
+        clone_of = legit[int(rng.integers(len(legit)))] if legit and rng.random() < 0.3 else None
+        listing = Listing(rng, index, config, clone_of)
+        entries = listing.audit_entries(index)
+        out['audit_logs'].extend(entries)
+        out['chain_heads'].append({'_id': listing.id, 'seq': entries[-1]['seq'],
+                                   'tip': _head_tip(entries[-1], listing.state), 'state': listing.state})
+        if listing.deleted:
+            continue
+        doc = {k: v for k, v in listing.state.items() if k != 'id'}
+        out['properties'].append({'_id': ObjectId(listing.id), **doc, 'search': search.search_fields(doc)})
+        signature = duplicates.signature_entry(listing.id, doc)
+        if signature:
+            out['listing_signatures'].append(signature)
+        if not listing.fraud:
+            legit.append(listing.state)
+    return out
+
+def write_shard(kind: str, shard: int, config: dict) -> Dict[str, int]:
+    """Generate one shard and write it to the database or to NDJSON files; returns counts"""
+    docs = (generate_users if kind == 'users' else generate_properties)(shard, config)
+    if config['out']:
+        for name, rows in docs.items():
+            with open(os.path.join(config['out'], f'{name}-{shard:05d}.ndjson'), 'w') as f:
+                for row in rows:
+                    f.write(json_util.dumps(row, json_options=json_util.RELAXED_JSON_OPTIONS))
+                    f.write('\n')
+    else:
+        from db import db
+        for name, rows in docs.items():
+            if rows:
+                db[name].insert_many(rows, ordered=False)
+    return {name: len(rows) for name, rows in docs.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate deterministic synthetic users, properties and audit histories')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--properties', type=int, default=200)
+    parser.add_argument('--edit-rate', type=float, default=2.0, help='mean edits per listing')
+    parser.add_argument('--fraud-fraction', type=float, default=0.02, help='share of listings that behave like scams')
+    parser.add_argument('--delete-fraction', type=float, default=0.03, help='share of listings deleted at the end')
+    parser.add_argument('--days', type=int, default=365, help=f'history length from {START.date()}')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='generator processes')
+    parser.add_argument('--batch-size', type=int, default=5000, help='records per shard and insert_many')
+    parser.add_argument('--out', help='write NDJSON files to this directory instead of the database')
+    args = parser.parse_args()
+    if args.users < 1:
+        sys.exit('--users must be at least 1')
+
+    weights = np.array([weight for _, weight, _ in CITIES])
+    config = {
+        'users': args.users, 'properties': args.properties, 'edit_rate': args.edit_rate,
+        'fraud_fraction': args.fraud_fraction, 'delete_fraction': args.delete_fraction, 'days': args.days,
+        'seed': args.seed, 'batch_size': args.batch_size, 'out': args.out,
+        'city_weights': weights / weights.sum(),
     }
-    db.audit_logs.insert_one(log)
-    prev_hash = log_hash
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    else:
+        from db import db
+        for name in RESET:
+            db[name].drop()
+    tasks = [('users', shard) for shard in range(-(-args.users // args.batch_size))]
+    tasks += [('properties', shard) for shard in range(-(-args.properties // args.batch_size))]
+
+    start = time.perf_counter()
+    totals = {}
+    if args.workers > 1:
+        # spawn, not fork: each worker needs its own Mongo client
+        with ProcessPoolExecutor(args.workers, mp_context=get_context('spawn')) as pool:
+            results = pool.map(write_shard, *zip(*[(kind, shard, config) for kind, shard in tasks]))
+            for counts in results:
+                for name, n in counts.items():
+                    totals[name] = totals.get(name, 0) + n
+    else:
+        for kind, shard in tasks:
+            for name, n in write_shard(kind, shard, config).items():
+                totals[name] = totals.get(name, 0) + n
+    elapsed = time.perf_counter() - start
+
+    if not args.out:
+        from db import ensure_indexes
+        import location_stats
+        # Building indexes after the load is cheaper than maintaining them during it
+        ensure_indexes()
+        location_stats.rebuild()
+    for name in COLLECTIONS:
+        print(f'{name:20s} {totals.get(name, 0):10d}')
+    records = sum(totals.values())
+    print(f'{records} records in {elapsed:.1f}s ({records / max(elapsed, 1e-9):.0f}/s); password for every user: {PASSWORD}')
 
-print("Dummy data inserted!") 
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+
+import mongomock
+import pymongo
+import pytest
+
+# The suite runs against mongomock, so no mongod is needed: the sync client is
+# swapped before db.py creates it and the async one in repository.py shares
+# its in-memory server. The sealer stays off, checkpoints get a key and no
+# fraud model saved by a local run is loaded.
+os.environ.setdefault('MERKLE_SEAL_SECONDS', '0')
+os.environ.setdefault('AUDIT_SIGNING_KEY', 'test-signing-key')
+os.environ.setdefault('FRAUD_MODEL_DIR', tempfile.mkdtemp(prefix='fraud-models-'))
+pymongo.MongoClient = mongomock.MongoClient
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import motor.motor_asyncio
+import mongomock_motor
+
+def _async_client(*args, **kwargs):
+    import db
+    return mongomock_motor.AsyncMongoMockClient(mock_mongo_client=db.client)
+
+motor.motor_asyncio.AsyncIOMotorClient = _async_client
+
+import cache
+import db as db_module
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    """Every test starts from an empty database with the app's indexes"""
+    db_module.client.drop_database(db_module.DB_NAME)
+    db_module.ensure_indexes()
+    cache.backend.clear()
+    yield db_module.db
@@ -0,0 +1,52 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from verification import log_audit
+
+ALICE = {'id': 'u1', 'name': 'Alice', 'email': 'alice@example.com'}
+BOB = {'id': 'u2', 'name': 'Bob', 'email': 'bob@example.com'}
+
+@pytest.fixture
+def client(clean_db):
+    import main
+    log_audit('P1', 'create', {'location': 'Austin', 'terms': 'lease 0'}, ALICE)
+    for i in range(1, 12):
+        log_audit('P1', 'update', {'location': 'Austin', 'terms': f'lease {i}'}, ALICE if i % 3 else BOB)
+    log_audit('P2', 'create', {'location': 'Boston', 'terms': 'lease'}, BOB)
+    return TestClient(main.app)
+
+def pages(client, **params):
+    rows, token = [], None
+    while True:
+        response = client.get('/properties/P1/audit', params={**params, **({'next': token} if token else {})})
+        assert response.status_code == 200
+        rows += response.json()
+        token = response.headers.get('x-next-cursor')
+        if not token:
+            return rows
+
+def test_pages_cover_the_trail_once_in_either_order(client):
+    newest_first = pages(client, limit=5)
+    assert [row['seq'] for row in newest_first] == list(range(12, 0, -1))
+    assert [row['seq'] for row in pages(client, limit=5, order='asc')] == list(range(1, 13))
+    # Compact entries come back with the whole property rebuilt
+    assert newest_first[0]['changes'] == {'location': 'Austin', 'terms': 'lease 11'}
+
+def test_filters_by_action_and_user(client):
+    assert [row['seq'] for row in pages(client, limit=2, user='bob@example.com', order='asc')] == [4, 7, 10]
+    assert [row['action'] for row in pages(client, action='create')] == ['create']
+    assert pages(client, action='delete') == []
+
+def test_projection_leaves_out_what_was_not_asked_for(client):
+    rows = pages(client, fields='seq,hash,prev_hash')
+    assert set(rows[0]) == {'id', 'seq', 'hash', 'prev_hash', 'timestamp'}
+    assert rows[-1]['prev_hash'] is None
+    rows = pages(client, fields='seq,changes', limit=4)
+    assert set(rows[0]) == {'id', 'seq', 'changes', 'timestamp'}
+    assert rows[-1]['changes'] == {'location': 'Austin', 'terms': 'lease 0'}
+
+def test_bad_paging_requests_are_rejected(client):
+    assert client.get('/properties/P1/audit', params={'order': 'sideways'}).status_code == 422
+    assert client.get('/properties/P1/audit', params={'fields': 'password'}).status_code == 400
+    token = client.get('/properties/P1/audit', params={'limit': 2}).headers['x-next-cursor']
+    assert client.get('/properties/P1/audit', params={'next': token, 'order': 'asc'}).status_code == 400
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import audit_store
+import verification
+from verification import log_audit
+
+USER = {'id': 'u1', 'name': 'Tester', 'email': 'tester@example.com'}
+
+def timestamps(database):
+    return [e['timestamp'] for e in database.audit_logs.find({'property_id': 'P1'}, sort=[('seq', 1)])]
+
+@pytest.fixture
+def versions(clean_db, monkeypatch):
+    """Seven versions of one property, a snapshot every third entry, written a minute or more apart"""
+    monkeypatch.setattr(audit_store, 'SNAPSHOT_EVERY', 3)
+    clock = [datetime(2024, 1, 1)]
+
+    class Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            clock[0] += timedelta(minutes=1)
+            return clock[0]
+
+    monkeypatch.setattr(verification, 'datetime', Clock)
+    states = [{'location': 'Austin', 'terms': 'lease', 'price': 1000.0}]
+    states.append({**states[-1], 'price': 1100.0})
+    states.append({**states[-1], 'terms': 'lease, pets ok'})
+    states.append({k: v for k, v in states[-1].items() if k != 'price'})
+    states.append({**states[-1], 'location': 'Boston', 'notes': 'corner unit'})
+    states.append({**states[-1], 'notes': 'top floor'})
+    states.append({**states[-1], 'price': 900.0})
+    for i, state in enumerate(states):
+        log_audit('P1', 'create' if i == 0 else 'update', state, USER)
+    return states
+
+def test_entries_store_snapshots_and_deltas(versions, clean_db):
+    entries = list(clean_db.audit_logs.find({'property_id': 'P1'}, sort=[('seq', 1)]))
+    assert [e['seq'] for e in entries] == list(range(1, 8))
+    assert ['snapshot' in e for e in entries] == [True, False, False, True, False, False, True]
+    assert entries[3]['snapshot'] == versions[3]
+    assert entries[1]['delta'] == {'set': {'price': 1100.0}, 'unset': []}
+    assert entries[4]['delta'] == {'set': {'location': 'Boston', 'notes': 'corner unit'}, 'unset': []}
+    assert 'changes' not in entries[1]
+
+def test_delta_replay_rebuilds_every_version(versions, clean_db):
+    for seq, state in enumerate(versions, start=1):
+        assert audit_store.state_at_seq('P1', seq) == state
+    entries = audit_store.materialize(clean_db.audit_logs.find({'property_id': 'P1'}, sort=[('seq', -1)]))
+    assert [e['changes'] for e in entries] == versions[::-1]
+
+def test_removed_fields_are_unset_on_replay(versions):
+    delta = audit_store.diff(versions[2], versions[3])
+    assert delta == {'set': {}, 'unset': ['price']}
+    assert audit_store.apply(versions[2], delta) == versions[3]
+
+def test_as_of_reads(versions, clean_db):
+    times = timestamps(clean_db)
+    assert audit_store.state_at('P1', times[0] - timedelta(seconds=1)) is None
+    for when, state in zip(times, versions):
+        assert audit_store.state_at('P1', when) == state
+        assert audit_store.state_at('P1', when + timedelta(seconds=30)) == state
+
+def test_as_of_after_delete_is_none(versions, clean_db):
+    log_audit('P1', 'delete', {}, USER)
+    times = timestamps(clean_db)
+    assert audit_store.state_at('P1', times[-1]) is None
+    assert audit_store.state_at('P1', times[-2]) == versions[-1]
+
+def test_each_hash_covers_the_stored_record(versions, clean_db):
+    prev_hash = None
+    for entry in clean_db.audit_logs.find({'property_id': 'P1'}, sort=[('seq', 1)]):
+        assert entry['prev_hash'] == prev_hash
+        assert entry['hash'] == verification.hash_property_data(
+            audit_store.hashed_content(entry), prev_hash, entry['hash_version'])
+        prev_hash = entry['hash']
+
+def test_new_entries_hash_whole_number_floats_as_integers(versions, clean_db):
+    assert {e['hash_version'] for e in clean_db.audit_logs.find()} == {verification.HASH_VERSION} == {4}
+    snapshot = {'snapshot': {'price': 1000.0, 'rooms': [2.0, 2.5]}}
+    as_ints = {'snapshot': {'price': 1000, 'rooms': [2, 2.5]}}
+    assert verification.hash_property_data(snapshot, None, 4) == verification.hash_property_data(as_ints, None, 4)
+    assert verification.hash_property_data(snapshot, None, 3) != verification.hash_property_data(as_ints, None, 3)
@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+
+EMAIL = 'alice@example.com'
+
+@pytest.fixture
+def client(clean_db, monkeypatch):
+    import main
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+    monkeypatch.setattr(auth, 'cache_stats', dict.fromkeys(auth.cache_stats, 0))
+    client = TestClient(main.app)
+    assert client.post('/register', params={'email': EMAIL, 'password': 'secret', 'name': 'Alice'}).status_code == 200
+    return client
+
+def login(client):
+    token = client.post('/login', data={'username': EMAIL, 'password': 'secret'}).json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_repeat_requests_hit_both_caches(client, clean_db):
+    headers = login(client)
+    assert client.get('/me', headers=headers).json()['email'] == EMAIL
+    # Served from cache even though the stored record changed behind its back
+    clean_db.users.update_one({'email': EMAIL}, {'$set': {'name': 'Changed'}})
+    assert client.get('/me', headers=headers).json()['name'] == 'Alice'
+    assert client.get('/auth/cache', headers=headers).json() == {
+        'token_hits': 2, 'token_misses': 1, 'user_hits': 2, 'user_misses': 1}
+
+def test_invalidate_user_rereads_the_record(client, clean_db):
+    headers = login(client)
+    client.get('/me', headers=headers)
+    clean_db.users.update_one({'email': EMAIL}, {'$set': {'name': 'Changed'}})
+    auth.invalidate_user(EMAIL)
+    assert client.get('/me', headers=headers).json()['name'] == 'Changed'
+    clean_db.users.delete_one({'email': EMAIL})
+    auth.invalidate_user(EMAIL)
+    assert client.get('/me', headers=headers).status_code == 401
+
+def test_tokens_are_cached_no_longer_than_they_are_valid(client):
+    expired = auth.create_access_token({'sub': EMAIL}, expires_delta=timedelta(seconds=-1))
+    for _ in range(2):
+        assert client.get('/me', headers={'Authorization': f'Bearer {expired}'}).status_code == 401
+    assert len(auth.token_cache._entries) == 0
+    short = auth.create_access_token({'sub': EMAIL}, expires_delta=timedelta(seconds=5))
+    auth.decode_token(short)
+    expires, _ = next(iter(auth.token_cache._entries.values()))
+    assert expires - auth.time.monotonic() <= 5
+
+def test_cache_stats_need_a_signed_in_user(client):
+    assert client.get('/auth/cache').status_code == 401
+    assert client.get('/auth/cache', headers={'Authorization': 'Bearer not-a-token'}).status_code == 401
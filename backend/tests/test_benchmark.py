@@ -0,0 +1,35 @@
+import pytest
+
+import benchmark
+
+def run(get_p50=10.0, rps=100.0, hash_us=5.0):
+    return {
+        'routes': {'GET /properties/{id}': {'p50_ms': get_p50, 'p95_ms': 20.0, 'p99_ms': 30.0, 'throughput_rps': rps}},
+        'micro': {'hash_us': hash_us},
+    }
+
+@pytest.mark.parametrize('current, ok', [
+    (run(), True),
+    (run(get_p50=11.9), True),         # 19% slower, within 20%
+    (run(get_p50=12.5), False),        # latency up 25%
+    (run(rps=85.0), True),
+    (run(rps=75.0), False),            # throughput down 25%
+    (run(get_p50=5.0, rps=200.0), True),  # improvements never fail
+    (run(hash_us=6.5), False),         # microbenchmarks are times too
+])
+def test_compare_flags_regressions_past_the_threshold(current, ok, capsys):
+    assert benchmark.compare(current, run(), 0.2) is ok
+    out = capsys.readouterr().out
+    assert ('REGRESSED' in out) is not ok
+
+def test_compare_skips_metrics_missing_from_the_baseline():
+    baseline = {'routes': {}, 'micro': {}}
+    assert benchmark.compare(run(get_p50=1000.0), baseline, 0.0)
+
+def test_zero_baselines_do_not_divide():
+    assert benchmark.compare(run(hash_us=1.0), run(hash_us=0.0), 0.2)
+
+def test_parse_mix():
+    assert benchmark.parse_mix('get=6,list,create=0.5') == {'get': 6.0, 'list': 1.0, 'create': 0.5}
+    with pytest.raises(SystemExit):
+        benchmark.parse_mix('get=1,delete=2')
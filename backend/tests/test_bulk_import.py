@@ -0,0 +1,57 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import bulk_import
+import merkle
+
+OWNER = {'name': 'Alice', 'email': 'alice@example.com'}
+ROW = {'owner': OWNER, 'buyer_intent': 'sale', 'location': '12 Elm Street', 'verification': 'pending',
+       'terms': 'Twelve month lease', 'price': 250000}
+
+def post(body, **kwargs):
+    import main
+    response = TestClient(main.app).post('/properties/bulk', content=body, **kwargs)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_ndjson_rows_get_one_result_each_in_order(clean_db):
+    lines = [json.dumps(ROW), 'not json', '', json.dumps({**ROW, 'location': 'Boston'}), json.dumps({'owner': OWNER})]
+    results = post('\n'.join(lines), headers={'Content-Type': 'application/x-ndjson'})
+    assert [r.get('status') for r in results[:-1]] == ['created', 'invalid', 'created', 'invalid']
+    assert [r['row'] for r in results[:-1]] == [1, 2, 4, 5]
+    assert results[1]['errors'][0]['msg'].startswith('Invalid JSON')
+    assert {e['loc'] for e in results[3]['errors']} == {'buyer_intent', 'location', 'verification', 'terms'}
+    assert results[-1] == {'summary': {'rows': 4, 'created': 2, 'invalid': 2, 'failed': 0}}
+
+    created = [r['id'] for r in results if r.get('status') == 'created']
+    assert clean_db.properties.count_documents({}) == 2
+    for property_id in created:
+        entry = clean_db.audit_logs.find_one({'property_id': property_id})
+        assert entry['seq'] == 1 and entry['prev_hash'] is None and entry['fraud_status'] == 'scored'
+        assert entry['snapshot']['price'] == 250000
+        assert clean_db.chain_heads.find_one({'_id': property_id})['seq'] == 1
+    assert clean_db.location_stats.find_one({'_id': '12 Elm Street'})['count'] == 1
+    assert merkle.verify_property_chain(created[0])['valid']
+
+def test_csv_nests_owner_columns():
+    body = ('owner.name,owner.email,buyer_intent,location,verification,terms,price\n'
+            'Alice,alice@example.com,rent,"Flat 2, 12 Elm Street",,"Lease, no pets",1200\n'
+            'Bob,bob@example.com,sale,Boston,pending,Freehold,1,extra\n')
+    results = post(body, params={'format': 'csv'})
+    assert results[0]['status'] == 'created'
+    assert results[1] == {'row': 2, 'status': 'invalid', 'errors': [{'loc': '', 'msg': 'More values than header columns'}]}
+
+def test_rows_are_written_a_chunk_at_a_time(clean_db, monkeypatch):
+    chunks = []
+    import_chunk = bulk_import.import_chunk
+    monkeypatch.setattr(bulk_import, 'import_chunk', lambda chunk: chunks.append(len(chunk)) or import_chunk(chunk))
+    rows = [(i, {**ROW, 'location': f'Street {i}'}) for i in range(1, 6)] + [(6, ValueError('bad row'))]
+    results = list(bulk_import.import_rows(rows, chunk_size=2))
+    assert chunks == [2, 2, 1]
+    assert [r['row'] for r in results[:-1]] == [1, 2, 3, 4, 5, 6]
+    assert results[-1]['summary'] == {'rows': 6, 'created': 5, 'invalid': 1, 'failed': 0}
+
+def test_unknown_format_is_rejected():
+    import main
+    assert TestClient(main.app).post('/properties/bulk', params={'format': 'xml'}, content='').status_code == 422
@@ -0,0 +1,80 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import cache
+
+OWNER = {'name': 'Alice', 'email': 'alice@example.com'}
+
+@pytest.fixture
+def client(clean_db):
+    import main
+    return TestClient(main.app)
+
+def create(client, location):
+    return client.post('/properties', json={'owner': OWNER, 'buyer_intent': 'sale', 'location': location,
+                                            'verification': 'pending', 'terms': 'Twelve month lease'}).json()
+
+def update(client, prop, **fields):
+    return client.put(f"/properties/{prop['id']}", json={**prop, **fields})
+
+def test_revalidation_returns_304_until_a_write(client):
+    a = create(client, 'Austin')
+    first = client.get(f"/properties/{a['id']}")
+    etag = first.headers['etag']
+    assert first.status_code == 200 and first.headers['cache-control'] == 'no-cache'
+    again = client.get(f"/properties/{a['id']}", headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.headers['etag'] == etag and again.content == b''
+    assert client.get(f"/properties/{a['id']}", headers={'If-None-Match': f'"other", W/{etag}'}).status_code == 304
+
+    update(client, a, verification='verified')
+    changed = client.get(f"/properties/{a['id']}", headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+    assert changed.json()['verification'] == 'verified'
+
+def test_a_write_invalidates_only_the_affected_entries(client, clean_db):
+    a, b = create(client, 'Austin'), create(client, 'Boston')
+    etag_b = client.get(f"/properties/{b['id']}").headers['etag']
+    audit_b = client.get(f"/properties/{b['id']}/audit").headers['etag']
+    listing = client.get('/properties').headers['etag']
+    # Changed behind the cache's back: B is only served fresh if its entry was dropped
+    clean_db.properties.update_one({'location': 'Boston'}, {'$set': {'terms': 'Changed directly'}})
+
+    update(client, a, verification='verified')
+    b_after = client.get(f"/properties/{b['id']}")
+    assert b_after.headers['etag'] == etag_b
+    assert b_after.json()['terms'] == 'Twelve month lease'
+    assert client.get(f"/properties/{b['id']}/audit").headers['etag'] == audit_b
+    # List pages and stats cover every property, so they are rebuilt
+    assert client.get('/properties').headers['etag'] != listing
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = cache.MemoryBackend(max_entries=2)
+    backend.set('a', {'v': 1}, 30)
+    backend.set('b', {'v': 2}, 30)
+    assert backend.get('a') == {'v': 1}
+    backend.set('c', {'v': 3}, 30)
+    assert backend.get('b') is None
+    assert backend.get('a') == {'v': 1} and backend.get('c') == {'v': 3}
+
+def test_memory_backend_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    backend = cache.MemoryBackend()
+    backend.set('a', {'v': 1}, 30)
+    now[0] += 29
+    assert backend.get('a') == {'v': 1}
+    now[0] += 2
+    assert backend.get('a') is None
+
+def test_generations_survive_eviction():
+    backend = cache.MemoryBackend(max_entries=1)
+    backend.bump('property:1')
+    backend.set('x', {}, 30)
+    backend.set('y', {}, 30)
+    assert backend.generation('property:1') == 1
+
+@pytest.mark.parametrize('header, matches', [
+    (None, False), ('*', True), ('"abc"', True), ('W/"abc"', True), ('"x", "abc"', True), ('"abcd"', False)])
+def test_etag_matching(header, matches):
+    assert cache.etag_matches(header, '"abc"') is matches
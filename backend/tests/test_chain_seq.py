@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import audit_store
+import merkle
+import verification
+from verification import log_audit
+
+WRITERS = 8
+APPENDS = 10
+
+def test_seq_is_unique_per_property(clean_db):
+    log_audit('P1', 'create', {'location': 'Austin'}, {'id': 'u1'})
+    entry = clean_db.audit_logs.find_one({'property_id': 'P1'})
+    with pytest.raises(DuplicateKeyError):
+        clean_db.audit_logs.insert_one({**entry, '_id': None, 'hash': 'forked'})
+    clean_db.audit_logs.insert_one({**entry, '_id': None, 'property_id': 'P2'})
+
+def test_concurrent_appends_get_consecutive_seqs(clean_db, monkeypatch):
+    # Every writer reads the same chain tip before any of them inserts
+    barrier = threading.Barrier(WRITERS)
+    chain_tip = verification._chain_tip
+
+    def contended_tip(property_id):
+        tip = chain_tip(property_id)
+        try:
+            barrier.wait(timeout=0.2)
+        except threading.BrokenBarrierError:
+            pass
+        return tip
+
+    monkeypatch.setattr(verification, '_chain_tip', contended_tip)
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(APPENDS):
+                log_audit('P1', 'update', {'location': f'writer {n}', 'terms': f'append {i}'}, {'id': f'u{n}'})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    entries = list(clean_db.audit_logs.find({'property_id': 'P1'}, sort=[('seq', 1)]))
+    assert [e['seq'] for e in entries] == list(range(1, WRITERS * APPENDS + 1))
+    assert all(e['prev_hash'] == before['hash'] for before, e in zip(entries, entries[1:]))
+    assert clean_db.chain_heads.find_one({'_id': 'P1'})['seq'] == WRITERS * APPENDS
+    assert merkle.verify_property_chain('P1') == {
+        'valid': True, 'checkpoint_batch': None, 'entries_rehashed': WRITERS * APPENDS}
+    # Each delta was taken against the entry it actually follows
+    last = audit_store.state_at_seq('P1', WRITERS * APPENDS)
+    assert last == audit_store.materialize([entries[-1]])[0]['changes']
+
+def test_a_lost_append_race_is_rescored_against_the_new_tip(clean_db, monkeypatch):
+    listing = {'location': 'Austin', 'buyer_intent': 'sale', 'terms': 'Twelve month lease'}
+    log_audit('P1', 'create', {**listing, 'price': 1000.0}, {'id': 'u1'})
+    stale = verification._chain_tip('P1')
+    assert 'Suspicious price change' in log_audit('P1', 'update', {**listing, 'price': 3000.0}, {'id': 'u2'})['fraud_reason']
+    # This writer read the tip before the 3000 update landed, so its first insert conflicts
+    monkeypatch.setattr(verification, '_chain_tip', lambda property_id: stale)
+    entry = log_audit('P1', 'update', {**listing, 'price': 3000.0}, {'id': 'u3'})
+    assert entry['seq'] == 3
+    assert 'Suspicious price change' not in (entry['fraud_reason'] or '')
+    assert clean_db.risk_assessments.count_documents({}) == 3
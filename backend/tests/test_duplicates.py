@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+import duplicates
+
+LISTING = {
+    'location': '12 Elm Street, Springfield',
+    'terms': 'Two bedroom flat with a garden, twelve month lease, available from June',
+    'owner': {'email': 'alice@example.com'},
+}
+
+def jaccard(a, b):
+    a, b = duplicates.shingles(a), duplicates.shingles(b)
+    return len(a & b) / len(a | b)
+
+def listing_id(year):
+    return str(ObjectId.from_datetime(datetime(year, 1, 1)))
+
+def test_band_probability_matches_the_documented_thresholds():
+    def p(j):
+        return 1 - (1 - j ** duplicates.ROWS) ** duplicates.BANDS
+    assert p(0.8) > 0.999
+    assert 0.6 < p(0.5) < 0.7
+    assert p(0.2) < 0.05
+
+def test_signature_similarity_estimates_jaccard():
+    edited = {**LISTING, 'terms': LISTING['terms'] + ', pets allowed'}
+    estimate = (duplicates.signature(LISTING) == duplicates.signature(edited)).mean()
+    assert abs(estimate - jaccard(LISTING, edited)) < 0.15
+
+def test_near_duplicates_match_and_unrelated_listings_do_not(clean_db):
+    duplicates.record_many([
+        {**LISTING, 'id': 'copy', 'owner': {'email': 'mallory@example.com'}},
+        {'id': 'other', 'location': '400 Harbour Road, Portland', 'terms': 'Studio, short let, no pets',
+         'owner': {'email': 'bob@example.com'}},
+    ])
+    found = duplicates.matches(LISTING)
+    assert [m['id'] for m in found] == ['copy']
+    assert found[0]['owner'] == 'mallory@example.com'
+    assert found[0]['similarity'] >= duplicates.DUPLICATE_SIMILARITY
+
+def test_min_similarity_is_a_floor(clean_db):
+    reworded = {**LISTING, 'id': 'reworded', 'terms': LISTING['terms'] + ', pets allowed, parking included'}
+    duplicates.record_many([reworded])
+    similarity = duplicates.matches(LISTING, min_similarity=0.0)[0]['similarity']
+    assert similarity < duplicates.DUPLICATE_SIMILARITY
+    assert duplicates.matches(LISTING) == []
+    assert duplicates.matches(LISTING, min_similarity=similarity)[0]['id'] == 'reworded'
+
+def test_excludes_the_listing_itself_and_later_listings(clean_db):
+    old, new = listing_id(2023), listing_id(2025)
+    duplicates.record_many([{**LISTING, 'id': old}, {**LISTING, 'id': new}])
+    assert [m['id'] for m in duplicates.matches(LISTING, exclude=old)] == [new]
+    assert [m['id'] for m in duplicates.matches(LISTING, as_of=datetime(2024, 1, 1))] == [old]
+    rows = duplicates.matches_many([(LISTING, None), (LISTING, old)], as_of=[datetime(2024, 1, 1), None])
+    assert [[m['id'] for m in row] for row in rows] == [[old], [new]]
+
+def test_record_change_reindexes_and_removes(clean_db):
+    duplicates.record_change('a', LISTING)
+    assert duplicates.similar_to('b', 0.5, 10) is None
+    duplicates.record_change('b', LISTING)
+    assert [m['id'] for m in duplicates.similar_to('b', 0.5, 10)] == ['a']
+    duplicates.record_change('a', None)
+    assert duplicates.similar_to('b', 0.5, 10) == []
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import events
+
+OWNER = {'name': 'Alice', 'email': 'alice@example.com'}
+BODY = {'owner': OWNER, 'buyer_intent': 'sale', 'location': 'Austin', 'verification': 'pending',
+        'terms': 'Twelve month lease'}
+ENTRY = {'_id': ObjectId(), 'property_id': 'P1', 'action': 'update', 'seq': 2, 'hash': 'h2', 'prev_hash': 'h1',
+         'snapshot': {'location': 'Austin'}, 'fraud_status': 'scored', 'fraud_detected': True, 'fraud_reason': 'x'}
+
+@pytest.fixture
+def broker(monkeypatch):
+    fresh = events.Broker(size=3)
+    monkeypatch.setattr(events, 'broker', fresh)
+    monkeypatch.setattr(events, '_change_streams', False)
+    monkeypatch.setattr(events, 'HEARTBEAT_SECONDS', 0.01)
+    return fresh
+
+def collect(resume, count):
+    """The first `count` events (None for a keepalive) the in-process feed sends from `resume`"""
+    async def run():
+        found = []
+        feed = events._memory_events(resume)
+        async for event in feed:
+            found.append(event)
+            if len(found) == count:
+                break
+        await feed.aclose()
+        return found
+    return asyncio.run(run())
+
+def test_write_events_carry_the_listing_then_its_audit_entry():
+    created = events.write_events('create', 'P1', {'_id': ObjectId(), 'search': {}, 'owner': OWNER, 'location': 'A'}, ENTRY)
+    assert [e['event'] for e in created] == ['property.created', 'audit.appended']
+    assert created[0]['data'] == {'id': 'P1', 'owner': {**OWNER, 'id': None}, 'location': 'A'}
+    assert 'snapshot' not in created[1]['data'] and created[1]['data']['fraud_detected'] is True
+    assert [e['event'] for e in events.write_events('delete', 'P1', None, None)] == ['property.deleted']
+
+def test_each_change_yields_at_most_one_event():
+    key = {'_id': ObjectId()}
+    def change(coll, operation, **extra):
+        return {'ns': {'coll': coll}, 'operationType': operation, 'documentKey': key, **extra}
+    assert events.change_event(change('properties', 'insert', fullDocument={'location': 'A'}))['event'] == 'property.created'
+    assert events.change_event(change('properties', 'update', fullDocument={'location': 'B'}))['event'] == 'property.updated'
+    assert events.change_event(change('properties', 'delete'))['data'] == {'id': str(key['_id'])}
+    assert events.change_event(change('properties', 'update', fullDocument=None)) is None
+    assert events.change_event(change('audit_logs', 'insert', fullDocument=ENTRY))['event'] == 'audit.appended'
+    assert events.change_event(change('audit_logs', 'update', fullDocument=ENTRY))['event'] == 'fraud.flagged'
+
+def test_api_writes_publish_events_with_unique_ids(clean_db, broker):
+    import main
+    client = TestClient(main.app)
+    created = client.post('/properties', json=BODY).json()
+    client.delete(f"/properties/{created['id']}")
+    # Four events, of which the buffer of 3 keeps the newest
+    assert broker._seq == 4
+    published = [event for _, event in broker._recent]
+    assert [e['event'] for e in published] == ['audit.appended', 'property.deleted', 'audit.appended']
+    assert published[0]['data']['property_id'] == created['id'] and published[0]['data']['action'] == 'create'
+    assert len({event['id'] for event in published}) == 3
+
+def test_resume_replays_what_was_missed(broker):
+    events.publish_write('update', 'P1', {'location': 'A'}, None)
+    first_id = broker._recent[0][1]['id']
+    events.publish_write('update', 'P1', {'location': 'B'}, None)
+    events.publish_flagged([ENTRY, {**ENTRY, 'fraud_detected': False}])
+    replayed = collect(first_id, 3)
+    assert [e['event'] for e in replayed[:2]] == ['property.updated', 'fraud.flagged']
+    assert replayed[0]['data']['location'] == 'B'
+    assert replayed[2] is None  # keepalive
+
+@pytest.mark.parametrize('resume', ['another-boot-1', 'not-a-token'])
+def test_an_unknown_resume_point_resets_the_client(broker, resume):
+    events.publish_write('update', 'P1', {'location': 'A'}, None)
+    assert collect(resume, 1) == [{'event': 'reset', 'data': {}}]
+
+def test_a_resume_point_that_fell_out_of_the_buffer_resets(broker):
+    for i in range(5):
+        events.publish_write('update', 'P1', {'location': str(i)}, None)
+    assert collect(f'{broker.boot}-1', 1)[0]['event'] == 'reset'
+    assert collect(f'{broker.boot}-2', 1)[0]['data']['location'] == '2'
+
+def test_events_are_formatted_for_sse(broker):
+    events.publish_write('delete', 'P1', None, None)
+    event = broker._recent[0][1]
+    assert events.format_event(event) == f'id: {event["id"]}\nevent: property.deleted\ndata: {{"id":"P1"}}\n\n'
+    assert events.format_event(None) == ': keepalive\n\n'
+
+    async def first_lines():
+        body = events.stream(f'{broker.boot}-0')
+        lines = [await body.__anext__(), await body.__anext__()]
+        await body.aclose()
+        return lines
+    assert asyncio.run(first_lines()) == [f'retry: {events.RETRY_MS}\n\n', events.format_event(event)]
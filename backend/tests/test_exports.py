@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+BASE = datetime(2024, 1, 1)
+
+@pytest.fixture
+def client(clean_db):
+    import main
+    # Equal watermarks in pairs, so resuming has to use the id as well
+    clean_db.properties.insert_many([
+        {'owner': {'id': None, 'name': f'Owner {i}', 'email': f'o{i}@example.com'}, 'buyer_intent': 'sale',
+         'location': f'Street {i}', 'verification': 'pending', 'terms': 'lease, "no pets"', 'price': 1000.0 + i,
+         'created_at': BASE, 'updated_at': BASE + timedelta(minutes=i // 2), 'search': {'tokens': ['street']}}
+        for i in range(7)])
+    return TestClient(main.app)
+
+def ndjson(response):
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_ndjson_export_is_ordered_by_watermark_and_id(client, clean_db):
+    rows = ndjson(client.get('/properties/export'))
+    expected = [str(doc['_id']) for doc in clean_db.properties.find(sort=[('updated_at', 1), ('_id', 1)])]
+    assert [row['id'] for row in rows] == expected
+    assert 'search' not in rows[0] and rows[0]['updated_at'] == BASE.isoformat()
+
+def test_resuming_after_the_last_row_skips_nothing(client):
+    everything = [row['id'] for row in ndjson(client.get('/properties/export'))]
+    seen, params = [], {'limit': 3}
+    while True:
+        rows = ndjson(client.get('/properties/export', params=params))
+        if not rows:
+            break
+        seen += [row['id'] for row in rows]
+        params = {'limit': 3, 'since': rows[-1]['updated_at'], 'after': rows[-1]['id']}
+    assert seen == everything
+
+def test_csv_export_has_one_column_per_field(client):
+    response = client.get('/properties/export', params={'format': 'csv'})
+    assert response.headers['content-disposition'] == 'attachment; filename="properties.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 7
+    assert rows[0]['owner.email'] == 'o0@example.com'
+    assert rows[0]['terms'] == 'lease, "no pets"'
+    assert rows[0]['price'] == '1000.0'
+
+def test_parquet_export_round_trips(client):
+    pq = pytest.importorskip('pyarrow.parquet')
+    response = client.get('/properties/export', params={'format': 'parquet'})
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 7
+    assert table.column('price').to_pylist() == [1000.0 + i for i in range(7)]
+
+def test_audit_export_carries_compact_entries(client):
+    from verification import log_audit
+    log_audit('P1', 'create', {'location': 'Austin', 'price': 1000.0}, {'id': 'u1'})
+    log_audit('P1', 'update', {'location': 'Austin', 'price': 1100.0}, {'id': 'u1'})
+    rows = ndjson(client.get('/audit/export'))
+    assert [row['seq'] for row in rows] == [1, 2]
+    assert rows[0]['snapshot'] == {'location': 'Austin', 'price': 1000.0}
+    assert rows[1]['delta'] == {'set': {'price': 1100.0}, 'unset': []}
+
+@pytest.mark.parametrize('params', [{'after': '0' * 24}, {'since': BASE.isoformat(), 'after': 'nope'}, {'format': 'xml'}])
+def test_bad_export_requests_are_rejected(client, params):
+    assert client.get('/properties/export', params=params).status_code in (400, 422)
+
+def test_updates_stamp_the_watermark_on_the_server(client, clean_db):
+    doc = clean_db.properties.find_one({'location': 'Street 0'})
+    body = {'id': str(doc['_id']), 'owner': doc['owner'], 'buyer_intent': 'sale', 'location': 'Street 0',
+            'verification': 'verified', 'terms': 'lease', 'created_at': '2030-01-01T00:00:00',
+            'updated_at': '2000-01-01T00:00:00'}
+    before = datetime.utcnow()
+    updated = client.put(f"/properties/{doc['_id']}", json=body).json()
+    stored = clean_db.properties.find_one({'_id': doc['_id']})
+    assert stored['created_at'] == BASE
+    assert stored['updated_at'] >= before.replace(microsecond=before.microsecond // 1000 * 1000)
+    assert updated['created_at'] == BASE.isoformat()
+    assert ndjson(client.get('/properties/export'))[-1]['id'] == str(doc['_id'])
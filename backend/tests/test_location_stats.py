@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import location_stats
+
+def listings(n, seed=0):
+    rng = random.Random(seed)
+    return [{'_id': i, 'location': rng.choice(['Austin', 'Boston']), 'price': rng.lognormvariate(12, 0.5)}
+            for i in range(n)]
+
+def assert_matches(stats, prices):
+    assert stats['count'] == len(prices)
+    assert stats['mean'] == pytest.approx(np.mean(prices))
+    assert stats['std'] == pytest.approx(np.std(prices))
+    # Log buckets of width GAMMA keep quantiles within that relative error
+    assert stats['median'] == pytest.approx(np.median(prices), rel=location_stats.GAMMA - 1)
+
+def test_incremental_updates_match_the_live_listings(clean_db):
+    docs = listings(400)
+    for doc in docs:
+        location_stats.record_change(None, doc)
+    for doc in docs[:80]:
+        location_stats.record_change(doc, None)
+    live = docs[80:]
+    for i, doc in enumerate(live[:40]):
+        moved = {**doc, 'location': 'Boston' if doc['location'] == 'Austin' else 'Austin', 'price': doc['price'] * 1.1}
+        location_stats.record_change(doc, moved)
+        live[i] = moved
+    for location in ('Austin', 'Boston'):
+        assert_matches(location_stats.get_stats(location), [d['price'] for d in live if d['location'] == location])
+
+def test_batched_merge_equals_one_at_a_time(clean_db):
+    docs = listings(200, seed=1)
+    location_stats.record_many(docs)
+    merged = {location: location_stats.get_stats(location) for location in ('Austin', 'Boston')}
+    clean_db.location_stats.delete_many({})
+    for doc in docs:
+        location_stats.record_change(None, doc)
+    for location, stats in merged.items():
+        single = location_stats.get_stats(location)
+        assert stats['count'] == single['count']
+        assert stats['mean'] == pytest.approx(single['mean'])
+        assert stats['std'] == pytest.approx(single['std'])
+
+def test_rebuild_matches_incremental_stats(clean_db):
+    docs = listings(300, seed=2)
+    for doc in docs:
+        location_stats.record_change(None, doc)
+    incremental = location_stats.get_stats('Austin')
+    clean_db.properties.insert_many(docs)
+    clean_db.location_stats.delete_many({})
+    location_stats.rebuild()
+    rebuilt = location_stats.get_stats('Austin')
+    assert rebuilt['count'] == incremental['count']
+    assert rebuilt['mean'] == pytest.approx(incremental['mean'])
+    assert rebuilt['std'] == pytest.approx(incremental['std'])
+    assert rebuilt['median'] == incremental['median']
+
+def test_removing_the_last_listing_resets_the_location(clean_db):
+    doc = {'location': 'Austin', 'price': 250000.0}
+    location_stats.record_change(None, doc)
+    location_stats.record_change(doc, None)
+    assert location_stats.get_stats('Austin') is None
+
+def test_prices_set_through_the_api_feed_the_stats(clean_db):
+    import main
+    client = TestClient(main.app)
+    owner = {'name': 'Alice', 'email': 'alice@example.com'}
+    body = {'owner': owner, 'buyer_intent': 'sale', 'location': 'Austin', 'verification': 'pending',
+            'terms': 'Twelve month lease'}
+    created = client.post('/properties', json={**body, 'price': 300000}).json()
+    client.post('/properties', json={**body, 'price': 500000})
+    client.post('/properties', json=body)
+    assert created['price'] == 300000
+    stats = client.get('/locations/stats', params={'location': 'Austin'}).json()
+    assert stats['count'] == 2 and stats['mean'] == pytest.approx(400000)
+
+    # An update without a price keeps the stored one; a new price moves the stats
+    update = {**body, 'id': created['id'], 'owner': {**owner, 'id': None}}
+    assert client.put(f"/properties/{created['id']}", json=update).json()['price'] == 300000
+    client.put(f"/properties/{created['id']}", json={**update, 'price': 200000})
+    stats = client.get('/locations/stats', params={'location': 'Austin'}).json()
+    assert stats['count'] == 2 and stats['mean'] == pytest.approx(350000)
+    assert client.get('/locations/stats', params={'location': 'Boston'}).status_code == 404
@@ -0,0 +1,82 @@
+import pytest
+
+import merkle
+from verification import log_audit
+
+USER = {'id': 'u1', 'name': 'Tester', 'email': 'tester@example.com'}
+
+def write_entries(n, properties=3):
+    for i in range(n):
+        log_audit(f'P{i % properties}', 'update', {'location': f'Street {i}', 'terms': 'lease'}, USER)
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 8, 13])
+def test_inclusion_path_verifies_every_leaf(size):
+    leaves = [merkle._sha256(bytes([i])).hex() for i in range(size)]
+    root = merkle.merkle_levels(leaves)[-1][0]
+    for index, leaf in enumerate(leaves):
+        assert merkle.verify_inclusion(leaf, merkle.inclusion_path(leaves, index), root)
+    assert not merkle.verify_inclusion(merkle._sha256(b'other').hex(), merkle.inclusion_path(leaves, 0), root)
+
+def test_sealed_entries_have_valid_proofs(clean_db):
+    write_entries(25)
+    assert merkle.seal_all(limit=10) == 3
+    batches = list(clean_db.merkle_batches.find(sort=[('_id', 1)]))
+    assert [b['count'] for b in batches] == [10, 10, 5]
+    for entry in clean_db.audit_logs.find():
+        proof = merkle.inclusion_proof(str(entry['_id']))
+        assert proof['sealed'] and proof['leaf_matches']
+        assert merkle.verify_inclusion(proof['leaf'], proof['path'], proof['root'])
+        assert merkle.verify_signature(proof['checkpoint'], proof['signature'])
+
+def test_checkpoints_chain_and_detect_tampering(clean_db):
+    write_entries(12)
+    merkle.seal_all(limit=5)
+    prev = None
+    for batch in clean_db.merkle_batches.find(sort=[('_id', 1)]):
+        assert batch['prev_checkpoint'] == prev
+        assert merkle._batch_is_valid(batch)
+        prev = batch['checkpoint']
+    batch = clean_db.merkle_batches.find_one({'_id': 2})
+    assert not merkle._batch_is_valid({**batch, 'root': batch['leaves'][0]})
+    assert not merkle._batch_is_valid({**batch, 'signature': merkle.sign('forged')})
+
+def test_verify_property_chain_rehashes_only_unsealed_entries(clean_db):
+    write_entries(9)
+    merkle.seal_all()
+    write_entries(2, properties=1)
+    result = merkle.verify_property_chain('P0')
+    assert result == {'valid': True, 'checkpoint_batch': 1, 'entries_rehashed': 2}
+    newest = clean_db.audit_logs.find_one({'property_id': 'P0'}, sort=[('seq', -1)])
+    clean_db.audit_logs.update_one({'_id': newest['_id']}, {'$set': {'delta.set.terms': 'tampered'}})
+    assert not merkle.verify_property_chain('P0')['valid']
+
+def test_interrupted_seal_resumes_the_same_batch(clean_db, monkeypatch):
+    write_entries(7)
+
+    def crash(*args, **kwargs):
+        raise ConnectionError('sealer died')
+
+    Collection = type(clean_db.audit_logs)
+
+    # Dies after claiming the entries, then again after writing the batch
+    with monkeypatch.context() as patch:
+        patch.setattr(Collection, 'update_one', crash)
+        with pytest.raises(ConnectionError):
+            merkle.seal_batch(limit=5)
+    assert clean_db.audit_logs.count_documents({'merkle_pending': 1}) == 5
+    with monkeypatch.context() as patch:
+        patch.setattr(Collection, 'update_many', crash)
+        with pytest.raises(ConnectionError):
+            merkle.seal_batch(limit=5)
+    assert clean_db.merkle_batches.count_documents({}) == 1
+
+    assert merkle.seal_all(limit=5) == 2
+    assert [b['count'] for b in clean_db.merkle_batches.find(sort=[('_id', 1)])] == [5, 2]
+    assert clean_db.audit_logs.count_documents({'merkle_pending': {'$exists': True}}) == 0
+    assert sorted(e['merkle_batch'] for e in clean_db.audit_logs.find()) == [1] * 5 + [2] * 2
+
+def test_signing_requires_a_key(monkeypatch):
+    monkeypatch.setattr(merkle, 'SIGNING_KEY', b'')
+    with pytest.raises(RuntimeError):
+        merkle.sign('checkpoint')
+    assert merkle.spawn_sealer(1) is None
@@ -0,0 +1,47 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import metrics
+
+OWNER = {'name': 'Alice', 'email': 'alice@example.com'}
+BODY = {'owner': OWNER, 'buyer_intent': 'sale', 'location': 'Austin', 'verification': 'pending',
+        'terms': 'Twelve month lease'}
+
+@pytest.fixture
+def client(clean_db):
+    import main
+    return TestClient(main.app)
+
+def sample(text, name, **labels):
+    """Value of one sample line in the exposition text, or None"""
+    selector = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    prefix = f'{name}{{{selector}}} ' if labels else f'{name} '
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return None
+
+def test_metrics_render_stage_histograms_after_a_write(client):
+    before = client.get('/metrics').text
+    assert client.post('/properties', json=BODY).status_code == 200
+    response = client.get('/metrics')
+    assert response.headers['content-type'] == metrics.CONTENT_TYPE_LATEST
+    text = response.text
+    for stage in ('property.insert', 'audit.chain_tip', 'audit.insert', 'audit.fraud_scoring',
+                  'fraud.check_patterns', 'fraud.risk_assessment_insert'):
+        count = sample(text, 'stage_duration_seconds_count', stage=stage)
+        assert count is not None and count > (sample(before, 'stage_duration_seconds_count', stage=stage) or 0)
+    # Labelled by route template, not the raw path
+    assert sample(text, 'http_request_duration_seconds_count', method='POST', route='/properties', status='200') >= 1
+    property_id = client.get('/properties').json()[0]['id']
+    client.get(f'/properties/{property_id}')
+    assert sample(client.get('/metrics').text, 'http_request_duration_seconds_count',
+                  method='GET', route='/properties/{property_id}', status='200') >= 1
+
+def test_server_timing_lists_the_request_stages(client, monkeypatch):
+    assert 'server-timing' not in client.post('/properties', json=BODY).headers
+    monkeypatch.setattr(metrics, 'SERVER_TIMING', True)
+    timing = client.post('/properties', json=BODY).headers['server-timing']
+    parts = [part.split(';')[0] for part in timing.split(', ')]
+    assert {'property.insert', 'audit.insert', 'mongo', 'total'} <= set(parts)
+    assert parts[-1] == 'total'
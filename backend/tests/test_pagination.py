@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from pagination import decode_cursor, encode_cursor, keyset_filter
+
+ROW = {'_id': ObjectId(), 'updated_at': datetime(2024, 5, 1, 12, 30, 15, 250000)}
+
+def payload(token):
+    return json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+
+def reencode(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+def test_cursor_round_trips_datetimes_and_ids():
+    token = encode_cursor('updated_at', 'desc', ROW)
+    assert '=' not in token
+    assert decode_cursor(token, 'updated_at', 'desc') == (ROW['updated_at'], ROW['_id'])
+    assert decode_cursor(encode_cursor('_id', 'asc', ROW), '_id', 'asc') == (None, ROW['_id'])
+
+@pytest.mark.parametrize('token', ['not-a-cursor', '', reencode({'s': 'updated_at', 'o': 'desc', 'v': 1}),
+                                   reencode({'s': 'updated_at', 'o': 'desc', 'v': 1, 'id': 'zz'})])
+def test_malformed_cursors_are_rejected(token):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token, 'updated_at', 'desc')
+    assert error.value.status_code == 400
+
+@pytest.mark.parametrize('field, value', [('s', 'created_at'), ('o', 'asc')])
+def test_cursor_is_bound_to_its_sort(field, value):
+    token = reencode({**payload(encode_cursor('updated_at', 'desc', ROW)), field: value})
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token, 'updated_at', 'desc')
+    assert error.value.detail == 'Cursor does not match sort order'
+
+def test_keyset_filter_breaks_ties_on_id():
+    token = encode_cursor('updated_at', 'desc', ROW)
+    assert keyset_filter('updated_at', 'desc', token) == {'$or': [
+        {'updated_at': {'$lt': ROW['updated_at']}},
+        {'updated_at': ROW['updated_at'], '_id': {'$lt': ROW['_id']}},
+    ]}
+    assert keyset_filter('updated_at', 'desc', None) == {}
+
+def test_pages_cover_every_row_once(clean_db):
+    import main
+    base = datetime(2024, 1, 1)
+    # Runs of equal updated_at make the _id tiebreak matter
+    clean_db.properties.insert_many([
+        {'location': f'L{i}', 'buyer_intent': 'sale', 'terms': 't', 'updated_at': base + timedelta(minutes=i // 4)}
+        for i in range(23)])
+    client = TestClient(main.app)
+    seen, token = [], None
+    while True:
+        response = client.get('/properties', params={'limit': 5, **({'next': token} if token else {})})
+        assert response.status_code == 200
+        seen += [row['id'] for row in response.json()]
+        token = response.headers.get('X-Next-Cursor')
+        if not token:
+            break
+    expected = [str(doc['_id']) for doc in clean_db.properties.find(sort=[('updated_at', -1), ('_id', -1)])]
+    assert seen == expected
+    tampered = reencode({**payload(encode_cursor('updated_at', 'desc', {'_id': ObjectId(seen[4])})), 's': '_id'})
+    assert client.get('/properties', params={'next': tampered}).status_code == 400
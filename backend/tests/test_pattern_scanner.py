@@ -0,0 +1,48 @@
+import json
+import re
+
+import pytest
+
+from pattern_scanner import DEFAULT_RULES, PatternScanner, load_scanner
+from verification import fraud_detector
+
+DOCS = [
+    {'location': 'Call 5551234567 for a QUICK deal', 'terms': 'Wire Transfer only, full REFUND guarantee'},
+    {'location': 'Visit https://example.com/offer or mail Me@Example.com', 'terms': 'Twelve month lease'},
+    {'location': 'Quiet street near the park', 'terms': 'Confidential: western union or money order'},
+    {'location': 'Sunny flat', 'price': 1200},
+]
+
+def legacy_scan(doc, rules=DEFAULT_RULES):
+    """What prepare_features and check_patterns did before: re.search with each raw rule"""
+    result = {}
+    for field, categories in rules.items():
+        if field in doc:
+            value = str(doc[field]).lower()
+            hits = {name: len(re.findall(pattern, value)) for name, pattern in categories.items()
+                    if re.search(pattern, value)}
+            if hits:
+                result[field] = hits
+    return result
+
+@pytest.mark.parametrize('doc', DOCS)
+def test_scan_matches_the_raw_rules(doc):
+    assert PatternScanner().scan(doc) == legacy_scan(doc)
+
+def test_counts_every_occurrence_and_category():
+    hits = PatternScanner().scan({'location': 'urgent! urgent! free quick sale', 'terms': 'lease'})
+    assert hits == {'location': {'urgency': 3, 'promo_keyword': 2}}
+    assert PatternScanner.category_count(hits) == 2
+
+def test_uppercase_rules_keep_case_insensitivity(tmp_path):
+    rules = {'terms': {'shout': r'(?i)ACT NOW', 'plain': r'(?i)act later'}}
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps(rules))
+    scanner = load_scanner(str(path))
+    assert scanner.scan({'terms': 'Act Now or act LATER'}) == {'terms': {'shout': 1, 'plain': 1}}
+
+def test_check_patterns_reports_each_category():
+    score, reason = fraud_detector.check_patterns(DOCS[2])
+    assert score == 0.7
+    assert reason == 'Suspicious pattern in terms (payment method); Suspicious pattern in terms (confidentiality)'
+    assert fraud_detector.check_patterns(DOCS[3]) == (0.0, None)
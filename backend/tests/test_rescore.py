@@ -0,0 +1,69 @@
+import pytest
+
+import cache
+import rescore
+from verification import log_audit
+
+USER = {'id': 'u1', 'name': 'Tester', 'email': 'tester@example.com'}
+LISTING = {'location': 'Austin', 'buyer_intent': 'sale', 'terms': 'Twelve month lease'}
+
+def write_entries(n):
+    for i in range(n):
+        log_audit(f'P{i % 3}', 'update', {**LISTING, 'terms': f'Twelve month lease, option {i}'}, USER)
+
+def test_every_entry_is_rescored_once(clean_db):
+    write_entries(7)
+    state = rescore.run('v2', chunk_size=3)
+    assert state['done'] and state['scored'] == 7
+    assert clean_db.audit_logs.count_documents({'scoring_version': 'v2'}) == 7
+    assert clean_db.risk_assessments.count_documents({'scoring_version': 'v2'}) == 7
+    # A finished version is not run again; --restart scores it over
+    assert rescore.run('v2', chunk_size=3)['scored'] == 7
+    assert rescore.run('v2', chunk_size=3, restart=True)['scored'] == 7
+    assert clean_db.risk_assessments.count_documents({'scoring_version': 'v2'}) == 7
+
+def test_an_interrupted_run_resumes_after_the_last_written_chunk(clean_db, monkeypatch):
+    write_entries(8)
+    score_chunk, calls = rescore.score_chunk, []
+
+    def crash_on_third(low, high, version, started_at):
+        calls.append(low)
+        if len(calls) == 3:
+            raise RuntimeError('worker died')
+        return score_chunk(low, high, version, started_at)
+
+    monkeypatch.setattr(rescore, 'score_chunk', crash_on_third)
+    with pytest.raises(RuntimeError):
+        rescore.run('v2', chunk_size=3)
+    state = clean_db.rescore_checkpoints.find_one({'_id': 'v2'})
+    assert state['scored'] == 6 and not state['done']
+    # Entries written after the run started are left to live scoring
+    write_entries(2)
+    monkeypatch.setattr(rescore, 'score_chunk', score_chunk)
+    state = rescore.run('v2', chunk_size=3)
+    assert state['done'] and state['scored'] == 8
+    assert clean_db.audit_logs.count_documents({'scoring_version': 'v2'}) == 8
+
+def test_entries_are_scored_against_their_chain_predecessor(clean_db):
+    log_audit('P1', 'create', {**LISTING, 'price': 1000.0}, USER)
+    log_audit('P1', 'update', {**LISTING, 'price': 3000.0}, USER)
+    log_audit('P1', 'update', {**LISTING, 'price': 3000.0, 'terms': 'Lease, pets allowed'}, USER)
+    # The queue still owns the middle entry, so the chunk skips it
+    clean_db.audit_logs.update_one({'seq': 2}, {'$set': {'fraud_status': 'pending'}})
+    rescore.run('v2')
+    last = clean_db.audit_logs.find_one({'seq': 3})
+    assert last['scoring_version'] == 'v2'
+    assert 'Suspicious price change' not in (last['fraud_reason'] or '')
+    assert 'scoring_version' not in clean_db.audit_logs.find_one({'seq': 2})
+
+def test_per_worker_caches_are_left_to_expire(clean_db, monkeypatch):
+    write_entries(2)
+    generation = cache.backend.generation(cache.audit_scope('P0'))
+    rescore.run('v2')
+    assert cache.backend.generation(cache.audit_scope('P0')) == generation
+    monkeypatch.setattr(cache, 'CACHE_URL', 'redis://shared')
+    rescore.run('v3')
+    assert cache.backend.generation(cache.audit_scope('P0')) == generation + 1
+
+def test_nothing_to_score():
+    assert rescore.run('v2') is None
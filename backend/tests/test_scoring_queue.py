@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import audit_store
+import scoring_queue
+import verification
+from verification import fraud_detector, log_audit
+
+USER = {'id': 'u1', 'name': 'Tester', 'email': 'tester@example.com'}
+
+@pytest.fixture
+def pending(clean_db, monkeypatch):
+    """Async mode: entries for two properties committed as pending and submitted to a fresh queue"""
+    monkeypatch.setattr(verification, 'FRAUD_SCORING_MODE', 'async')
+    worker = scoring_queue.ScoringQueue(fraud_detector)
+    monkeypatch.setattr(scoring_queue, 'scoring_queue', worker)
+    for price in (1000.0, 1050.0, 3000.0):
+        log_audit('P1', 'update', {'location': 'Austin', 'buyer_intent': 'rent', 'terms': 'lease', 'price': price}, USER)
+    log_audit('P2', 'create', {'location': 'Boston', 'terms': 'wire transfer only', 'price': 900.0}, USER)
+    return worker
+
+def test_entries_are_committed_pending(pending, clean_db):
+    assert {e['fraud_status'] for e in clean_db.audit_logs.find()} == {'pending'}
+    assert pending.status()['pending'] == 4
+    assert pending.status()['queue_depth'] == 4
+
+def test_batch_scores_match_scoring_each_entry_as_of_its_timestamp(pending, clean_db):
+    ids = pending._next_batch()
+    entries = audit_store.materialize(clean_db.audit_logs.find(sort=[('timestamp', 1)]))
+    expected = {}
+    for entry in entries:
+        prev_log = next((e for e in entries if e['property_id'] == entry['property_id'] and e['seq'] == entry['seq'] - 1), None)
+        detected, reason, _ = fraud_detector.assess(entry['changes'], entry['user'], prev_log,
+                                                    as_of=entry['timestamp'], property_id=entry['property_id'])
+        expected[entry['_id']] = (detected, reason)
+
+    assert pending.score_batch(ids) == 4
+    scored = {e['_id']: (e['fraud_detected'], e['fraud_reason']) for e in clean_db.audit_logs.find()}
+    assert scored == expected
+    assert any('Suspicious price change' in (reason or '') for _, reason in scored.values())
+    assert clean_db.risk_assessments.count_documents({}) == 4
+    assert {e['fraud_status'] for e in clean_db.audit_logs.find()} == {'scored'}
+    assert clean_db.audit_logs.count_documents({'scoring_claim': {'$exists': True}}) == 0
+
+def test_claimed_entries_are_scored_once(pending, clean_db):
+    ids = pending._next_batch()
+    assert pending.score_batch(ids) == 4
+    assert pending.score_batch(ids) == 0
+    assert clean_db.risk_assessments.count_documents({}) == 4
+
+def test_sweep_requeues_pending_and_stale_claims(pending, clean_db):
+    pending._next_batch()
+    first, second = [e['_id'] for e in clean_db.audit_logs.find(sort=[('timestamp', 1)], limit=2)]
+    clean_db.audit_logs.update_one({'_id': first}, {'$set': {
+        'fraud_status': 'scoring', 'scoring_claim': 'crashed',
+        'scoring_claimed_at': datetime.utcnow() - scoring_queue.STALE_CLAIM - timedelta(seconds=1)}})
+    clean_db.audit_logs.update_one({'_id': second}, {'$set': {
+        'fraud_status': 'scoring', 'scoring_claim': 'busy', 'scoring_claimed_at': datetime.utcnow()}})
+    assert pending.sweep() == 3
+    assert second not in pending._next_batch()
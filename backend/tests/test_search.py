@@ -0,0 +1,69 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import search
+
+OWNER = {'name': 'Alice', 'email': 'alice@example.com'}
+LISTINGS = [
+    ('New York, NY', 'Loft with a view, twelve month lease'),
+    ('Newark, NJ', 'Family house near the station'),
+    ('São Paulo', 'Apartment in the new district, york style'),
+    ('Yonkers, NY', 'Garden flat'),
+    ('Boston, MA', 'Studio near the river'),
+]
+
+@pytest.fixture
+def client(clean_db):
+    import main
+    client = TestClient(main.app)
+    for location, terms in LISTINGS:
+        client.post('/properties', json={'owner': OWNER, 'buyer_intent': 'sale', 'location': location,
+                                          'verification': 'pending', 'terms': terms})
+    return client
+
+def locations(client, q, **params):
+    response = client.get('/properties/search', params={'q': q, **params})
+    assert response.status_code == 200
+    return [row['location'] for row in response.json()]
+
+def test_search_keys_fold_case_and_accents():
+    keys = search.search_fields({'location': 'São Paulo', 'terms': 'Lease, lease'})
+    assert keys['loc'] == ['sao', 'paulo']
+    assert keys['pre'][:3] == ['sa', 'sao', 'pa']
+    assert keys['terms'] == ['lease']
+
+def test_prefix_search_ranks_location_words_first(client):
+    assert locations(client, 'new') == ['New York, NY', 'Newark, NJ', 'São Paulo']
+    assert locations(client, 'new yo') == ['New York, NY']
+    assert locations(client, 'sao') == ['São Paulo']
+
+def test_a_one_letter_last_word_does_not_filter(client):
+    # Typeahead right after a space: "new y" still shows what "new" matched
+    assert locations(client, 'new y') == ['New York, NY', 'Newark, NJ', 'São Paulo']
+    assert locations(client, 'new ') == locations(client, 'new')
+    assert locations(client, 'y') == []
+    assert locations(client, 'new y', mode='token') == []
+
+def test_token_search_needs_whole_words(client):
+    assert locations(client, 'new york', mode='token') == ['New York, NY', 'São Paulo']
+    assert locations(client, 'yo', mode='token') == []
+
+def test_fuzzy_search_tolerates_typos(client):
+    assert locations(client, 'new yrok', mode='fuzzy')[0] == 'New York, NY'
+    assert 'Boston, MA' not in locations(client, 'new yrok', mode='fuzzy')
+
+def test_pages_follow_the_ranking_without_overlap(client):
+    everything = locations(client, 'n', mode='fuzzy', limit=100)
+    seen, params = [], {'q': 'n', 'mode': 'fuzzy', 'limit': 2}
+    while True:
+        response = client.get('/properties/search', params=params)
+        seen += [row['location'] for row in response.json()]
+        if 'x-next-cursor' not in response.headers:
+            break
+        params['next'] = response.headers['x-next-cursor']
+    assert seen == everything and len(everything) > 2
+
+def test_filters_and_bad_queries(client):
+    assert locations(client, 'new', verification='verified') == []
+    assert locations(client, '!!!') == []
+    assert client.get('/properties/search', params={'q': 'new', 'mode': 'regex'}).status_code == 422
@@ -0,0 +1,62 @@
+import sys
+
+import pytest
+
+import audit_store
+import auth
+import merkle
+import seed
+
+ARGS = ['--users', '12', '--properties', '40', '--batch-size', '15', '--workers', '1', '--edit-rate', '3',
+        '--fraud-fraction', '0.2', '--delete-fraction', '0.1', '--seed', '7']
+
+def run_seed(monkeypatch, *extra):
+    monkeypatch.setattr(sys, 'argv', ['seed.py', *ARGS, *extra])
+    seed.main()
+
+@pytest.fixture
+def seeded(clean_db, monkeypatch, capsys):
+    run_seed(monkeypatch)
+    capsys.readouterr()
+    return clean_db
+
+def test_every_generated_chain_verifies(seeded):
+    property_ids = seeded.audit_logs.distinct('property_id')
+    assert len(property_ids) == 40
+    for property_id in property_ids:
+        assert merkle.verify_property_chain(property_id)['valid'], property_id
+    assert seeded.audit_logs.count_documents({'delta': {'$exists': True}}) > 0
+    assert seeded.audit_logs.count_documents({'fraud_detected': True}) > 0
+
+def test_chain_heads_and_listings_match_the_last_entry(seeded):
+    live = {str(doc['_id']): doc for doc in seeded.properties.find()}
+    assert 0 < len(live) < 40
+    for head in seeded.chain_heads.find():
+        last = seeded.audit_logs.find_one({'property_id': head['_id']}, sort=[('seq', -1)])
+        assert head['seq'] == last['seq'] and head['tip']['hash'] == last['hash']
+        if last['action'] == 'delete':
+            assert head['_id'] not in live
+            continue
+        state = audit_store.state_at_seq(head['_id'], head['seq'])
+        stored = {k: v for k, v in live[head['_id']].items() if k not in ('_id', 'search')}
+        assert state == {**stored, 'id': head['_id']}
+    assert seeded.location_stats.count_documents({}) > 0
+
+def test_seeded_users_can_sign_in(seeded):
+    user = seeded.users.find_one()
+    assert auth.verify_password(seed.PASSWORD, user['password'])
+
+def test_the_same_seed_gives_the_same_data(seeded, monkeypatch, capsys):
+    first = list(seeded.audit_logs.find(sort=[('_id', 1)]))
+    run_seed(monkeypatch)
+    assert list(seeded.audit_logs.find(sort=[('_id', 1)])) == first
+    run_seed(monkeypatch, '--seed', '8')
+    assert [e['hash'] for e in seeded.audit_logs.find(sort=[('_id', 1)])] != [e['hash'] for e in first]
+
+def test_ndjson_output_matches_what_is_written(seeded, monkeypatch, tmp_path, capsys):
+    run_seed(monkeypatch, '--out', str(tmp_path))
+    lines = sum(len(path.read_text().splitlines()) for path in tmp_path.glob('audit_logs-*.ndjson'))
+    assert lines == seeded.audit_logs.count_documents({})
+    assert sorted(path.name for path in tmp_path.glob('properties-*')) == ['properties-00000.ndjson',
+                                                                           'properties-00001.ndjson',
+                                                                           'properties-00002.ndjson']
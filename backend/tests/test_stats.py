@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import repository
+
+NOW = datetime(2024, 6, 1, 12)
+
+@pytest.fixture
+def seeded(clean_db):
+    clean_db.properties.insert_many([
+        {'location': location, 'buyer_intent': intent, 'verification': status}
+        for location, intent, status in [
+            ('Austin', 'sale', 'verified'), ('Austin', 'rent', 'pending'), ('Boston', 'sale', 'pending'),
+            ('Chicago', 'sale', None), ('Austin', 'sale', 'verified')]])
+    austin = str(clean_db.properties.find_one({'location': 'Austin'})['_id'])
+    clean_db.audit_logs.insert_many([
+        {'property_id': austin, 'seq': 1, 'action': 'create', 'snapshot': {'location': 'Austin'},
+         'timestamp': NOW - timedelta(days=3)},
+        # A delta that left the location alone: the listing's current location stands in
+        {'property_id': austin, 'seq': 2, 'action': 'update', 'delta': {'set': {'terms': 'x'}, 'unset': []},
+         'timestamp': NOW - timedelta(hours=2)},
+        {'property_id': 'P2', 'action': 'update', 'changes': {'location': 'Boston'}, 'timestamp': NOW - timedelta(hours=1)},
+        {'property_id': 'P3', 'seq': 1, 'action': 'create', 'snapshot': {'location': 'Old'},
+         'timestamp': NOW - timedelta(days=10)},
+    ])
+    clean_db.risk_assessments.insert_many([
+        {'timestamp': NOW - timedelta(days=1), 'risk_score': 0.9},
+        {'timestamp': NOW - timedelta(days=2), 'risk_score': 0.1},
+        {'timestamp': NOW - timedelta(days=20), 'risk_score': 0.95},
+    ])
+    return austin
+
+def test_dashboard_summary(seeded):
+    summary = asyncio.run(repository.stats.dashboard(0.7, now=NOW))
+    assert summary['total'] == 5
+    assert summary['verification'] == {'verified': 2, 'pending': 2, 'none': 1}
+    assert summary['intent'] == {'sale': 4, 'rent': 1}
+    assert summary['top_locations'][0] == {'location': 'Austin', 'count': 3}
+    assert summary['activity']['last_24h'] == 2 and summary['activity']['last_7d'] == 3
+    assert summary['activity']['by_action']['create'] == {'last_24h': 0, 'last_7d': 1}
+    assert [row['location'] for row in summary['recent']] == ['Boston', 'Austin', 'Austin', 'Old']
+    assert summary['fraud_last_7d'] == {'assessed': 2, 'flagged': 1, 'flag_rate': 0.5, 'mean_risk_score': 0.5}
+
+def test_stats_route_is_cached_until_a_write(seeded):
+    import main
+    client = TestClient(main.app)
+    first = client.get('/stats')
+    assert first.status_code == 200 and first.json()['total'] == 5
+    assert client.get('/stats', headers={'If-None-Match': first.headers['etag']}).status_code == 304
+    client.post('/properties', json={'owner': {'name': 'A', 'email': 'a@example.com'}, 'buyer_intent': 'rent',
+                                     'location': 'Denver', 'verification': 'pending', 'terms': 'Monthly lease'})
+    after = client.get('/stats', headers={'If-None-Match': first.headers['etag']})
+    assert after.status_code == 200 and after.json()['total'] == 6
@@ -0,0 +1,56 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from verification import ScoringContext, fraud_detector
+
+NOW = datetime(2024, 6, 1)
+
+def write_logs(database, n, seed=0):
+    """Entries in the pre-compact shape, with distinct timestamps and a mix of users and fields"""
+    rng = random.Random(seed)
+    users = [{'id': 'u1'}, {'id': 'u2'}, {'id': 'u3'}, {'name': 'no id'}, None]
+    start = NOW - timedelta(days=3)
+    logs, seqs = [], {}
+    for i in range(n):
+        changes = {'location': rng.choice(['Austin, TX', 'Boston', '12 Elm Street']), 'buyer_intent': 'rent'}
+        if rng.random() < 0.7:
+            changes['price'] = float(rng.randrange(500, 5000))
+        if rng.random() < 0.5:
+            changes['terms'] = rng.choice(['twelve month lease', 'wire transfer only, urgent', 'no pets'])
+        property_id = f'P{rng.randrange(6)}'
+        seqs[property_id] = seqs.get(property_id, 0) + 1
+        logs.append({
+            'property_id': property_id,
+            'seq': seqs[property_id],
+            'action': 'update',
+            'changes': changes,
+            'user': users[i % len(users)],
+            'timestamp': start + timedelta(minutes=i * 7 + rng.randrange(5)),
+        })
+    database.audit_logs.insert_many(logs)
+
+def one_at_a_time(logs, database):
+    rows = []
+    for log in logs:
+        prev = database.audit_logs.find_one(
+            {'property_id': log['property_id'], 'timestamp': {'$lt': log['timestamp']}}, sort=[('timestamp', -1)])
+        context = ScoringContext(log.get('user'), prev)
+        context.now = NOW
+        rows.append(fraud_detector.prepare_features(log['changes'], log.get('user'), prev, context)[0])
+    return np.array(rows)
+
+@pytest.mark.parametrize('limit', [200, 40])
+def test_batch_features_equal_prepare_features(clean_db, limit):
+    # A limit below the number of logs leaves previous logs and user history
+    # outside the scan, which the batch builder fetches separately
+    write_logs(clean_db, 120)
+    logs = fraud_detector.load_training_logs(limit=limit)
+    assert len(logs) == min(limit, 120)
+    batch = fraud_detector.build_training_features(logs, now=NOW)
+    np.testing.assert_allclose(batch, one_at_a_time(logs, clean_db))
+
+def test_no_logs_give_an_empty_matrix():
+    assert fraud_detector.build_training_features([]).shape == (0, 9)
@@ -1,5 +1,8 @@
 import hashlib
-from datetime import datetime, timedelta
+import os
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from db import db
 import re
 from typing import Dict, List, Tuple, Optional
@@ -9,6 +12,48 @@ import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
+from pattern_scanner import load_scanner
+import location_stats
+import metrics
+import audit_store
+import duplicates
+
+class ScoringContext:
+    """Per-scoring-run cache of the user's audit history, shared by every check"""
+    history_limit = 50  # deepest window any check or feature reads
+
+    def __init__(self, user: Optional[dict], prev_log: Optional[dict], as_of: Optional[datetime] = None,
+                 history: Optional[List[dict]] = None, property_id: Optional[str] = None):
+        self.user = user
+        self.prev_log = prev_log
+        self.property_id = property_id  # the listing being scored, as the server knows it (never from `changes`)
+        # Deferred scoring evaluates an entry as of its own timestamp, ignoring later logs
+        self.as_of = as_of
+        self.now = as_of or datetime.utcnow()
+        self.query_count = 0
+        self._history = history  # batch scoring preloads it for every row by the same user
+        self.pattern_hits = None  # PatternScanner result for the changes being scored
+        self.duplicates = None  # near-duplicate matches for them, when preloaded by batch scoring
+
+    def record_query(self, n: int = 1):
+        self.query_count += n
+
+    def user_logs(self, limit: int) -> List[dict]:
+        """Most recent `limit` audit logs by this user, newest first"""
+        if self._history is None:
+            if not self.user or 'id' not in self.user:
+                self._history = []
+            else:
+                query = {'user.id': self.user['id']}
+                if self.as_of:
+                    query['timestamp'] = {'$lt': self.as_of}
+                self._history = list(db.audit_logs.find(
+                    query,
+                    sort=[('timestamp', -1)],
+                    limit=self.history_limit
+                ))
+                self.record_query()
+        return self._history[:limit]
 
 class FraudDetector:
     def __init__(self):
@@ -16,34 +61,30 @@ class FraudDetector:
         self.price_change_threshold = 0.5  # 50% price change threshold
         self.rapid_update_threshold = timedelta(minutes=5)
         self.max_updates_per_hour = 5
-        self.suspicious_patterns = {
-            'location': [
-                r'\d{10}',  # Phone numbers
-                r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',  # URLs
-                r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}',  # Email addresses
-                r'(?i)(free|cheap|discount|offer|deal|sale)',  # Suspicious keywords
-                r'(?i)(urgent|quick|fast|immediate)',  # Urgency indicators
-            ],
-            'terms': [
-                r'(?i)(wire transfer|western union|money order)',  # Suspicious payment methods
-                r'(?i)(guarantee|warranty|refund)',  # Suspicious guarantees
-                r'(?i)(confidential|secret|private)',  # Suspicious confidentiality
-            ]
-        }
+        self.min_market_listings = 3  # fewer listings than this is not a market price
+        # Suspicious-content rules, compiled once (FRAUD_PATTERNS_FILE overrides the defaults)
+        self.scanner = load_scanner()
         self.required_fields = ['location', 'buyer_intent', 'terms']
+        self.training_change_fields = ['price', 'location', 'terms', 'buyer_intent'] + \
+            [f for f in self.scanner.rules if f not in ('location', 'terms', 'buyer_intent', 'price')]
         self.field_weights = {
             'price_change': 0.3,
             'update_frequency': 0.2,
             'pattern_match': 0.2,
             'data_consistency': 0.15,
-            'user_behavior': 0.15
+            'user_behavior': 0.15,
+            'duplicate_listing': 0.2
         }
-        self.model = IsolationForest(contamination=0.1, random_state=42)
-        self.scaler = StandardScaler()
-        self.is_model_trained = False
-
-    def prepare_features(self, changes: dict, user: dict, prev_log: Optional[dict]) -> np.ndarray:
+        # (model, scaler, meta) replaced as one reference so a swap is atomic
+        # for concurrent requests; None until a model is loaded or trained
+        self.active_model = None
+        self.last_query_count = 0  # DB round trips issued by the latest detect_fraud
+
+    @metrics.timed('fraud.prepare_features')
+    def prepare_features(self, changes: dict, user: dict, prev_log: Optional[dict],
+                         context: Optional[ScoringContext] = None) -> np.ndarray:
         """Prepare features for the machine learning model"""
+        context = context or ScoringContext(user, prev_log)
         features = []
         
         # Price change features
@@ -57,17 +98,13 @@ class FraudDetector:
 
         # Update frequency features
         if prev_log:
-            time_diff = (datetime.utcnow() - prev_log['timestamp']).total_seconds()
+            time_diff = (context.now - prev_log['timestamp']).total_seconds()
             features.append(time_diff)
         else:
             features.append(0)
 
         # User activity features
-        user_logs = list(db.audit_logs.find(
-            {'user.id': user['id']},
-            sort=[('timestamp', -1)],
-            limit=20
-        ))
+        user_logs = context.user_logs(20)
         features.append(len(user_logs))
         
         # Property count feature
@@ -80,72 +117,195 @@ class FraudDetector:
         features.append(len(changes.get('buyer_intent', '')))
 
         # Pattern match count
-        pattern_matches = 0
-        for field, patterns in self.suspicious_patterns.items():
-            if field in changes:
-                value = str(changes[field]).lower()
-                for pattern in patterns:
-                    if re.search(pattern, value):
-                        pattern_matches += 1
-        features.append(pattern_matches)
+        features.append(self.scanner.category_count(self.scan_patterns(changes, context)))
 
         return np.array(features).reshape(1, -1)
 
+    def load_training_logs(self, limit: int = 1000) -> List[dict]:
+        """One sorted scan of the newest audit logs, projected to the fields features use"""
+        projection = {'property_id': 1, 'timestamp': 1, 'user.id': 1, 'seq': 1, 'hash_version': 1}
+        projection.update({f'changes.{field}': 1 for field in self.training_change_fields})
+        projection.update({f'snapshot.{field}': 1 for field in self.training_change_fields})
+        # Compact entries are rebuilt in full from their snapshot and deltas
+        return audit_store.materialize(db.audit_logs.find({}, projection, sort=[('timestamp', -1)], limit=limit))
+
+    def build_training_features(self, logs: List[dict], now: Optional[datetime] = None) -> np.ndarray:
+        """Feature matrix for `logs` (newest first), row-for-row equal to prepare_features.
+
+        Previous-log and per-user windows are derived from the scan itself; only
+        properties and users whose history reaches past the oldest loaded log
+        cost one extra aggregation each.
+        """
+        if not logs:
+            return np.empty((0, 9))
+        now = now or datetime.utcnow()
+        df = pd.DataFrame({
+            'pos': range(len(logs)),
+            'property_id': [log['property_id'] for log in logs],
+            'timestamp': [log['timestamp'] for log in logs],
+        })
+        users = [log.get('user') for log in logs]
+        # Rows scored with a user id read that user's history; every log lands in
+        # the history of its user.id (None when absent, as Mongo's null match does)
+        df['scored'] = [isinstance(u, dict) and 'id' in u for u in users]
+        df['user_key'] = [u.get('id') if isinstance(u, dict) else None for u in users]
+        changes = pd.DataFrame([log.get('changes') or {} for log in logs],
+                               columns=self.training_change_fields)
+        has_field = {field: [field in (log.get('changes') or {}) for log in logs]
+                     for field in self.training_change_fields}
+        df['has_price'] = has_field['price']
+        df['price'] = pd.to_numeric(changes['price'], errors='coerce')
+
+        # Previous log per property: latest strictly-earlier timestamp
+        by_prop = df.sort_values(['property_id', 'timestamp', 'pos'], kind='stable')
+        shifted = by_prop.groupby('property_id')[['timestamp', 'has_price', 'price']].shift(1)
+        shifted = shifted.groupby([by_prop['property_id'], by_prop['timestamp']]).transform('first')
+        prev = shifted.reindex(df.index)
+        df['prev_ts'] = prev['timestamp']
+        df['prev_has_price'] = prev['has_price'].astype('boolean').fillna(False).astype(bool)
+        df['prev_price'] = prev['price']
+
+        oldest = df['timestamp'].min()
+        missing = df.loc[df['prev_ts'].isna(), 'property_id'].unique().tolist()
+        if missing:
+            older = audit_store.materialize(db.audit_logs.aggregate([
+                {'$match': {'property_id': {'$in': missing}, 'timestamp': {'$lt': oldest}}},
+                {'$sort': {'timestamp': -1}},
+                {'$group': {'_id': '$property_id', 'property_id': {'$first': '$property_id'},
+                            'timestamp': {'$first': '$timestamp'}, 'seq': {'$first': '$seq'},
+                            'hash_version': {'$first': '$hash_version'}, 'snapshot': {'$first': '$snapshot'},
+                            'changes': {'$first': '$changes'}}},
+            ]))
+            for doc in older:
+                rows = df['prev_ts'].isna() & (df['property_id'] == doc['_id'])
+                prev_changes = doc.get('changes') or {}
+                df.loc[rows, 'prev_ts'] = doc['timestamp']
+                df.loc[rows, 'prev_has_price'] = 'price' in prev_changes
+                df.loc[rows, 'prev_price'] = pd.to_numeric(prev_changes.get('price'), errors='coerce')
+
+        price_rows = df['has_price'] & df['prev_has_price']
+        price_change = ((df['price'] - df['prev_price']) / df['prev_price']).abs()
+        time_diff = (now - pd.to_datetime(df['prev_ts'])).dt.total_seconds()
+
+        # Per-user window: the user's 20 newest logs overall, which are their newest
+        # in the scan unless the scan holds fewer than 20 of them
+        window = 20
+        key = df['user_key'].astype(object).where(df['user_key'].notna(), '__none__')
+        head = df.assign(key=key).groupby('key', sort=False).head(window)
+        user_props = head.groupby('key')['property_id'].agg(list).to_dict()
+        short = [k for k, props in user_props.items() if len(props) < window]
+        if short:
+            ids = [None if k == '__none__' else k for k in short]
+            older = db.audit_logs.aggregate([
+                {'$match': {'user.id': {'$in': ids}, 'timestamp': {'$lt': oldest}}},
+                {'$sort': {'timestamp': -1}},
+                {'$group': {'_id': '$user.id', 'property_ids': {'$push': '$property_id'}}},
+                {'$project': {'property_ids': {'$slice': ['$property_ids', window]}}},
+            ])
+            for doc in older:
+                k = '__none__' if doc['_id'] is None else doc['_id']
+                if k in user_props:
+                    user_props[k] = (user_props[k] + doc['property_ids'])[:window]
+        log_count = key.map(lambda k: len(user_props[k])).where(df['scored'], 0)
+        prop_count = key.map(lambda k: len(set(user_props[k]))).where(df['scored'], 0)
+
+        def text_len(field):
+            return changes[field].where(pd.Series(has_field[field]), '').map(len)
+
+        # One scanner pass per document over the projected changes
+        pattern_matches = pd.Series([
+            self.scanner.category_count(hits)
+            for hits in self.scanner.scan_many(log.get('changes') or {} for log in logs)
+        ], index=df.index)
+
+        X = np.column_stack([
+            price_change.where(price_rows, 0).to_numpy(dtype=float),
+            df['price'].where(price_rows, 0).to_numpy(dtype=float),
+            time_diff.fillna(0).to_numpy(dtype=float),
+            log_count.to_numpy(dtype=float),
+            prop_count.to_numpy(dtype=float),
+            text_len('location').to_numpy(dtype=float),
+            text_len('terms').to_numpy(dtype=float),
+            text_len('buyer_intent').to_numpy(dtype=float),
+            pattern_matches.to_numpy(dtype=float),
+        ])
+        return X
+
+    def fit_model(self, historical_logs: List[dict]):
+        """Fit a fresh scaler and IsolationForest on `historical_logs` (newest first)"""
+        X = self.build_training_features(historical_logs)
+
+        # Scale features
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+
+        # Train model
+        model = IsolationForest(contamination=0.1, random_state=42)
+        model.fit(X_scaled)
+        meta = {
+            'trained_at': datetime.utcnow(),
+            'watermark': historical_logs[0]['timestamp'],
+            'n_samples': len(historical_logs),
+        }
+        return model, scaler, meta
+
     def train_model(self):
         """Train the isolation forest model with historical data"""
-        # Fetch historical data
-        historical_logs = list(db.audit_logs.find(
-            {},
-            sort=[('timestamp', -1)],
-            limit=1000
-        ))
+        historical_logs = self.load_training_logs(limit=1000)
 
         if not historical_logs:
             return
 
-        # Prepare training data
-        X = []
-        for log in historical_logs:
-            features = self.prepare_features(
-                log['changes'],
-                log['user'],
-                db.audit_logs.find_one(
-                    {'property_id': log['property_id'], 'timestamp': {'$lt': log['timestamp']}},
-                    sort=[('timestamp', -1)]
-                )
-            )
-            X.append(features[0])
-
-        X = np.array(X)
-        
-        # Scale features
-        X_scaled = self.scaler.fit_transform(X)
-        
-        # Train model
-        self.model.fit(X_scaled)
-        self.is_model_trained = True
+        self.swap_model(*self.fit_model(historical_logs))
+
+    def swap_model(self, model, scaler, meta: Optional[dict] = None):
+        self.active_model = (model, scaler, meta or {})
+
+    @property
+    def is_model_trained(self) -> bool:
+        return self.active_model is not None
+
+    @property
+    def model_version(self) -> Optional[int]:
+        return self.active_model[2].get('version') if self.active_model else None
 
     def predict_anomaly(self, features: np.ndarray) -> float:
         """Predict anomaly score using the trained model"""
-        if not self.is_model_trained:
-            self.train_model()
+        active = self.active_model
+        if active is None:
+            # Training happens out of band (see fraud_model); score neutral until then
+            return 0.0
+        model, scaler, _ = active
         
-        # Scale features
-        features_scaled = self.scaler.transform(features)
-        
-        # Get anomaly score (negative values indicate anomalies)
-        score = self.model.score_samples(features_scaled)[0]
+        with metrics.inference('single'):
+            # Scale features
+            features_scaled = scaler.transform(features)
+
+            # Get anomaly score (negative values indicate anomalies)
+            score = model.score_samples(features_scaled)[0]
         
         # Convert to probability (0 to 1, where 1 is more anomalous)
         probability = 1 / (1 + np.exp(score))
         return probability
 
+    def predict_anomaly_batch(self, features: np.ndarray) -> np.ndarray:
+        """predict_anomaly for every row of `features` in one model call"""
+        active = self.active_model
+        if active is None or not len(features):
+            return np.zeros(len(features))
+        model, scaler, _ = active
+        with metrics.inference('batch'):
+            scores = model.score_samples(scaler.transform(features))
+        return 1 / (1 + np.exp(scores))
+
     def calculate_risk_score(self, risk_factors: Dict[str, float]) -> float:
         """Calculate weighted risk score based on various factors"""
         return sum(score * self.field_weights.get(factor, 0) 
                   for factor, score in risk_factors.items())
 
-    def check_price_anomaly(self, changes: dict, prev_log: Optional[dict]) -> Tuple[float, str]:
+    @metrics.timed('fraud.check_price_anomaly')
+    def check_price_anomaly(self, changes: dict, prev_log: Optional[dict],
+                            context: Optional[ScoringContext] = None) -> Tuple[float, str]:
         """Check for suspicious price changes with market context"""
         if 'price' not in changes or not prev_log or 'price' not in prev_log['changes']:
             return 0.0, None
@@ -154,39 +314,38 @@ class FraudDetector:
         new_price = float(changes['price'])
         price_change_percent = abs((new_price - old_price) / old_price)
 
-        # Get market context
-        recent_prices = list(db.properties.find(
-            {'location': changes.get('location')},
-            {'price': 1, '_id': 0}
-        ).limit(10))
+        # Get market context: running stats over every listing in the location
+        market = location_stats.get_stats(changes.get('location'))
+        if context:
+            context.record_query()
         
-        if recent_prices:
-            avg_price = sum(float(p['price']) for p in recent_prices) / len(recent_prices)
-            market_deviation = abs(new_price - avg_price) / avg_price
+        if market and market['count'] >= self.min_market_listings:
+            # Median from the quantile sketch is robust to a few outlier listings
+            reference = market['median'] or market['mean']
+            market_deviation = abs(new_price - reference) / reference
             
-            if market_deviation > 0.3:  # 30% deviation from market average
-                return 0.8, f"Price significantly deviates from market average ({market_deviation:.1%})"
+            if market_deviation > 0.3:  # 30% deviation from market median
+                return 0.8, f"Price significantly deviates from market median ({market_deviation:.1%} across {market['count']} listings)"
         
         if price_change_percent > self.price_change_threshold:
             return 0.7, f"Suspicious price change: {price_change_percent:.1%}"
         
         return 0.0, None
 
-    def check_update_frequency(self, user: dict, prev_log: Optional[dict]) -> Tuple[float, str]:
+    @metrics.timed('fraud.check_update_frequency')
+    def check_update_frequency(self, user: dict, prev_log: Optional[dict],
+                               context: Optional[ScoringContext] = None) -> Tuple[float, str]:
         """Check for suspicious update patterns"""
+        context = context or ScoringContext(user, prev_log)
         if not prev_log:
             return 0.0, None
 
-        time_diff = datetime.utcnow() - prev_log['timestamp']
+        time_diff = context.now - prev_log['timestamp']
         if time_diff < self.rapid_update_threshold:
             return 0.6, "Multiple rapid updates detected"
 
         # Check user's update history
-        recent_updates = list(db.audit_logs.find(
-            {'user.id': user['id']},
-            sort=[('timestamp', -1)],
-            limit=20
-        ))
+        recent_updates = context.user_logs(20)
 
         if len(recent_updates) >= self.max_updates_per_hour:
             return 0.8, "Unusually high update frequency"
@@ -201,21 +360,28 @@ class FraudDetector:
 
         return 0.0, None
 
-    def check_patterns(self, changes: dict) -> Tuple[float, str]:
+    def scan_patterns(self, changes: dict, context: Optional[ScoringContext] = None) -> Dict[str, Dict[str, int]]:
+        """Scan once per scoring run; features and check_patterns share the result"""
+        if context is None:
+            return self.scanner.scan(changes)
+        if context.pattern_hits is None:
+            context.pattern_hits = self.scanner.scan(changes)
+        return context.pattern_hits
+
+    @metrics.timed('fraud.check_patterns')
+    def check_patterns(self, changes: dict, context: Optional[ScoringContext] = None) -> Tuple[float, str]:
         """Check for suspicious patterns in property data"""
         risk_score = 0.0
         reasons = []
 
-        for field, patterns in self.suspicious_patterns.items():
-            if field in changes:
-                value = str(changes[field]).lower()
-                for pattern in patterns:
-                    if re.search(pattern, value):
-                        risk_score = max(risk_score, 0.7)
-                        reasons.append(f"Suspicious pattern in {field}")
+        for field, hits in self.scan_patterns(changes, context).items():
+            for category in hits:
+                risk_score = max(risk_score, 0.7)
+                reasons.append(f"Suspicious pattern in {field} ({category.replace('_', ' ')})")
 
         return risk_score, '; '.join(reasons) if reasons else None
 
+    @metrics.timed('fraud.check_data_consistency')
     def check_data_consistency(self, changes: dict) -> Tuple[float, str]:
         """Check for data consistency and completeness"""
         risk_score = 0.0
@@ -245,17 +411,15 @@ class FraudDetector:
 
         return risk_score, '; '.join(reasons) if reasons else None
 
-    def check_user_behavior(self, user: dict) -> Tuple[float, str]:
+    @metrics.timed('fraud.check_user_behavior')
+    def check_user_behavior(self, user: dict, context: Optional[ScoringContext] = None) -> Tuple[float, str]:
         """Analyze user behavior patterns"""
+        context = context or ScoringContext(user, None)
         risk_score = 0.0
         reasons = []
 
         # Check user's history
-        user_logs = list(db.audit_logs.find(
-            {'user.id': user['id']},
-            sort=[('timestamp', -1)],
-            limit=50
-        ))
+        user_logs = context.user_logs(50)
 
         if user_logs:
             # Check for multiple properties
@@ -275,34 +439,58 @@ class FraudDetector:
 
         return risk_score, '; '.join(reasons) if reasons else None
 
-    def detect_fraud(self, changes: dict, user: dict, prev_log: Optional[dict]) -> Tuple[bool, str]:
-        """Enhanced fraud detection with machine learning and risk scoring"""
+    @metrics.timed('fraud.check_duplicates')
+    def check_duplicates(self, changes: dict, context: Optional[ScoringContext] = None) -> Tuple[float, str]:
+        """Check for near-duplicates of this listing via the MinHash/LSH index"""
+        if context is not None and context.duplicates is not None:
+            found = context.duplicates
+        else:
+            found = duplicates.matches(changes, exclude=context.property_id if context else None,
+                                       as_of=context.as_of if context else None)
+            if context:
+                context.record_query()
+        if not found:
+            return 0.0, None
+
+        # The same listing posted again by someone else is the classic scam; a repost by its owner less so
+        owner = duplicates.owner_key(changes)
+        others = [match for match in found if match['owner'] != owner]
+        if others:
+            return 0.8, f"Near-duplicate of listing {others[0]['id']} by another owner ({others[0]['similarity']:.0%} similar)"
+        return 0.4, f"Possible repost of listing {found[0]['id']} ({found[0]['similarity']:.0%} similar)"
+
+    def assess(self, changes: dict, user: dict, prev_log: Optional[dict],
+               as_of: Optional[datetime] = None, context: Optional[ScoringContext] = None,
+               ml_score: Optional[float] = None, property_id: Optional[str] = None) -> Tuple[bool, Optional[str], dict]:
+        """Run every check and return (fraud_detected, reason, risk_assessment) without storing it"""
         risk_factors = {}
         all_reasons = []
+        context = context or ScoringContext(user, prev_log, as_of, property_id=property_id)
 
-        # Prepare features for ML model
-        features = self.prepare_features(changes, user, prev_log)
-        ml_score = self.predict_anomaly(features)
+        # Prepare features for ML model (assess_batch scores the whole batch up front)
+        if ml_score is None:
+            features = self.prepare_features(changes, user, prev_log, context)
+            ml_score = self.predict_anomaly(features)
         if ml_score > 0.7:  # High anomaly score
             risk_factors['ml_detection'] = ml_score
             all_reasons.append(f"Machine learning anomaly detection score: {ml_score:.2f}")
 
         # Check price anomalies
-        score, reason = self.check_price_anomaly(changes, prev_log)
+        score, reason = self.check_price_anomaly(changes, prev_log, context)
         if score > 0:
             risk_factors['price_change'] = score
             if reason:
                 all_reasons.append(reason)
 
         # Check update frequency
-        score, reason = self.check_update_frequency(user, prev_log)
+        score, reason = self.check_update_frequency(user, prev_log, context)
         if score > 0:
             risk_factors['update_frequency'] = score
             if reason:
                 all_reasons.append(reason)
 
         # Check patterns
-        score, reason = self.check_patterns(changes)
+        score, reason = self.check_patterns(changes, context)
         if score > 0:
             risk_factors['pattern_match'] = score
             if reason:
@@ -316,62 +504,312 @@ class FraudDetector:
                 all_reasons.append(reason)
 
         # Check user behavior
-        score, reason = self.check_user_behavior(user)
+        score, reason = self.check_user_behavior(user, context)
         if score > 0:
             risk_factors['user_behavior'] = score
             if reason:
                 all_reasons.append(reason)
 
+        # Check near-duplicate listings
+        score, reason = self.check_duplicates(changes, context)
+        if score > 0:
+            risk_factors['duplicate_listing'] = score
+            if reason:
+                all_reasons.append(reason)
+
         # Calculate final risk score
         final_score = self.calculate_risk_score(risk_factors)
         
-        # Log risk assessment
         risk_assessment = {
             'timestamp': datetime.utcnow(),
-            'user_id': user['id'],
+            'user_id': user.get('id') if user else None,
             'risk_score': final_score,
             'ml_score': ml_score,
+            'model_version': self.model_version,
             'risk_factors': risk_factors,
-            'reasons': all_reasons
+            'reasons': all_reasons,
+            'query_count': context.query_count
         }
-        db.risk_assessments.insert_one(risk_assessment)
+        fraud_reason = '; '.join(all_reasons) if all_reasons else None
+        return final_score > self.risk_threshold, fraud_reason, risk_assessment
+
+    def assess_batch(self, items: List[Tuple[dict, dict, Optional[dict]]],
+                     as_of: Optional[List[datetime]] = None,
+                     property_ids: Optional[List[str]] = None) -> List[Tuple[bool, Optional[str], dict]]:
+        """assess for many (changes, user, prev_log) at once
+        
+        Each distinct user's history is read once for the batch and the model
+        scores every row in one call. Rows are scored against history as of the
+        start of the batch, not against each other, unless `as_of` gives each
+        row its own point in time (re-scoring old entries), in which case a row
+        sees only the history before it.
+        """
+        histories = {}
+        if as_of is None:
+            for _, user, _ in items:
+                if user and 'id' in user and user['id'] not in histories:
+                    histories[user['id']] = list(db.audit_logs.find(
+                        {'user.id': user['id']},
+                        {'property_id': 1, 'timestamp': 1},
+                        sort=[('timestamp', -1)],
+                        limit=ScoringContext.history_limit
+                    ))
+            contexts = [
+                ScoringContext(user, prev_log, history=histories.get(user['id']) if user and 'id' in user else [])
+                for _, user, prev_log in items
+            ]
+        else:
+            # Enough of each user's history to cover their latest row plus everything before it in the batch
+            latest, rows = {}, {}
+            for (_, user, _), when in zip(items, as_of):
+                if user and 'id' in user:
+                    latest[user['id']] = max(when, latest.get(user['id'], when))
+                    rows[user['id']] = rows.get(user['id'], 0) + 1
+            for user_id, when in latest.items():
+                histories[user_id] = list(db.audit_logs.find(
+                    {'user.id': user_id, 'timestamp': {'$lt': when}},
+                    {'property_id': 1, 'timestamp': 1},
+                    sort=[('timestamp', -1)],
+                    limit=ScoringContext.history_limit + rows[user_id]
+                ))
+            contexts = [
+                ScoringContext(user, prev_log, as_of=when, history=[
+                    log for log in histories[user['id']] if log['timestamp'] < when
+                ][:ScoringContext.history_limit] if user and 'id' in user else [])
+                for (_, user, prev_log), when in zip(items, as_of)
+            ]
+        for context, property_id in zip(contexts, property_ids or [None] * len(items)):
+            context.property_id = property_id
+        for (changes, _, _), context, hits in zip(items, contexts, self.scanner.scan_many(c for c, _, _ in items)):
+            context.pattern_hits = hits
+        # One candidate query for the whole batch
+        for context, found in zip(contexts, duplicates.matches_many(
+                [(changes, context.property_id) for (changes, _, _), context in zip(items, contexts)], as_of=as_of)):
+            context.duplicates = found
+        features = np.vstack([
+            self.prepare_features(changes, user, prev_log, context)
+            for (changes, user, prev_log), context in zip(items, contexts)
+        ]) if items else np.empty((0, 9))
+        ml_scores = self.predict_anomaly_batch(features)
+        results = [
+            self.assess(changes, user, prev_log, context=context, ml_score=float(ml_score))
+            for (changes, user, prev_log), context, ml_score in zip(items, contexts, ml_scores)
+        ]
+        if results:
+            # The history and duplicate reads are shared by the batch; charge them to its first row
+            results[0][2]['query_count'] += len(histories) + 1
+        return results
+
+    def detect_fraud_batch(self, items: List[Tuple[dict, dict, Optional[dict]]],
+                           property_ids: Optional[List[str]] = None) -> List[Tuple[bool, Optional[str]]]:
+        """detect_fraud for many entries, storing their risk assessments in one insert"""
+        results = self.assess_batch(items, property_ids=property_ids)
+        if results:
+            with metrics.stage('fraud.risk_assessment_insert'):
+                db.risk_assessments.insert_many([assessment for _, _, assessment in results])
+        return [(fraud_detected, fraud_reason) for fraud_detected, fraud_reason, _ in results]
+
+    def detect_fraud(self, changes: dict, user: dict, prev_log: Optional[dict],
+                     property_id: Optional[str] = None) -> Tuple[bool, str]:
+        """Enhanced fraud detection with machine learning and risk scoring"""
+        fraud_detected, fraud_reason, risk_assessment = self.assess(changes, user, prev_log, property_id=property_id)
+        self.store_assessment(risk_assessment)
+        return fraud_detected, fraud_reason
 
-        return final_score > self.risk_threshold, '; '.join(all_reasons) if all_reasons else None
+    def store_assessment(self, risk_assessment: dict):
+        """Log a risk assessment from assess"""
+        risk_assessment['query_count'] += 1  # the insert below
+        with metrics.stage('fraud.risk_assessment_insert'):
+            db.risk_assessments.insert_one(risk_assessment)
+        self.last_query_count = risk_assessment['query_count']
 
 # Initialize fraud detector
 fraud_detector = FraudDetector()
 
-def hash_property_data(property_data: dict, prev_hash: str = None) -> str:
+# 'sync' scores inside log_audit; 'async' commits the entry as pending and
+# leaves scoring to the background queue in scoring_queue.py
+FRAUD_SCORING_MODE = os.getenv('FRAUD_SCORING_MODE', 'sync')
+MAX_APPEND_RETRIES = 50
+
+# 1 hashed str(sorted(items)); 2 hashes canonical JSON bytes of `changes`;
+# 3 hashes the compact snapshot/delta record that is stored instead (audit_store);
+# 4 also writes whole-number floats as integers, so the browser (whose JSON has
+# no int/float distinction) serializes them the same way
+HASH_VERSION = 4
+
+def _canonical_default(value):
+    if isinstance(value, datetime):
+        # Mongo keeps naive UTC at millisecond precision, so hash exactly what is stored
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(timespec='milliseconds')
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f'Cannot canonicalize {type(value).__name__}')
+
+def _whole_numbers(value):
+    """Integral floats as ints, e.g. a price of 1500.0 as 1500"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _whole_numbers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_whole_numbers(v) for v in value]
+    return value
+
+def canonical_bytes(data) -> bytes:
+    """Deterministic serialization: sorted keys, no whitespace, UTF-8"""
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False,
+                      default=_canonical_default).encode('utf-8')
+
+def hash_property_data(property_data: dict, prev_hash: str = None, version: int = HASH_VERSION) -> str:
     # Include prev_hash in the data to be hashed for chaining
     data = property_data.copy()
     if prev_hash:
         data['prev_hash'] = prev_hash
-    data_str = str(sorted(data.items()))
-    return hashlib.sha256(data_str.encode()).hexdigest()
+    if version == 1:
+        return hashlib.sha256(str(sorted(data.items())).encode()).hexdigest()
+    if version >= 4:
+        data = _whole_numbers(data)
+    return hashlib.sha256(canonical_bytes(data)).hexdigest()
+
+def _chain_tip(property_id: str) -> Tuple[Optional[dict], int, Optional[dict]]:
+    """(previous log, next seq, property as of the previous log) from the chain head, in one _id lookup
+
+    The head carries the tip's hash, timestamp and price, which is all fraud
+    scoring reads from the previous log, and the full property the next delta
+    is taken against. Properties whose chain predates chain_heads (or heads
+    from before they kept the state) fall back to reading the history once.
+    """
+    head = db.chain_heads.find_one({'_id': property_id})
+    if head:
+        state = head['state'] if 'state' in head else audit_store.state_at_seq(property_id, head['seq'])
+        return head['tip'], head['seq'] + 1, state
+    prev_log = db.audit_logs.find_one({'property_id': property_id}, sort=[('timestamp', -1)])
+    if not prev_log:
+        return None, 1, None
+    audit_store.materialize([prev_log])
+    return prev_log, prev_log.get('seq', 0) + 1, prev_log['changes']
+
+def _head_tip(entry: dict, state: dict) -> dict:
+    tip = {'hash': entry['hash'], 'timestamp': entry['timestamp'], 'changes': {}}
+    if 'price' in state:
+        tip['changes']['price'] = state['price']
+    return tip
+
+@metrics.timed('audit.advance_head')
+def _advance_head(property_id: str, entry: dict, state: dict):
+    tip = _head_tip(entry, state)
+    try:
+        # Only ever moves forward, so a slow writer can't rewind the head
+        db.chain_heads.update_one(
+            {'_id': property_id, 'seq': {'$lt': entry['seq']}},
+            {'$set': {'seq': entry['seq'], 'tip': tip, 'state': state}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        pass  # a later entry already advanced it
 
 def log_audit(property_id: str, action: str, changes: dict, user: dict):
-    # Fetch the latest audit log for this property to get the previous hash
-    prev_log = db.audit_logs.find_one({'property_id': property_id}, sort=[('timestamp', -1)])
-    prev_hash = prev_log['hash'] if prev_log else None
-    hash_val = hash_property_data(changes, prev_hash)
-    
-    # Check for fraud before logging
-    fraud_detected, fraud_reason = fraud_detector.detect_fraud(changes, user, prev_log)
+    # The chain head gives the previous hash without sorting audit_logs
+    with metrics.stage('audit.chain_tip'):
+        prev_log, seq, prev_state = _chain_tip(property_id)
     
     log_entry = {
         'property_id': property_id,
         'action': action,
-        'hash': hash_val,
-        'prev_hash': prev_hash,
-        'timestamp': datetime.utcnow(),
-        'changes': changes,
         'user': user,
-        'fraud_detected': fraud_detected,
-        'fraud_reason': fraud_reason
+        'hash_version': HASH_VERSION,
     }
-    db.audit_logs.insert_one(log_entry)
+    if FRAUD_SCORING_MODE == 'async':
+        log_entry.update({'fraud_status': 'pending', 'fraud_detected': None, 'fraud_reason': None})
+    risk_assessment = scored_against = None
+
+    # The unique (property_id, seq) index is the compare-and-set: of two writers
+    # that read the same tip only one insert succeeds, the other re-reads and retries
+    for _ in range(MAX_APPEND_RETRIES):
+        prev_hash = prev_log['hash'] if prev_log else None
+        if FRAUD_SCORING_MODE != 'async' and (risk_assessment is None or scored_against != prev_hash):
+            # Check for fraud before logging, against the entry this one is chained to;
+            # a retry onto a newer tip scores again so checks like the price jump see it
+            with metrics.stage('audit.fraud_scoring'):
+                fraud_detected, fraud_reason, risk_assessment = fraud_detector.assess(
+                    changes, user, prev_log, property_id=property_id)
+            scored_against = prev_hash
+            log_entry.update({'fraud_status': 'scored', 'fraud_detected': fraud_detected, 'fraud_reason': fraud_reason})
+        for key in ('_id', 'snapshot', 'delta'):
+            log_entry.pop(key, None)
+        # Snapshot or delta depends on the position, so it is redone on every retry
+        log_entry.update(audit_store.compact(prev_state, changes, seq))
+        log_entry.update({
+            'seq': seq,
+            'hash': hash_property_data(audit_store.hashed_content(log_entry), prev_hash),
+            'prev_hash': prev_hash,
+            'timestamp': datetime.utcnow(),
+        })
+        try:
+            with metrics.stage('audit.insert'):
+                db.audit_logs.insert_one(log_entry)
+            break
+        except DuplicateKeyError:
+            prev_log = db.audit_logs.find_one(
+                {'property_id': property_id, 'seq': {'$exists': True}}, sort=[('seq', -1)])
+            seq = prev_log['seq'] + 1
+            prev_state = audit_store.materialize([prev_log])[0]['changes']
+    else:
+        raise RuntimeError(f'Could not append to audit chain of {property_id}')
+    _advance_head(property_id, log_entry, changes)
+    if risk_assessment is not None:
+        fraud_detector.store_assessment(risk_assessment)
+
+    if FRAUD_SCORING_MODE == 'async':
+        from scoring_queue import scoring_queue
+        scoring_queue.submit(log_entry['_id'])
     return log_entry
 
+def log_audit_new(records: List[Tuple[str, str, dict, dict]]) -> List[dict]:
+    """Genesis entries for many new properties: (property_id, action, changes, user) each
+    
+    New properties have no chain yet, so every entry is a seq 1 snapshot with
+    no previous hash and no tip lookup or append retry is needed; entries,
+    chain heads and risk assessments are each written with one insert_many.
+    """
+    if not records:
+        return []
+    now = datetime.utcnow()
+    entries = [{
+        'property_id': property_id,
+        'action': action,
+        'snapshot': changes,
+        'user': user,
+        'hash_version': HASH_VERSION,
+        'seq': 1,
+        'hash': hash_property_data({'snapshot': changes}, None),
+        'prev_hash': None,
+        'timestamp': now,
+    } for property_id, action, changes, user in records]
+    if FRAUD_SCORING_MODE == 'async':
+        for entry in entries:
+            entry.update({'fraud_status': 'pending', 'fraud_detected': None, 'fraud_reason': None})
+    else:
+        with metrics.stage('audit.fraud_scoring'):
+            scored = fraud_detector.detect_fraud_batch([(e['snapshot'], e['user'], None) for e in entries],
+                                                       [e['property_id'] for e in entries])
+        for entry, (fraud_detected, fraud_reason) in zip(entries, scored):
+            entry.update({'fraud_status': 'scored', 'fraud_detected': fraud_detected, 'fraud_reason': fraud_reason})
+    with metrics.stage('audit.insert'):
+        db.audit_logs.insert_many(entries, ordered=False)
+    with metrics.stage('audit.advance_head'):
+        db.chain_heads.insert_many(
+            [{'_id': entry['property_id'], 'seq': 1, 'tip': _head_tip(entry, entry['snapshot']), 'state': entry['snapshot']}
+             for entry in entries], ordered=False)
+
+    if FRAUD_SCORING_MODE == 'async':
+        from scoring_queue import scoring_queue
+        for entry in entries:
+            scoring_queue.submit(entry['_id'])
+    return entries
+
 def detect_fraud(property_data: dict) -> bool:
     # TODO: Implement with TensorFlow
     # For now, always return False (not fraudulent)
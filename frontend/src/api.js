@@ -1,18 +1,36 @@
 const API_URL = "http://localhost:8000";
 
-export async function fetchProperties({ intent, location } = {}) {
+function propertyListUrl({ intent, location, verification, sort, order, limit, next, fields } = {}) {
   const params = new URLSearchParams();
   if (intent) params.append('intent', intent);
   if (location) params.append('location', location);
-  
+  if (verification) params.append('verification', verification);
+  if (sort) params.append('sort', sort);
+  if (order) params.append('order', order);
+  if (limit) params.append('limit', limit);
+  if (next) params.append('next', next);
+  if (fields) params.append('fields', fields);
+
   const queryString = params.toString();
-  const url = `${API_URL}/properties${queryString ? `?${queryString}` : ''}`;
-  
-  const res = await fetch(url);
+  return `${API_URL}/properties${queryString ? `?${queryString}` : ''}`;
+}
+
+export async function fetchPropertiesPage(options = {}) {
+  const res = await fetch(propertyListUrl(options));
   if (!res.ok) {
     const error = await res.json();
     throw new Error(error.detail || 'Failed to fetch properties');
   }
+  // The server returns one page; the cursor for the next one is in a header
+  return { items: await res.json(), next: res.headers.get('X-Next-Cursor') };
+}
+
+export async function fetchStats() {
+  const res = await fetch(`${API_URL}/stats`);
+  if (!res.ok) {
+    const error = await res.json();
+    throw new Error(error.detail || 'Failed to fetch stats');
+  }
   return res.json();
 }
 
@@ -25,9 +43,51 @@ export async function createProperty(data) {
   return res.json();
 }
 
-export async function fetchAuditLog(propertyId, { sortBy = 'timestamp', sortOrder = 'desc' } = {}) {
+// Listing changes pushed by the server as they happen (server-sent events).
+// EventSource reconnects by itself and resumes after the last event it saw;
+// `reset` means the server could not resume and the list should be refetched.
+export function subscribePropertyEvents({ onUpsert, onDelete, onAudit, onFraud, onReset }) {
+  const source = new EventSource(`${API_URL}/properties/events`);
+  const listen = (name, handler) => {
+    if (handler) source.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+  };
+  listen('property.created', onUpsert);
+  listen('property.updated', onUpsert);
+  listen('property.deleted', onDelete);
+  listen('audit.appended', onAudit);
+  // Entries flagged as they were written arrive only as audit.appended
+  listen('audit.appended', (entry) => entry.fraud_detected && onFraud?.(entry));
+  listen('fraud.flagged', onFraud);
+  listen('reset', onReset);
+  return () => source.close();
+}
+
+// Apply a pushed listing to a loaded list: replace it in place, add new ones
+// that pass `matches` at the top, and drop ones that no longer pass it
+export function upsertProperty(list, property, matches = () => true) {
+  if (!matches(property)) return list.filter((p) => p.id !== property.id);
+  if (list.some((p) => p.id === property.id)) {
+    return list.map((p) => (p.id === property.id ? property : p));
+  }
+  return [property, ...list];
+}
+
+function auditLogUrl(propertyId, { action, user, order, limit, next, fields } = {}) {
+  const params = new URLSearchParams();
+  if (action) params.append('action', action);
+  if (user) params.append('user', user);
+  if (order) params.append('order', order);
+  if (limit) params.append('limit', limit);
+  if (next) params.append('next', next);
+  if (fields) params.append('fields', fields);
+
+  const queryString = params.toString();
+  return `${API_URL}/properties/${propertyId}/audit${queryString ? `?${queryString}` : ''}`;
+}
+
+export async function fetchAuditLogPage(propertyId, options = {}) {
   const token = localStorage.getItem("token");
-  const res = await fetch(`${API_URL}/properties/${propertyId}/audit`, {
+  const res = await fetch(auditLogUrl(propertyId, options), {
     headers: {
       "Authorization": `Bearer ${token}`,
       "Content-Type": "application/json"
@@ -37,17 +97,13 @@ export async function fetchAuditLog(propertyId, { sortBy = 'timestamp', sortOrde
     const error = await res.json();
     throw new Error(error.detail || 'Failed to fetch audit log');
   }
-  const logs = await res.json();
-  
-  // Sort logs
-  return logs.sort((a, b) => {
-    const aValue = a[sortBy];
-    const bValue = b[sortBy];
-    if (sortOrder === 'desc') {
-      return bValue > aValue ? 1 : -1;
-    }
-    return aValue > bValue ? 1 : -1;
-  });
+  // Sorted (newest first unless order is 'asc') and paged by the server
+  return { items: await res.json(), next: res.headers.get('X-Next-Cursor') };
+}
+
+export async function fetchAuditLog(propertyId, options = {}) {
+  const { items } = await fetchAuditLogPage(propertyId, options);
+  return items;
 }
 
 export async function fetchUsers() {
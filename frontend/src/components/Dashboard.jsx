@@ -3,13 +3,20 @@ import { useNavigate } from "react-router-dom";
 import PropertyForm from "./PropertyForm";
 import mexicoBg from "../assets/mexico-7596566.jpg";
 import { motion, AnimatePresence } from "framer-motion";
-import { fetchProperties } from "../api";
+import { fetchPropertiesPage, fetchStats, subscribePropertyEvents, upsertProperty } from "../api";
+
+// Columns the backend can order by with keyset pagination
+const SERVER_SORTS = ["created_at", "updated_at"];
+const ACTION_LABELS = { create: "Created", update: "Updated", delete: "Deleted" };
 
 export default function Dashboard({ user }) {
   const navigate = useNavigate();
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [properties, setProperties] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [summary, setSummary] = useState(null);
   const [filters, setFilters] = useState({
     intent: "",
     location: "",
@@ -18,35 +25,73 @@ export default function Dashboard({ user }) {
   const [sortBy, setSortBy] = useState("created_at");
   const [sortOrder, setSortOrder] = useState("desc");
 
-  // Fetch properties with filters
+  const serverSort = SERVER_SORTS.includes(sortBy)
+    ? { sort: sortBy, order: sortOrder }
+    : {};
+
+  // First page of properties with filters; verification and date ordering are applied server-side
+  const loadFirstPage = async () => {
+    try {
+      setLoading(true);
+      const { items, next } = await fetchPropertiesPage({ ...filters, ...serverSort });
+      setProperties(items);
+      setNextCursor(next);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    loadFirstPage();
+  }, [filters, serverSort.sort, serverSort.order]);
+
+  // Later pages follow the server's cursor and are appended
+  const handleLoadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const { items, next } = await fetchPropertiesPage({ ...filters, ...serverSort, next: nextCursor });
+      setProperties((prev) => {
+        const seen = new Set(prev.map((p) => p.id));
+        return [...prev, ...items.filter((p) => !seen.has(p.id))];
+      });
+      setNextCursor(next);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Pushed changes are applied to the loaded list instead of refetching it after every write
   useEffect(() => {
-    const loadProperties = async () => {
-      try {
-        setLoading(true);
-        const data = await fetchProperties(filters);
-        setProperties(data);
-      } catch (err) {
-        setError(err.message);
-      } finally {
-        setLoading(false);
-      }
-    };
-    loadProperties();
-  }, [filters]);
+    const matches = (p) =>
+      (!filters.intent || p.buyer_intent === filters.intent) &&
+      (!filters.location || p.location === filters.location) &&
+      (!filters.verification || p.verification === filters.verification);
+    return subscribePropertyEvents({
+      onUpsert: (p) => setProperties((prev) => upsertProperty(prev, p, matches)),
+      onDelete: ({ id }) => setProperties((prev) => prev.filter((p) => p.id !== id)),
+      onAudit: () => fetchStats().then(setSummary),
+      onReset: loadFirstPage,
+    });
+  }, [filters, serverSort.sort, serverSort.order]);
+
+  // Counts and recent activity come from the server-side summary, not the list
+  useEffect(() => {
+    fetchStats().then(setSummary).catch((err) => setError(err.message));
+  }, []);
 
-  // Calculate stats
   const stats = {
-    total: properties.length,
-    verified: properties.filter((p) => p.verification === "verified").length,
-    pending: properties.filter((p) => p.verification === "pending").length,
-    recent: properties
-      .sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at))
-      .slice(0, 5)
-      .map((p) => ({
-        action: p.verification === "verified" ? "Verified" : "Updated",
-        location: p.location,
-        time: new Date(p.updated_at).toLocaleDateString(),
-      })),
+    total: summary?.total ?? 0,
+    verified: summary?.verification?.verified ?? 0,
+    pending: summary?.verification?.pending ?? 0,
+    recent: (summary?.recent ?? []).map((entry) => ({
+      action: ACTION_LABELS[entry.action] || entry.action,
+      location: entry.location,
+      time: new Date(entry.timestamp).toLocaleDateString(),
+    })),
   };
 
   const handleFilterChange = (e) => {
@@ -143,12 +188,8 @@ export default function Dashboard({ user }) {
               Here's a quick overview of your property management activity.
             </p>
           </div>
-          <PropertyForm
-            onCreated={() => {
-              // Refresh properties after creation
-              fetchProperties(filters).then(setProperties);
-            }}
-          />
+          {/* The new listing and counts arrive through the event feed */}
+          <PropertyForm />
         </motion.div>
 
         {/* Stats */}
@@ -304,6 +345,20 @@ export default function Dashboard({ user }) {
               </tbody>
             </table>
           </div>
+          {nextCursor && (
+            <button
+              onClick={handleLoadMore}
+              disabled={loadingMore}
+              className="mt-4 w-full bg-black/40 text-gray-200 border border-white/10 rounded-md px-4 py-2 hover:bg-white/10 transition cursor-pointer disabled:opacity-50"
+            >
+              {loadingMore ? "Loading..." : "Load more"}
+            </button>
+          )}
+          {nextCursor && !SERVER_SORTS.includes(sortBy) && (
+            <p className="mt-2 text-sm text-gray-400">
+              Sorting by this column only orders the listings loaded so far.
+            </p>
+          )}
         </motion.div>
 
         {/* Recent Activity */}
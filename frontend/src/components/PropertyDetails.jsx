@@ -3,7 +3,7 @@ import { useParams, useNavigate } from "react-router-dom";
 import { motion, AnimatePresence } from "framer-motion";
 import bgImage from "../assets/architecture-1868667.jpg";
 import sha256 from "crypto-js/sha256";
-import { getProperty, updateProperty, deleteProperty } from "../api";
+import { getProperty, updateProperty, deleteProperty, fetchAuditLogPage } from "../api";
 
 function renderChanges(changes) {
   if (!changes || typeof changes !== "object") return null;
@@ -52,16 +52,53 @@ function renderChanges(changes) {
   );
 }
 
+// Naive ISO datetimes as serialized by the API; the backend hashes them at millisecond precision
+const ISO_DATETIME = /^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?$/;
+
+function canonicalNumber(value) {
+  // Python's json writes integers in full and other floats as repr does, which
+  // switches to an exponent (at least two digits) below 1e-4 where JS waits for 1e-7
+  if (Number.isInteger(value)) return BigInt(value).toString();
+  if (Math.abs(value) < 1e-4) {
+    return value.toExponential().replace(/e([+-])(\d)$/, (_, sign, digit) => `e${sign}0${digit}`);
+  }
+  return String(value);
+}
+
+function canonicalJson(value) {
+  // Mirror the backend's canonical_bytes: sorted keys, no whitespace
+  if (Array.isArray(value)) {
+    return `[${value.map(canonicalJson).join(",")}]`;
+  }
+  if (value && typeof value === "object") {
+    const entries = Object.keys(value)
+      .sort()
+      .map((key) => `${JSON.stringify(key)}:${canonicalJson(value[key])}`);
+    return `{${entries.join(",")}}`;
+  }
+  if (typeof value === "string") {
+    const match = value.match(ISO_DATETIME);
+    if (match) {
+      return JSON.stringify(`${match[1]}.${(match[2] || "").padEnd(3, "0").slice(0, 3)}`);
+    }
+  }
+  if (typeof value === "number" && Number.isFinite(value)) {
+    return canonicalNumber(value);
+  }
+  return JSON.stringify(value);
+}
+
 function hashPropertyData(changes, prev_hash = null) {
-  // Mimic backend: sorted entries, include prev_hash if present
+  // Mimic backend: canonical JSON of the changes, with prev_hash if present
   const data = { ...changes };
   if (prev_hash) data["prev_hash"] = prev_hash;
-  // Sort keys for deterministic stringification
-  const sortedEntries = Object.entries(data).sort(([a], [b]) =>
-    a.localeCompare(b)
-  );
-  const dataStr = JSON.stringify(sortedEntries);
-  return sha256(dataStr).toString();
+  return sha256(canonicalJson(data)).toString();
+}
+
+function hasWholeNumber(value) {
+  if (typeof value === "number") return Number.isInteger(value);
+  if (value && typeof value === "object") return Object.values(value).some(hasWholeNumber);
+  return false;
 }
 
 function verifyChainLinkage(logs) {
@@ -74,11 +111,23 @@ function verifyChainLinkage(logs) {
 }
 
 function verifyFullChain(logs) {
+  // Checks the loaded window; its first entry links to an older one unless it is the genesis
   for (let i = 0; i < logs.length; i++) {
-    const prev_hash = i === 0 ? null : logs[i].prev_hash;
-    const recomputedHash = hashPropertyData(logs[i].changes, prev_hash);
-    if (logs[i].hash !== recomputedHash) {
-      return false;
+    const prev_hash = logs[i].prev_hash;
+    // Version 3+ entries hash their stored snapshot or delta rather than the rebuilt changes
+    const hashed =
+      logs[i].hash_version >= 3
+        ? logs[i].snapshot
+          ? { snapshot: logs[i].snapshot }
+          : { delta: logs[i].delta }
+        : logs[i].changes;
+    // Entries hashed before canonical JSON (no hash_version) can only be checked for linkage,
+    // as can version 2-3 entries with whole numbers, which Python may have hashed as floats
+    if (logs[i].hash_version >= 4 || (logs[i].hash_version >= 2 && !hasWholeNumber(hashed))) {
+      const recomputedHash = hashPropertyData(hashed, prev_hash);
+      if (logs[i].hash !== recomputedHash) {
+        return false;
+      }
     }
     if (i > 0 && logs[i].prev_hash !== logs[i - 1].hash) {
       return false;
@@ -87,9 +136,18 @@ function verifyFullChain(logs) {
   return true;
 }
 
+const AUDIT_PAGE_SIZE = 50;
+
+async function fetchAuditWindow(propertyId, next) {
+  // The server pages newest first; the chain is shown and verified oldest first
+  const page = await fetchAuditLogPage(propertyId, { limit: AUDIT_PAGE_SIZE, next });
+  return { logs: page.items.reverse(), next: page.next };
+}
+
 export default function PropertyDetails() {
   const [property, setProperty] = useState(null);
   const [auditLogs, setAuditLogs] = useState([]);
+  const [auditNext, setAuditNext] = useState(null);
   const [chainValid, setChainValid] = useState(null);
   const [fullChainValid, setFullChainValid] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -113,22 +171,11 @@ export default function PropertyDetails() {
         const propertyData = await getProperty(id);
         setProperty(propertyData);
         setEditedProperty(propertyData);
-        const auditRes = await fetch(
-          `http://localhost:8000/properties/${id}/audit`,
-          {
-            headers: {
-              Authorization: `Bearer ${token}`,
-              "Content-Type": "application/json",
-            },
-          }
-        );
-        if (!auditRes.ok) {
-          throw new Error("Failed to fetch audit logs");
-        }
-        const auditData = await auditRes.json();
-        setAuditLogs(auditData);
-        setChainValid(verifyChainLinkage(auditData));
-        setFullChainValid(verifyFullChain(auditData));
+        const { logs, next } = await fetchAuditWindow(id);
+        setAuditLogs(logs);
+        setAuditNext(next);
+        setChainValid(verifyChainLinkage(logs));
+        setFullChainValid(verifyFullChain(logs));
       } catch (err) {
         setError(err.message);
       } finally {
@@ -164,6 +211,10 @@ export default function PropertyDetails() {
         verification:
           editedProperty.verification || property.verification || "",
         terms: editedProperty.terms || property.terms || "",
+        price:
+          editedProperty.price === "" || editedProperty.price == null
+            ? property.price ?? null
+            : Number(editedProperty.price),
         created_at: property.created_at,
         updated_at: new Date().toISOString(),
       };
@@ -171,19 +222,11 @@ export default function PropertyDetails() {
       setProperty(updatedProperty);
       setIsEditing(false);
       // Refresh audit logs
-      const auditRes = await fetch(
-        `http://localhost:8000/properties/${id}/audit`,
-        {
-          headers: {
-            Authorization: `Bearer ${localStorage.getItem("token")}`,
-            "Content-Type": "application/json",
-          },
-        }
-      );
-      const auditData = await auditRes.json();
-      setAuditLogs(auditData);
-      setChainValid(verifyChainLinkage(auditData));
-      setFullChainValid(verifyFullChain(auditData));
+      const { logs, next } = await fetchAuditWindow(id);
+      setAuditLogs(logs);
+      setAuditNext(next);
+      setChainValid(verifyChainLinkage(logs));
+      setFullChainValid(verifyFullChain(logs));
     } catch (err) {
       setError(err.message);
     } finally {
@@ -191,6 +234,19 @@ export default function PropertyDetails() {
     }
   };
 
+  const handleLoadOlder = async () => {
+    try {
+      const { logs, next } = await fetchAuditWindow(id, auditNext);
+      const combined = [...logs, ...auditLogs];
+      setAuditLogs(combined);
+      setAuditNext(next);
+      setChainValid(verifyChainLinkage(combined));
+      setFullChainValid(verifyFullChain(combined));
+    } catch (err) {
+      setError(err.message);
+    }
+  };
+
   const handleDelete = async () => {
     if (!window.confirm("Are you sure you want to delete this property?")) {
       return;
@@ -473,6 +529,24 @@ export default function PropertyDetails() {
                   <p className="mt-1 text-lg text-gray-300">{property.terms}</p>
                 )}
               </div>
+              <div className="mb-4">
+                <span className="text-sm font-medium text-cyan-400">Price</span>
+                {isEditing ? (
+                  <input
+                    type="number"
+                    min="0"
+                    step="any"
+                    name="price"
+                    value={editedProperty.price ?? ""}
+                    onChange={handleInputChange}
+                    className="mt-1 w-full bg-gray-800 text-white px-3 py-2 rounded-md border border-gray-700 focus:outline-none focus:border-blue-500"
+                  />
+                ) : (
+                  <p className="mt-1 text-lg text-gray-300">
+                    {property.price != null ? property.price.toLocaleString() : "Not set"}
+                  </p>
+                )}
+              </div>
             </motion.div>
             <motion.div
               initial={{ x: 20, opacity: 0 }}
@@ -581,6 +655,14 @@ export default function PropertyDetails() {
                 }}
                 className="space-y-4"
               >
+                {auditNext && (
+                  <button
+                    onClick={handleLoadOlder}
+                    className="w-full bg-gray-900 text-gray-300 px-4 py-2 rounded hover:bg-gray-800 transition cursor-pointer"
+                  >
+                    Load older entries
+                  </button>
+                )}
                 {auditLogs.map((log) => (
                   <motion.div
                     key={log.id}
@@ -10,6 +10,7 @@ export default function PropertyForm({ onCreated }) {
     location: "",
     verification: "pending",
     terms: "",
+    price: "",
   });
 
   function handleChange(e) {
@@ -27,9 +28,10 @@ export default function PropertyForm({ onCreated }) {
       location: form.location,
       verification: form.verification,
       terms: form.terms,
+      price: form.price === "" ? null : Number(form.price),
     };
     await createProperty(payload);
-    onCreated();
+    onCreated?.();
     setForm({
       owner_name: "",
       owner_email: "",
@@ -37,6 +39,7 @@ export default function PropertyForm({ onCreated }) {
       location: "",
       verification: "pending",
       terms: "",
+      price: "",
     });
     setIsFormVisible(false);
   }
@@ -171,6 +174,26 @@ export default function PropertyForm({ onCreated }) {
                 />
               </div>
 
+              <div>
+                <label
+                  htmlFor="price"
+                  className="block text-gray-300 font-medium mb-1"
+                >
+                  Price
+                </label>
+                <input
+                  id="price"
+                  name="price"
+                  type="number"
+                  min="0"
+                  step="any"
+                  placeholder="Enter asking price or monthly rent"
+                  value={form.price}
+                  onChange={handleChange}
+                  className="w-full px-3 py-2 bg-[#0a0a0a] border border-gray-800 rounded-md text-white placeholder-gray-500 focus:outline-none focus:border-cyan-400 focus:ring-1 focus:ring-cyan-400 transition-colors duration-200"
+                />
+              </div>
+
               <div>
                 <label
                   htmlFor="terms"
@@ -3,6 +3,7 @@ import { useNavigate } from "react-router-dom";
 import PropertyForm from "./PropertyForm";
 import backgroundImage from "../assets/new-york-5185104.jpg";
 import { motion, AnimatePresence } from "framer-motion";
+import { fetchPropertiesPage, subscribePropertyEvents, upsertProperty } from "../api";
 
 const containerVariants = {
   hidden: {
@@ -63,6 +64,7 @@ const hoverVariants = {
 
 export default function PropertyList() {
   const [properties, setProperties] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [error, setError] = useState(null);
   const navigate = useNavigate();
 
@@ -73,45 +75,46 @@ export default function PropertyList() {
       return;
     }
 
-    fetch("http://localhost:8000/properties", {
-      headers: {
-        Authorization: `Bearer ${token}`,
-        "Content-Type": "application/json",
-      },
-    })
-      .then((res) => {
-        if (!res.ok) {
-          throw new Error(`HTTP error! status: ${res.status}`);
-        }
-        return res.json();
+    const loadProperties = () =>
+      fetchPropertiesPage()
+        .then(({ items, next }) => {
+          setProperties(items);
+          setNextCursor(next);
+        })
+        .catch((error) => {
+          console.error("Error fetching properties:", error);
+          setError("Failed to load properties");
+        });
+
+    loadProperties();
+    // Later changes, including our own creates, are pushed rather than refetched
+    return subscribePropertyEvents({
+      onUpsert: (property) => setProperties((prev) => upsertProperty(prev, property)),
+      onDelete: ({ id }) => setProperties((prev) => prev.filter((p) => p.id !== id)),
+      onReset: loadProperties,
+    });
+  }, [navigate]);
+
+  // The server returns one page at a time; the next one continues from its cursor
+  const handleLoadMore = () => {
+    fetchPropertiesPage({ next: nextCursor })
+      .then(({ items, next }) => {
+        setProperties((prev) => {
+          const seen = new Set(prev.map((p) => p.id));
+          return [...prev, ...items.filter((p) => !seen.has(p.id))];
+        });
+        setNextCursor(next);
       })
-      .then((data) => setProperties(data))
       .catch((error) => {
         console.error("Error fetching properties:", error);
         setError("Failed to load properties");
       });
-  }, [navigate]);
+  };
 
   const handlePropertyClick = (propertyId) => {
     navigate(`/properties/${propertyId}`);
   };
 
-  const handlePropertyCreated = () => {
-    // Refresh the properties list
-    const token = localStorage.getItem("token");
-    fetch("http://localhost:8000/properties", {
-      headers: {
-        Authorization: `Bearer ${token}`,
-        "Content-Type": "application/json",
-      },
-    })
-      .then((res) => res.json())
-      .then((data) => setProperties(data))
-      .catch((error) => {
-        console.error("Error refreshing properties:", error);
-      });
-  };
-
   return (
     <motion.div
       initial="hidden"
@@ -191,11 +194,12 @@ export default function PropertyList() {
                   variants={itemVariants}
                   className="text-sm text-gray-300 mt-1"
                 >
-                  {properties.length}{" "}
-                  {properties.length === 1 ? "property" : "properties"} found
+                  {properties.length}
+                  {nextCursor ? "+" : ""}{" "}
+                  {properties.length === 1 && !nextCursor ? "property" : "properties"} found
                 </motion.div>
               </div>
-              <PropertyForm onCreated={handlePropertyCreated} />
+              <PropertyForm />
             </motion.div>
 
             <AnimatePresence mode="wait">
@@ -287,6 +291,14 @@ export default function PropertyList() {
                       </div>
                     </motion.div>
                   ))}
+                  {nextCursor && (
+                    <button
+                      onClick={handleLoadMore}
+                      className="w-full bg-[#1a1a1a]/80 text-gray-300 px-4 py-2 rounded-xl border border-gray-800 hover:bg-gray-800 transition cursor-pointer"
+                    >
+                      Load more
+                    </button>
+                  )}
                 </motion.div>
               )}
             </AnimatePresence>